@@ -0,0 +1,8 @@
+import os
+
+# The benchmarks run against a synthetic workspace and never reach Notion or Anthropic. Placeholder IDs keep
+# the three databases apart even without a .env; set before src.backend.constants is first imported.
+os.environ.setdefault("NOTION_TOKEN", "offline")
+os.environ.setdefault("TIMELINE_DATABASE_ID", "00000000-0000-4000-8000-00000000000a")
+os.environ.setdefault("LOCATION_DATABASE_ID", "00000000-0000-4000-8000-00000000000b")
+os.environ.setdefault("POLITY_DATABASE_ID", "00000000-0000-4000-8000-00000000000c")
@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from src.backend.context import estimate_tokens
+
+
+def _prompt_text(params: dict) -> str:
+    system = params.get("system")
+    if isinstance(system, list):
+        system = "".join(block["text"] for block in system)
+    user = "".join(message["content"] for message in params.get("messages", []))
+    tools = json.dumps(params.get("tools") or [], separators=(",", ":"))
+    return f"{system}{user}{tools}"
+
+
+class FakeAnthropic:
+    """
+    Answers `messages.create` like the Anthropic client, with a schema-valid event derived from a hash of the
+    prompt, and records the estimated size of every prompt.
+
+    Args:
+        latency (float): The seconds each response takes
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.prompt_tokens: list[int] = []
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.prompt_tokens.clear()
+
+    def respond(self, params: dict) -> SimpleNamespace:
+        """
+        Builds the response to a request without the simulated latency.
+        """
+        prompt_tokens = estimate_tokens(_prompt_text(params))
+        with self._lock:
+            self.prompt_tokens.append(prompt_tokens)
+        digest = hashlib.sha256(json.dumps(params["messages"]).encode("utf-8")).hexdigest()[:8]
+        tool_input = {
+            "name": f"Benchmark event {digest}",
+            "start_year": -int(digest[:3], 16),
+            "end_year": None,
+            "event_type": "Political event",
+            "importance": int(digest[3], 16) % 11,
+            "description": "A synthetic event generated offline for benchmarking.",
+            "excerpt": "A synthetic event.",
+            "location": {"name": "Benchmark Littoral", "biome": "Maritime", "near": []},
+            "polities": [],
+        }
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="tool_use", input=tool_input)],
+            usage=SimpleNamespace(
+                input_tokens=prompt_tokens,
+                output_tokens=estimate_tokens(json.dumps(tool_input)),
+                cache_creation_input_tokens=0,
+                cache_read_input_tokens=0,
+            ),
+        )
+
+    def _create(self, **params) -> SimpleNamespace:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(params)
+
+
+class FakeAsyncAnthropic:
+    """
+    The `AsyncAnthropic` counterpart of a FakeAnthropic, sharing its recorded prompts.
+    """
+
+    def __init__(self, client: FakeAnthropic):
+        self.client = client
+        self.messages = SimpleNamespace(create=self._create)
+
+    async def _create(self, **params) -> SimpleNamespace:
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+        return self.client.respond(params)
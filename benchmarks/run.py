@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Callable
+
+from benchmarks.fake_llm import FakeAnthropic, FakeAsyncAnthropic
+from benchmarks.workspace import FakeAsyncNotionClient, FakeNotionClient, FakeWorkspace
+from src.backend.cache import TTLCache
+from src.backend.events import EventsExtractor
+from src.backend.generator import Generator
+from src.backend.llm import LLM
+from src.backend.llm_cache import LLMResponseCache
+from src.backend.ratelimit import TokenBucket
+from src.backend.scheduler import NotionScheduler
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Number of Timeline, Location and Polity pages of each workspace size
+SIZES = {
+    "small": (1000, 60, 20),
+    "medium": (4000, 200, 60),
+    "large": (10000, 400, 120),
+}
+
+# The metrics whose every increase is a regression, as they do not depend on the machine
+EXACT_METRICS = ("notion_requests", "warm_notion_requests", "prompt_tokens")
+# Cold runs are single samples and too noisy to compare; the best of the warm runs is
+TIMED_METRICS = ("warm_ms",)
+
+
+def _scenarios(workspace: FakeWorkspace) -> dict[str, Callable[[Generator], object]]:
+    """
+    The benchmarked calls, parameterized on events and locations of the workspace.
+    """
+    event_name = workspace.event_names[len(workspace.event_names) // 2]
+    location = workspace.location_names[0]
+    return {
+        "similar_events_in_range": lambda generator: generator.events_extractor.get_similar_events_in_range(
+            -1100, end_year=-800, location=location, near=True
+        ),
+        "similar_events_to_event": lambda generator: generator.events_extractor.get_similar_events_to_event(
+            event_name, delta_year=50
+        ),
+        "generate_similar_event": lambda generator: generator.generate_similar_event(event_name, delta_year=50),
+        "complete_event": lambda generator: generator.complete_event(event_name, delta_year=50),
+        "generate_event_in_range": lambda generator: generator.generate_event_in_range(
+            -1000, -990, -1100, -800, location
+        ),
+    }
+
+
+def _generator(client: FakeNotionClient, llm_client: FakeAnthropic) -> Generator:
+    """
+    A generator reading the fake workspace and answered by the fake LLM, with cold caches and indexes and
+    no rate limit.
+    """
+    extractor = EventsExtractor(
+        client=client,
+        async_client=FakeAsyncNotionClient(client),
+        cache=TTLCache(maxsize=100_000),
+        scheduler=NotionScheduler(TokenBucket(rate=1e9, capacity=1e9)),
+    )
+    llm = LLM(
+        response_cache=LLMResponseCache(":memory:", mode="off"),
+        client=llm_client,
+        async_client=FakeAsyncAnthropic(llm_client),
+    )
+    return Generator(llm=llm, events_extractor=extractor)
+
+
+def measure(
+    workspace: FakeWorkspace,
+    scenario: Callable[[Generator], object],
+    repeat: int,
+    notion_latency: float,
+    llm_latency: float,
+) -> dict:
+    """
+    Runs a scenario once on a fresh generator (cold: empty caches, indexes not built), then `repeat` more times.
+
+    Returns:
+        dict: The cold and best warm wall times in milliseconds, the Notion requests of the cold and of the
+            last warm run, and the estimated tokens of the largest prompt sent to the LLM
+    """
+    client = FakeNotionClient(workspace, latency=notion_latency)
+    llm_client = FakeAnthropic(latency=llm_latency)
+    generator = _generator(client, llm_client)
+
+    # The extractor and generator report progress with print
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        scenario(generator)
+        cold_ms = (time.perf_counter() - start) * 1000
+        cold_requests = client.requests
+
+        warm_ms = []
+        warm_requests = 0
+        for _ in range(repeat):
+            before = client.requests
+            start = time.perf_counter()
+            scenario(generator)
+            warm_ms.append((time.perf_counter() - start) * 1000)
+            warm_requests = client.requests - before
+
+    return {
+        "cold_ms": round(cold_ms, 2),
+        "warm_ms": round(min(warm_ms), 2) if warm_ms else None,
+        "notion_requests": cold_requests,
+        "warm_notion_requests": warm_requests,
+        "prompt_tokens": max(llm_client.prompt_tokens, default=0),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_ms: float) -> dict[str, list[str]]:
+    """
+    Finds the regressions of each scenario against the baseline. Request counts and prompt sizes regress on any
+    increase; warm wall times when they are more than `tolerance` (relative) and `min_ms` (absolute) slower.
+
+    Returns:
+        dict[str, list[str]]: The regressed metrics of each scenario, with their baseline and current values
+    """
+    regressions = {}
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        flagged = []
+        for metric in EXACT_METRICS:
+            if base.get(metric) is not None and metrics[metric] > base[metric]:
+                flagged.append(f"{metric} {base[metric]} -> {metrics[metric]}")
+        for metric in TIMED_METRICS:
+            if base.get(metric) is None or metrics[metric] is None:
+                continue
+            if metrics[metric] > base[metric] * (1 + tolerance) and metrics[metric] - base[metric] > min_ms:
+                flagged.append(f"{metric} {base[metric]} -> {metrics[metric]}")
+        if flagged:
+            regressions[key] = flagged
+    return regressions
+
+
+def _print_table(results: dict, baseline: dict, regressions: dict[str, list[str]]) -> None:
+    header = (
+        f"{'scenario':<40} {'cold ms':>10} {'warm ms':>10} {'requests':>9} {'warm req':>9} {'prompt tk':>10}  status"
+    )
+    print(header)
+    print("-" * len(header))
+    for key, metrics in results.items():
+        status = "REGRESSION" if key in regressions else ("new" if key not in baseline else "ok")
+        print(
+            f"{key:<40} {metrics['cold_ms']:>10.2f} {metrics['warm_ms'] or 0:>10.2f} {metrics['notion_requests']:>9} "
+            f"{metrics['warm_notion_requests']:>9} {metrics['prompt_tokens']:>10}  {status}"
+        )
+    for key, flagged in regressions.items():
+        print(f"{key}: " + "; ".join(flagged))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark retrieval and generation offline, against a synthetic Notion workspace and a fake LLM."
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(SIZES), help=f"Comma-separated workspace sizes among {', '.join(SIZES)}."
+    )
+    parser.add_argument("--scenarios", default=None, help="Comma-separated scenario names (default: all).")
+    parser.add_argument("--repeat", type=int, default=7, help="Warm runs per scenario after the cold run.")
+    parser.add_argument("--notion-latency", type=float, default=0.0, help="Simulated seconds per Notion request.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM response.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file to compare against.")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Relative wall time slowdown flagged.")
+    parser.add_argument("--min-ms", type=float, default=10.0, help="Absolute wall time slowdown flagged.")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    settings = {"repeat": args.repeat, "notion_latency": args.notion_latency, "llm_latency": args.llm_latency}
+    results = {}
+    for size in args.sizes.split(","):
+        workspace = FakeWorkspace(*SIZES[size])
+        for name, scenario in _scenarios(workspace).items():
+            if args.scenarios and name not in args.scenarios.split(","):
+                continue
+            results[f"{size}/{name}"] = measure(
+                workspace, scenario, args.repeat, args.notion_latency, args.llm_latency
+            )
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("settings") != settings:
+            print(f"warning: baseline settings {stored.get('settings')} differ from {settings}")
+        baseline = stored.get("results", {})
+
+    regressions = compare(results, baseline, args.tolerance, args.min_ms)
+    _print_table(results, baseline, regressions)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Prefixes the results printed by a probe, apart from what the app and its background threads print
+MARKER = "startup-probe:"
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "app.py")
+
+# Modules that must not be imported before the first page renders: the app builds the generator in the background
+HEAVY_MODULES = ("anthropic", "notion_client", "pydantic", "numpy", "src.backend.generator", "src.backend.events")
+
+# Imports the app as Streamlit does before running it, and lists the heavy modules that came with it
+_IMPORT_PROBE = """
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import src.app
+print(%(marker)r + json.dumps({
+    "import_ms": (time.perf_counter() - started) * 1000,
+    "heavy_modules": sorted(name for name in %(heavy)r if name in sys.modules),
+}))
+"""
+
+# Renders the first page of the app, with the generator built in the background over a synthetic workspace,
+# then waits for it; times are measured from the start of the interpreter
+_RENDER_PROBE = """
+import json, threading, time
+started = time.perf_counter()
+import benchmarks
+from src.backend import startup
+from streamlit.testing.v1 import AppTest
+
+built = []
+
+def offline_generator():
+    from benchmarks.fake_llm import FakeAnthropic
+    from benchmarks.run import _generator
+    from benchmarks.workspace import FakeNotionClient, FakeWorkspace
+
+    built.append(
+        _generator(FakeNotionClient(FakeWorkspace(%(events)d, %(locations)d, %(polities)d)), FakeAnthropic())
+    )
+    return built[0]
+
+startup._default_generator = offline_generator
+app = AppTest.from_file(%(app)r, default_timeout=60)
+app.run()
+render_ms = (time.perf_counter() - started) * 1000
+errors = [str(exception.value) for exception in app.exception]
+# Warm once the forms can autocomplete: the generator is built and its name indexes are loaded
+deadline = time.perf_counter() + 60
+while time.perf_counter() < deadline and not (built and built[0].events_extractor.event_names()):
+    time.sleep(0.005)
+ready_ms = (time.perf_counter() - started) * 1000
+print(%(marker)r + json.dumps({"render_ms": render_ms, "ready_ms": ready_ms, "errors": errors}))
+"""
+
+# Imports the generator the way the app used to at module load, for comparison
+_EAGER_PROBE = """
+import json, time
+import streamlit
+started = time.perf_counter()
+import src.backend.generator
+print(%(marker)r + json.dumps({"eager_import_ms": (time.perf_counter() - started) * 1000}))
+"""
+
+
+def _probe(code: str, env: dict) -> dict:
+    """
+    Runs a probe in a fresh interpreter, so that no module is already imported, and returns what it printed.
+    """
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    line = next(line for line in result.stdout.splitlines() if line.startswith(MARKER))
+    return json.loads(line.removeprefix(MARKER))
+
+
+def measure(repeat: int, workspace: tuple[int, int, int]) -> dict:
+    """
+    Measures the cold start of the app `repeat` times and keeps the best run of each metric.
+
+    Returns:
+        dict: The milliseconds to import the app module, to render its first page and for the generator and its
+            name indexes to be ready, the import time of the generator the first page no longer waits for, and
+            the heavy modules imported with the app
+    """
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        # An empty snapshot directory and a synthetic workspace: the probes never reach Notion or Anthropic
+        env = {**os.environ, "SNAPSHOT_DIR": snapshot_dir, "METRICS_PORT": "0", "PYTHONPATH": os.getcwd()}
+        events, locations, polities = workspace
+        runs = []
+        for _ in range(repeat):
+            run = _probe(_IMPORT_PROBE % {"heavy": HEAVY_MODULES, "marker": MARKER}, env)
+            render = {"app": APP_PATH, "events": events, "locations": locations, "polities": polities}
+            run.update(_probe(_RENDER_PROBE % {**render, "marker": MARKER}, env))
+            run.update(_probe(_EAGER_PROBE % {"marker": MARKER}, env))
+            runs.append(run)
+
+    return {
+        "import_ms": round(min(run["import_ms"] for run in runs), 2),
+        "render_ms": round(min(run["render_ms"] for run in runs), 2),
+        "ready_ms": round(min(run["ready_ms"] for run in runs), 2),
+        "eager_import_ms": round(min(run["eager_import_ms"] for run in runs), 2),
+        "heavy_modules": sorted({name for run in runs for name in run["heavy_modules"]}),
+        "errors": sorted({error for run in runs for error in run["errors"]}),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the cold start of the Streamlit app, from a fresh interpreter to its first page."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts measured; the best is kept.")
+    parser.add_argument("--events", type=int, default=1000, help="Timeline pages of the synthetic workspace.")
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="Slowest first render accepted.")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = measure(args.repeat, (args.events, 60, 20))
+    print(f"{'import src.app':<32} {results['import_ms']:>10.2f} ms")
+    print(f"{'first page rendered':<32} {results['render_ms']:>10.2f} ms")
+    print(f"{'generator and names ready':<32} {results['ready_ms']:>10.2f} ms")
+    print(f"{'import generator (deferred)':<32} {results['eager_import_ms']:>10.2f} ms")
+
+    failures = []
+    if results["heavy_modules"]:
+        failures.append(f"imported before the first render: {', '.join(results['heavy_modules'])}")
+    if results["errors"]:
+        failures.append(f"app errors: {'; '.join(results['errors'])}")
+    if results["render_ms"] > args.budget_ms:
+        failures.append(f"first render {results['render_ms']:.0f} ms over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(failure)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failures else 0)
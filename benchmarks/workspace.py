@@ -0,0 +1,282 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from src.backend.constants import LOCATION_DATABASE_ID, POLITY_DATABASE_ID, TIMELINE_DATABASE_ID
+from src.backend.mirror import matches_filter, normalize_id
+from src.backend.schemas import BiomeEnum, EventTypeEnum
+
+# Vocabulary per event type, so that descriptions of the same kind of event share words
+_TOPICS = {
+    EventTypeEnum.TECHNOLOGICAL_ADVANCEMENT: "invention forge bronze iron wheel loom kiln craftsmen discovery tools",
+    EventTypeEnum.POLITICAL_EVENT: "king council throne succession treaty envoys court decree regency alliance",
+    EventTypeEnum.POPULATION_MIGRATION: "migration clans exodus settlers drought herds wandering refugees valley",
+    EventTypeEnum.MILITARY_ACTION: "army siege battle cavalry campaign fortress raid warband spears rout",
+    EventTypeEnum.CONSTRUCTION: "walls temple aqueduct road harbour masons quarry towers bridge granary",
+    EventTypeEnum.COLONIZATION: "colony outpost coast ships founders frontier charter landing tribute",
+    EventTypeEnum.ECONOMIC_EVENT: "trade market silver caravans tariff famine harvest debt merchants coin",
+    EventTypeEnum.CIVIL_ACTION: "revolt guilds assembly protest citizens riot reform magistrates strike",
+    EventTypeEnum.PERSONAL_EVENT: "marriage heir birth death exile poet scholar prince funeral oath",
+    EventTypeEnum.RELIGIOUS_EVENT: "priests schism doctrine temple prophet heresy oracle pilgrimage rite gods",
+}
+_SYLLABLES = "ka tor li ven mar os ath ri sul en dra mo qua bel ix far un ze lo has".split()
+
+
+def _title(text: str) -> dict:
+    return {"type": "title", "title": [{"type": "text", "plain_text": text, "text": {"content": text}}]}
+
+
+def _rich_text(text: str) -> dict:
+    segments = [{"type": "text", "plain_text": text, "text": {"content": text}}] if text else []
+    return {"type": "rich_text", "rich_text": segments}
+
+
+def _number(value: int | None) -> dict:
+    return {"type": "number", "number": value}
+
+
+def _select(name: str | None) -> dict:
+    return {"type": "select", "select": {"name": name} if name else None}
+
+
+def _relation(page_ids: list[str]) -> dict:
+    return {"type": "relation", "relation": [{"id": page_id} for page_id in page_ids], "has_more": False}
+
+
+def _page(page_id: str, database_id: str, properties: dict) -> dict:
+    return {
+        "object": "page",
+        "id": page_id,
+        "parent": {"type": "database_id", "database_id": database_id},
+        "last_edited_time": "2024-01-01T00:00:00.000Z",
+        "archived": False,
+        "properties": properties,
+    }
+
+
+def _stored_properties(properties: dict) -> dict:
+    """
+    Converts the properties of a `pages.create` request to those of the page Notion returns: typed, with the
+    plain text of every text object.
+    """
+    stored = {}
+    for name, value in properties.items():
+        prop_type = next(iter(value))
+        if prop_type in ("title", "rich_text"):
+            value = {
+                prop_type: [{**segment, "plain_text": segment["text"]["content"]} for segment in value[prop_type]]
+            }
+        stored[name] = {"type": prop_type, **value}
+    return stored
+
+
+class FakeWorkspace:
+    """
+    A synthetic Kautos workspace: Timeline, Location and Polity pages shaped like the Notion API's.
+
+    Generation is deterministic for a given seed. Locations form a ring with a few random shortcuts as their
+    "Near" relation; events are spread over 2000 years with descriptions drawn from a vocabulary per event type.
+
+    Args:
+        n_events (int): The number of Timeline pages
+        n_locations (int): The number of Location pages
+        n_polities (int): The number of Polity pages
+        seed (int): The random seed
+    """
+
+    def __init__(self, n_events: int, n_locations: int, n_polities: int, seed: int = 0):
+        rng = random.Random(seed)
+        self.databases: dict[str, dict[str, dict]] = {
+            TIMELINE_DATABASE_ID: {},
+            LOCATION_DATABASE_ID: {},
+            POLITY_DATABASE_ID: {},
+        }
+
+        def page_id() -> str:
+            return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+        def name(words: int) -> str:
+            return " ".join("".join(rng.sample(_SYLLABLES, 2)).capitalize() for _ in range(words))
+
+        location_ids = [page_id() for _ in range(n_locations)]
+        near = {location_id: set() for location_id in location_ids}
+        for i, location_id in enumerate(location_ids):
+            neighbours = [location_ids[(i + 1) % n_locations]]
+            if rng.random() < 0.3:
+                neighbours.append(rng.choice(location_ids))
+            for neighbour in neighbours:
+                if neighbour != location_id:
+                    near[location_id].add(neighbour)
+                    near[neighbour].add(location_id)
+        regions = ["Littoral", "Highlands", "Basin", "Marches"]
+        self.location_names = [f"{name(1)} {rng.choice(regions)} {i}" for i in range(n_locations)]
+        for location_id, location_name in zip(location_ids, self.location_names):
+            self.databases[LOCATION_DATABASE_ID][location_id] = _page(
+                location_id,
+                LOCATION_DATABASE_ID,
+                {
+                    "Name": _title(location_name),
+                    "Biome": _select(rng.choice(list(BiomeEnum)).value),
+                    "Near": _relation(sorted(near[location_id])),
+                },
+            )
+
+        polity_ids = [page_id() for _ in range(n_polities)]
+        for i, polity_id in enumerate(polity_ids):
+            start_year = rng.randint(-2000, -200)
+            self.databases[POLITY_DATABASE_ID][polity_id] = _page(
+                polity_id,
+                POLITY_DATABASE_ID,
+                {
+                    "Name": _title(f"{name(1)} {rng.choice(['Kingdom', 'League', 'Empire', 'Confederation'])} {i}"),
+                    "Type": _select(rng.choice(["Kingdom", "Empire", "City-state", "Tribal Confederation"])),
+                    "Start Year": _number(start_year),
+                    "End Year": _number(start_year + rng.randint(50, 600)),
+                },
+            )
+
+        self.event_names = []
+        event_types = list(_TOPICS)
+        for i in range(n_events):
+            event_type = rng.choice(event_types)
+            words = _TOPICS[event_type].split()
+            start_year = rng.randint(-2000, 0)
+            duration = rng.choice([None, None, 0, 1, 5, 20, 100])
+            event_name = f"{rng.choice(words).capitalize()} of {name(1)} {i}"
+            described = rng.random() < 0.85
+            event_id = page_id()
+            self.event_names.append(event_name)
+            self.databases[TIMELINE_DATABASE_ID][event_id] = _page(
+                event_id,
+                TIMELINE_DATABASE_ID,
+                {
+                    "Name": _title(event_name),
+                    "Start Year": _number(start_year),
+                    "End Year": _number(None if duration is None else start_year + duration),
+                    "Event Type": _select(event_type.value),
+                    "Importance": _number(rng.randint(0, 10)),
+                    "Description": _rich_text(" ".join(rng.choices(words, k=60)) if described else ""),
+                    "Excerpt": _rich_text(" ".join(rng.choices(words, k=12)) if described else ""),
+                    "Location": _relation([rng.choice(location_ids)]),
+                    "Polity": _relation(rng.sample(polity_ids, k=min(rng.randint(1, 3), n_polities))),
+                },
+            )
+
+        self._pages = {
+            normalize_id(page_id): page for pages in self.databases.values() for page_id, page in pages.items()
+        }
+
+    def get_page(self, page_id: str) -> dict | None:
+        return self._pages.get(normalize_id(page_id))
+
+    def add_page(self, database_id: str, properties: dict) -> dict:
+        """
+        Creates a page in a database, with a random ID.
+        """
+        page = _page(str(uuid.uuid4()), database_id, properties)
+        self.databases[database_id][page["id"]] = page
+        self._pages[normalize_id(page["id"])] = page
+        return page
+
+
+class FakeNotionClient:
+    """
+    Serves the subset of the `notion_client.Client` API used by EventsExtractor and TimelineWriter from
+    a FakeWorkspace, counting every request by endpoint.
+
+    Args:
+        workspace (FakeWorkspace): The workspace to read from
+        latency (float): The seconds each request takes, to simulate the network
+    """
+
+    def __init__(self, workspace: FakeWorkspace, latency: float = 0.0):
+        self.workspace = workspace
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self.pages = SimpleNamespace(retrieve=self._retrieve, create=self._create)
+        self.databases = SimpleNamespace(query=self._query)
+
+    @property
+    def requests(self) -> int:
+        return sum(self.calls.values())
+
+    def _retrieve(self, page_id: str, **kwargs) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.retrieve_page(page_id)
+
+    def _query(self, database_id: str, **kwargs) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.query_database(database_id, **kwargs)
+
+    def _create(self, parent: dict, properties: dict, **kwargs) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        self._record("pages.create")
+        return self.workspace.add_page(parent["database_id"], _stored_properties(properties))
+
+    def retrieve_page(self, page_id: str) -> dict:
+        """
+        Answers a `pages.retrieve` request without the simulated latency.
+        """
+        self._record("pages.retrieve")
+        page = self.workspace.get_page(page_id)
+        if page is None:
+            raise KeyError(f"Unknown page {page_id}")
+        return page
+
+    def query_database(
+        self,
+        database_id: str,
+        filter: dict | None = None,
+        start_cursor: str | None = None,
+        page_size: int = 100,
+        **kwargs,
+    ) -> dict:
+        """
+        Answers a `databases.query` request without the simulated latency, 100 pages at most per response.
+        """
+        self._record("databases.query")
+        pages = self.workspace.databases[database_id].values()
+        results = [page for page in pages if filter is None or matches_filter(page, filter)]
+        offset = int(start_cursor or 0)
+        page_size = min(page_size, 100)
+        has_more = offset + page_size < len(results)
+        return {
+            "object": "list",
+            "results": results[offset : offset + page_size],
+            "has_more": has_more,
+            "next_cursor": str(offset + page_size) if has_more else None,
+        }
+
+    def _record(self, endpoint: str) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+
+
+class FakeAsyncNotionClient:
+    """
+    The `notion_client.AsyncClient` counterpart of a FakeNotionClient, sharing its workspace and counters.
+    The simulated latency is awaited instead of blocking the event loop.
+    """
+
+    def __init__(self, client: FakeNotionClient):
+        self.client = client
+        self.pages = SimpleNamespace(retrieve=self._retrieve)
+        self.databases = SimpleNamespace(query=self._query)
+
+    async def _retrieve(self, page_id: str, **kwargs) -> dict:
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+        return self.client.retrieve_page(page_id)
+
+    async def _query(self, database_id: str, **kwargs) -> dict:
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+        return self.client.query_database(database_id, **kwargs)
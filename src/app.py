@@ -1,21 +1,54 @@
 import streamlit as st
-from src.backend.generator import Generator
+from src.backend import tracing
+from src.backend.constants import METRICS_PORT, SNAPSHOT_DIR, USE_SNAPSHOT
+from src.backend.startup import BackgroundGenerator
 from src.ui.sidebar import display_sidebar
 from src.ui.generate_similar_event_form import display_generate_similar_event_form
 from src.ui.complete_event_form import display_complete_event_form
 from src.ui.generate_event_in_range_form import display_generate_event_in_range_form
-from src.ui.output_display import display_output
+from src.ui.output_display import display_candidates, display_output, display_save_to_notion
+from src.ui.trace_panel import display_trace_panel
 
 st.set_page_config(layout="wide", page_title="Kautos Event Generator")
 
 @st.cache_resource
+def get_startup() -> BackgroundGenerator:
+    # Cached, so the generator is built and warmed once per process, while the first page renders
+    return BackgroundGenerator(SNAPSHOT_DIR if USE_SNAPSHOT else None).start()
+
+@st.cache_resource
+def start_metrics_server():
+    # Cached, so the server starts once per process
+    if METRICS_PORT:
+        tracing.start_metrics_server(METRICS_PORT)
+
 def get_generator():
-    return Generator()
+    """
+    Returns the generator, waiting for the background start-up if it has not finished yet.
+    """
+    startup = get_startup()
+    try:
+        if startup.ready():
+            return startup.get()
+        with st.spinner("Connecting to Notion and Anthropic..."):
+            return startup.get()
+    except Exception as e:
+        # Retried on the next rerun
+        get_startup.clear()
+        st.error(f"Could not start the generator: {e}")
+        return None
+
+@st.cache_resource
+def get_writer(_generator):
+    # Imported here, not at the top: the first page does not need the Notion client the writer pulls in
+    from src.backend.writer import TimelineWriter
 
-generator = get_generator()
+    return TimelineWriter(_generator.events_extractor)
 
 def main():
     st.title("Kautos Event Generator")
+    get_startup()
+    start_metrics_server()
 
     # Initialize session state for storing results
     if 'event_result' not in st.session_state:
@@ -23,17 +56,31 @@ def main():
 
     selected_task = display_sidebar()
 
-    if selected_task == "Generate Similar Event":
-        display_generate_similar_event_form(generator)
-    elif selected_task == "Complete Existing Event":
-        display_complete_event_form(generator)
-    elif selected_task == "Generate New Event in Range":
-        display_generate_event_in_range_form(generator)
-    else:
+    if selected_task is None:
         st.info("Select a task from the sidebar to begin.")
+    else:
+        generator = get_generator()
+        if generator is None:
+            pass
+        elif selected_task == "Generate Similar Event":
+            display_generate_similar_event_form(generator)
+        elif selected_task == "Complete Existing Event":
+            display_complete_event_form(generator)
+        elif selected_task == "Generate New Event in Range":
+            display_generate_event_in_range_form(generator)
+
+    if st.session_state.get("candidates"):
+        picked = display_candidates(st.session_state.candidates)
+        if picked is not None:
+            st.session_state.event_result = picked
 
     if st.session_state.event_result:
         display_output(st.session_state.event_result)
+        generator = get_generator()
+        if generator is not None:
+            display_save_to_notion(get_writer(generator), st.session_state.event_result)
+
+    display_trace_panel(st.session_state.get("last_trace"))
 
 if __name__ == "__main__":
     main()
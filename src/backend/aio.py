@@ -0,0 +1,161 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, AsyncIterable, AsyncIterator, Coroutine
+
+_DONE = object()
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running in a daemon thread.
+
+    Streamlit runs every session in its own script thread, so the async clients (which are bound to the loop
+    they are first used on) live on this single loop instead, and every session submits its coroutines to it.
+    One process can then serve many concurrent generations while the script threads just wait on futures.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="background-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedules the coroutine on the loop. It runs in a copy of the calling thread's context, so contextvars
+        such as the active trace span carry over.
+
+        Args:
+            coro (Coroutine): The coroutine to run
+
+        Returns:
+            Future: A thread-safe future of the result. Cancelling it cancels the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine) -> Any:
+        """
+        Runs the coroutine on the loop and blocks the calling thread until it finishes.
+
+        Args:
+            coro (Coroutine): The coroutine to run
+
+        Returns:
+            Any: The result of the coroutine
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BackgroundLoop.run cannot be called from the loop's own thread")
+        return self.submit(coro).result()
+
+    def iterate(self, aiterable: AsyncIterable) -> "BackgroundIterator":
+        """
+        Consumes the async iterable on the loop and hands its items to the calling thread.
+
+        Args:
+            aiterable (AsyncIterable): The async iterable, e.g. an async generator
+
+        Returns:
+            BackgroundIterator: A blocking iterator over the items, which can be cancelled from any thread
+        """
+        return BackgroundIterator(self, aiterable)
+
+
+class BackgroundIterator:
+    """
+    A blocking iterator over an async iterable consumed on a BackgroundLoop.
+
+    The loop pushes items into a queue as they are produced, so the consuming thread sees each one as soon as
+    it is ready. `cancel` stops the producer at its next await, e.g. closing an HTTP stream mid-response.
+    Errors raised by the producer are re-raised by the iterator; after a cancellation the iterator just ends.
+    """
+
+    def __init__(self, loop: BackgroundLoop, aiterable: AsyncIterable):
+        self._queue: queue.Queue = queue.Queue()
+        self._future = loop.submit(self._pump(aiterable))
+        # Also ends the iteration when the producer is cancelled before it starts
+        self._future.add_done_callback(lambda _: self._queue.put((_DONE, None)))
+
+    async def _pump(self, aiterable: AsyncIterable) -> None:
+        try:
+            async for item in aiterable:
+                self._queue.put((item, None))
+        except BaseException as error:
+            self._queue.put((_DONE, error))
+            raise
+        self._queue.put((_DONE, None))
+
+    def __iter__(self) -> "BackgroundIterator":
+        return self
+
+    def __next__(self) -> Any:
+        item, error = self._queue.get()
+        if item is _DONE:
+            self._queue.put((_DONE, error))  # every later call ends the same way
+            if error is not None and not isinstance(error, (asyncio.CancelledError, CancelledError)):
+                raise error
+            raise StopIteration
+        return item
+
+    def cancel(self) -> None:
+        """
+        Cancels the producer. Safe to call from any thread, any number of times.
+        """
+        self._future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._future.cancelled()
+
+
+_background_loop: BackgroundLoop | None = None
+_background_loop_lock = threading.Lock()
+
+
+async def amerge(aiterables: list[AsyncIterable]) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Consumes async iterables concurrently and yields their items as they arrive, each with the position of its
+    iterable. An error in one of them is raised once its earlier items are yielded. Closing the merged
+    iterator cancels the iterables still running.
+    """
+    items: asyncio.Queue = asyncio.Queue()
+
+    async def pump(position: int, aiterable: AsyncIterable) -> None:
+        try:
+            async for item in aiterable:
+                items.put_nowait((position, item, None))
+        except Exception as e:
+            items.put_nowait((position, _DONE, e))
+        else:
+            items.put_nowait((position, _DONE, None))
+
+    tasks = [asyncio.create_task(pump(position, aiterable)) for position, aiterable in enumerate(aiterables)]
+    try:
+        running = len(tasks)
+        while running:
+            position, item, error = await items.get()
+            if item is not _DONE:
+                yield position, item
+            elif error is not None:
+                raise error
+            else:
+                running -= 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_background_loop() -> BackgroundLoop:
+    """
+    Returns the process-wide background loop, starting it on first use.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+        return _background_loop
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+
+from pydantic import ValidationError
+
+from src.backend.constants import BATCH_POLL_INTERVAL
+from src.backend.generator import Generator
+from src.backend.schemas import Event
+
+
+def year_windows(start_year: int, end_year: int, step: int = 10) -> list[tuple[int, int]]:
+    """
+    Splits [start_year, end_year) into consecutive windows, e.g. decades.
+
+    Returns:
+        list[tuple[int, int]]: The first and last year of each window
+    """
+    return [(year, min(year + step, end_year) - 1) for year in range(start_year, end_year, step)]
+
+
+class BatchJob:
+    """
+    Generates many events in range at once through the Anthropic Message Batches API.
+
+    Every prompt is built up front (their contexts are retrieved concurrently), submitted as a single batch,
+    then the batch is polled until it ends. Each result is validated against `schemas.Event` and written out
+    as one JSONL line, in the order of the windows.
+
+    Args:
+        generator (Generator): The generator whose extractor, prompts and LLM parameters are used
+        batches (Any | None): The Message Batches endpoint. Defaults to the generator's Anthropic client;
+            pass a FakeBatchClient to run offline.
+        poll_interval (float): The seconds between status checks
+    """
+
+    def __init__(self, generator: Generator, batches: Any | None = None, poll_interval: float = BATCH_POLL_INTERVAL):
+        self.generator = generator
+        self.batches = batches if batches is not None else generator.llm.client.messages.batches
+        self.poll_interval = poll_interval
+
+    def build_requests(
+        self, windows: list[tuple[int, int]], location: str, near: bool = True, context_margin: int = 100
+    ) -> list[dict]:
+        """
+        Builds the batch request of every window.
+
+        Args:
+            windows (list[tuple[int, int]]): The start and end year of each event to generate
+            location (str): The location of the events
+            near (bool): Whether to include near locations in the context
+            context_margin (int): The years searched for context before and after each window
+
+        Returns:
+            list[dict]: The batch requests, with custom IDs "range_<start>_<end>"
+        """
+
+        async def build() -> list[dict]:
+            return await asyncio.gather(
+                *(
+                    self.generator.abatch_request_event_in_range(
+                        f"range_{start_year}_{end_year}",
+                        start_year,
+                        end_year,
+                        start_year - context_margin,
+                        end_year + context_margin,
+                        location,
+                        near,
+                    )
+                    for start_year, end_year in windows
+                )
+            )
+
+        return self.generator.loop.run(build())
+
+    def submit(self, requests: list[dict]) -> str:
+        """
+        Submits the requests as one batch and returns its ID.
+        """
+        return self.batches.create(requests=requests).id
+
+    def wait(self, batch_id: str, timeout: float | None = None) -> Any:
+        """
+        Polls the batch until its processing has ended.
+
+        Args:
+            batch_id (str): The batch ID
+            timeout (float | None): The maximum seconds to wait. Defaults to no limit (batches end within 24 hours).
+
+        Returns:
+            Any: The ended batch
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            batch = self.batches.retrieve(batch_id)
+            if batch.processing_status == "ended":
+                return batch
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Batch {batch_id} still {batch.processing_status} after {timeout} seconds")
+            counts = batch.request_counts
+            print(
+                f"batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, "
+                f"{counts.errored} errored"
+            )
+            time.sleep(self.poll_interval)
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        """
+        Reads the results of an ended batch and validates the generated events.
+
+        Yields:
+            dict: The custom ID, the status ("succeeded", "invalid", "errored", "canceled" or "expired"),
+                the validated event (None unless succeeded) and the error (None if succeeded)
+        """
+        for response in self.batches.results(batch_id):
+            result = response.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                yield {"custom_id": response.custom_id, "status": result.type, "event": None, "error": str(error)}
+                continue
+            try:
+                event = Event.model_validate(result.message.content[0].input)
+            except ValidationError as e:
+                yield {"custom_id": response.custom_id, "status": "invalid", "event": None, "error": str(e)}
+                continue
+            yield {
+                "custom_id": response.custom_id,
+                "status": "succeeded",
+                "event": event.model_dump(mode="json"),
+                "error": None,
+            }
+
+    def run(
+        self,
+        windows: list[tuple[int, int]],
+        location: str,
+        output_path: str,
+        near: bool = True,
+        context_margin: int = 100,
+        timeout: float | None = None,
+    ) -> dict[str, int]:
+        """
+        Builds, submits and waits for the batch, then writes its results to a JSONL file.
+
+        Args:
+            windows (list[tuple[int, int]]): The start and end year of each event to generate
+            location (str): The location of the events
+            output_path (str): The JSONL file to write
+            near (bool): Whether to include near locations in the context
+            context_margin (int): The years searched for context before and after each window
+            timeout (float | None): The maximum seconds to wait for the batch
+
+        Returns:
+            dict[str, int]: The number of results per status
+        """
+        requests = self.build_requests(windows, location, near, context_margin)
+        batch_id = self.submit(requests)
+        print(f"batch {batch_id}: submitted {len(requests)} requests")
+        self.wait(batch_id, timeout)
+
+        order = {request["custom_id"]: position for position, request in enumerate(requests)}
+        results = sorted(self.results(batch_id), key=lambda result: order.get(result["custom_id"], len(order)))
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        counts: dict[str, int] = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return counts
+
+
+def _placeholder_event(request: dict) -> dict:
+    """
+    The default FakeBatchClient response: a schema-valid event named after the request.
+    """
+    return {
+        "name": f"Offline event {request['custom_id']}",
+        "start_year": 0,
+        "end_year": None,
+        "event_type": "Political event",
+        "importance": 5,
+        "description": "Generated offline by FakeBatchClient.",
+        "excerpt": "Generated offline.",
+        "location": {"name": "Unknown", "biome": "Maritime", "near": []},
+        "polities": [],
+    }
+
+
+class FakeBatchClient:
+    """
+    A local stand-in for the Message Batches endpoint (`create`, `retrieve`, `results`), for running and testing
+    batch jobs offline. Batches stay "in_progress" for `processing_time` seconds, then every request is answered
+    by `responder`.
+
+    Args:
+        responder (Callable[[dict], dict] | None): Maps a batch request to the tool input of its response.
+            Raising an exception makes that request "errored". Defaults to a placeholder event.
+        processing_time (float): The seconds before a batch ends
+    """
+
+    def __init__(self, responder: Callable[[dict], dict] | None = None, processing_time: float = 0.0):
+        self.responder = responder or _placeholder_event
+        self.processing_time = processing_time
+        self._batches: dict[str, tuple[float, list[dict]]] = {}
+
+    def create(self, requests: list[dict]) -> SimpleNamespace:
+        custom_ids = [request["custom_id"] for request in requests]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError("Batch requests must have unique custom IDs")
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex}"
+        self._batches[batch_id] = (time.monotonic(), list(requests))
+        return self.retrieve(batch_id)
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        created, requests = self._batches[batch_id]
+        ended = time.monotonic() - created >= self.processing_time
+        return SimpleNamespace(
+            id=batch_id,
+            type="message_batch",
+            processing_status="ended" if ended else "in_progress",
+            request_counts=SimpleNamespace(
+                processing=0 if ended else len(requests),
+                succeeded=len(requests) if ended else 0,
+                errored=0,
+                canceled=0,
+                expired=0,
+            ),
+        )
+
+    def results(self, batch_id: str) -> Iterator[SimpleNamespace]:
+        if self.retrieve(batch_id).processing_status != "ended":
+            raise RuntimeError(f"Batch {batch_id} has not ended yet")
+        for request in self._batches[batch_id][1]:
+            try:
+                tool_input = self.responder(request)
+            except Exception as e:
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(type="api_error", message=str(e)))
+            else:
+                message = SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=tool_input)])
+                result = SimpleNamespace(type="succeeded", message=message)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
@@ -17,6 +17,67 @@ POLITY_DATABASE_ID = os.getenv("POLITY_DATABASE_ID")
 LANGUAGE_DATABASE_ID = os.getenv("LANGUAGE_DATABASE_ID")
 RELIGION_DATABASE_ID = os.getenv("RELIGION_DATABASE_ID")
 
+# Process-wide cache of Location/Polity pages retrieved from Notion
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "2048"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "3600"))
+
+# Notion request rate (requests per second, published average is 3), burst size, retries on 429 and fan-out
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+NOTION_RATE_BURST = float(os.getenv("NOTION_RATE_BURST", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+NOTION_MAX_CONCURRENCY = int(os.getenv("NOTION_MAX_CONCURRENCY", "8"))
+
+# Seconds before in-memory indexes built from the live Notion API (not the mirror) are rebuilt
+INDEX_TTL = float(os.getenv("INDEX_TTL", "600"))
+
+# Seconds between background checks that keep the event and location name indexes (autocomplete) current
+NAME_INDEX_REFRESH_INTERVAL = float(os.getenv("NAME_INDEX_REFRESH_INTERVAL", "60"))
+
+# Local SQLite mirror of the Timeline, Location and Polity databases
+USE_MIRROR = os.getenv("USE_MIRROR", "false").lower() in ("1", "true", "yes")
+MIRROR_PATH = os.getenv("MIRROR_PATH", "local/mirror.sqlite3")
+MIRROR_SYNC_INTERVAL = float(os.getenv("MIRROR_SYNC_INTERVAL", "0"))  # seconds, 0 disables background syncing
+
+# Memory-mapped snapshot of the parsed world data, loaded at startup and saved after index rebuilds
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "local/snapshot")
+USE_SNAPSHOT = os.getenv("USE_SNAPSHOT", "true").lower() in ("1", "true", "yes")
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "3600"))  # seconds, only for snapshots of the live API
+
+# Hash buckets of the TF-IDF vectors comparing event texts (see src/backend/similarity.py)
+SIMILARITY_FEATURES = int(os.getenv("SIMILARITY_FEATURES", "4096"))
+
+# Estimated token budget of the contextual events pasted into generation prompts
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+
+# Candidates generated at once from one context retrieval are spread over this much temperature around the default
+CANDIDATE_TEMPERATURE_SPREAD = float(os.getenv("CANDIDATE_TEMPERATURE_SPREAD", "0.3"))
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", "6"))
+
+# Seconds a context retrieval prefetched while the user fills in a form is reused for, before it is retrieved again
+PREFETCH_MAX_AGE = float(os.getenv("PREFETCH_MAX_AGE", "120"))
+
+# Seconds between status checks of a submitted Message Batch
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+
+# Ledger of the events written back to the Timeline, so that retried writes never create a page twice
+WRITE_LEDGER_PATH = os.getenv("WRITE_LEDGER_PATH", "local/writes.sqlite3")
+WRITE_MAX_CONCURRENCY = int(os.getenv("WRITE_MAX_CONCURRENCY", "3"))
+# Seconds a write claimed by another writer is presumed in progress, before it is presumed lost and reconciled
+WRITE_PENDING_TIMEOUT = float(os.getenv("WRITE_PENDING_TIMEOUT", "300"))
+
+# Checkpoint of the whole-Timeline completion job, resumed from on the next run, and its worker pool
+COMPLETION_CHECKPOINT_PATH = os.getenv("COMPLETION_CHECKPOINT_PATH", "local/completion.jsonl")
+COMPLETION_MAX_WORKERS = int(os.getenv("COMPLETION_MAX_WORKERS", "4"))
+COMPLETION_CLUSTER_SIZE = int(os.getenv("COMPLETION_CLUSTER_SIZE", "8"))
+
+# Persistent cache of LLM responses: "off", "on" (read and write) or "replay" (read only, a miss is an error)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "local/llm_cache.sqlite3")
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# Port of the /metrics (Prometheus text) and /metrics.json endpoints, 0 disables the metrics server
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
 # Warnings for missing critical variables
 if NOTION_TOKEN is None:
     print("CRITICAL WARNING: NOTION_TOKEN not found. Application may not function correctly.")
@@ -0,0 +1,191 @@
+import json
+import math
+from dataclasses import dataclass, field
+
+from src.backend.constants import CONTEXT_TOKEN_BUDGET
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a text locally. Compact JSON averages about 3.5 characters per token;
+    the estimate errs on the high side so the budget is not overrun.
+    """
+    return math.ceil(len(text) / 3.5)
+
+
+def compact_json(data) -> str:
+    """
+    Serializes data without whitespace.
+    """
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _drop_empty(data: dict) -> dict:
+    return {key: value for key, value in data.items() if value not in (None, "", [])}
+
+
+@dataclass
+class PackedContext:
+    """
+    The result of packing contextual events into a prompt.
+
+    Attributes:
+        text (str): The serialized context: a legend of locations and polities, and the events referencing them
+        events (list[dict]): The events that were included, in chronological order
+        dropped (int): The number of events left out to stay within the token budget
+        tokens (int): The estimated number of tokens of `text`
+    """
+
+    text: str
+    events: list[dict] = field(default_factory=list)
+    dropped: int = 0
+    tokens: int = 0
+
+
+class ContextPacker:
+    """
+    Packs contextual events into a prompt under a token budget.
+
+    Events are ranked by importance, weighted down with their temporal distance to a reference year and their
+    "Near" hop distance to a reference location, and up with their textual similarity to the seed event when
+    given, then added best first until the budget is reached. Locations and polities shared by several events
+    are written once in a legend and referenced by name.
+
+    Args:
+        token_budget (int): The maximum estimated number of tokens of the packed context
+        year_scale (float): The number of years over which the temporal weight decays by a factor e
+        similarity_weight (float): How much a cosine similarity of 1 multiplies the weight of an event, on top of 1
+    """
+
+    def __init__(
+        self, token_budget: int = CONTEXT_TOKEN_BUDGET, year_scale: float = 100.0, similarity_weight: float = 8.0
+    ):
+        self.token_budget = token_budget
+        self.year_scale = year_scale
+        self.similarity_weight = similarity_weight
+
+    def rank(
+        self,
+        events: list[dict],
+        reference_year: int | None = None,
+        location_hops: dict[str, int] | None = None,
+        similarities: list[float] | None = None,
+    ) -> list[dict]:
+        """
+        Orders events from most to least relevant.
+
+        Args:
+            events (list[dict]): The parsed events
+            reference_year (int | None): The year the context is about, e.g. the seed event's start year
+            location_hops (dict[str, int] | None): The hop distance of location names from the reference location
+            similarities (list[float] | None): The cosine similarity of each event to the seed event
+
+        Returns:
+            list[dict]: The events, most relevant first
+        """
+        farthest = max(location_hops.values(), default=0) + 1 if location_hops else 0
+
+        def score(position: int) -> float:
+            event = events[position]
+            weight = (event.get("importance") or 0) + 1
+            if reference_year is not None and event.get("start_year") is not None:
+                start_year = event["start_year"]
+                end_year = event.get("end_year") if event.get("end_year") is not None else start_year
+                distance = max(start_year - reference_year, reference_year - end_year, 0)
+                weight *= math.exp(-distance / self.year_scale)
+            if location_hops:
+                location_name = (event.get("location") or {}).get("name")
+                weight *= 0.5 ** location_hops.get(location_name, farthest)
+            if similarities:
+                weight *= 1 + self.similarity_weight * max(similarities[position], 0.0)
+            return weight
+
+        return [events[position] for position in sorted(range(len(events)), key=score, reverse=True)]
+
+    def pack(
+        self,
+        events: list[dict],
+        reference_year: int | None = None,
+        location_hops: dict[str, int] | None = None,
+        similarities: list[float] | None = None,
+    ) -> PackedContext:
+        """
+        Ranks the events and serializes as many as fit in the token budget.
+
+        Args:
+            events (list[dict]): The parsed events
+            reference_year (int | None): The year the context is about
+            location_hops (dict[str, int] | None): The hop distance of location names from the reference location
+            similarities (list[float] | None): The cosine similarity of each event to the seed event
+
+        Returns:
+            PackedContext: The packed context and how many events were dropped
+        """
+        locations: dict[str, dict] = {}
+        polities: dict[str, dict] = {}
+        included = []
+        # Braces, keys and separators of the envelope
+        tokens = estimate_tokens(compact_json({"locations": {}, "polities": {}, "events": []}))
+
+        for event in self.rank(events, reference_year, location_hops, similarities):
+            compact_event, new_locations, new_polities = self._compact_event(event, locations, polities)
+            cost = estimate_tokens(compact_json(compact_event)) + 1
+            cost += sum(estimate_tokens(compact_json({name: value})) for name, value in new_locations.items())
+            cost += sum(estimate_tokens(compact_json({name: value})) for name, value in new_polities.items())
+            if tokens + cost > self.token_budget:
+                continue
+            tokens += cost
+            locations.update(new_locations)
+            polities.update(new_polities)
+            included.append((event, compact_event))
+
+        included.sort(key=lambda pair: (pair[0].get("start_year") is None, pair[0].get("start_year") or 0))
+        text = compact_json(
+            {
+                "locations": locations,
+                "polities": polities,
+                "events": [compact_event for _, compact_event in included],
+            }
+        )
+        return PackedContext(
+            text=text,
+            events=[event for event, _ in included],
+            dropped=len(events) - len(included),
+            tokens=estimate_tokens(text),
+        )
+
+    def _compact_event(
+        self, event: dict, locations: dict[str, dict], polities: dict[str, dict]
+    ) -> tuple[dict, dict[str, dict], dict[str, dict]]:
+        """
+        Replaces the nested location and polities of an event by their names.
+
+        Returns:
+            dict: The compact event
+            dict[str, dict]: The legend entries for locations not in the legend yet
+            dict[str, dict]: The legend entries for polities not in the legend yet
+        """
+        new_locations = {}
+        new_polities = {}
+        compact_event = _drop_empty({key: value for key, value in event.items() if key not in ("location", "polities")})
+
+        location = event.get("location")
+        if location and location.get("name"):
+            compact_event["location"] = location["name"]
+            if location["name"] not in locations:
+                new_locations[location["name"]] = _drop_empty(
+                    {key: value for key, value in location.items() if key != "name"}
+                )
+
+        polity_names = []
+        for polity in event.get("polities") or []:
+            if not polity.get("name"):
+                continue
+            polity_names.append(polity["name"])
+            if polity["name"] not in polities and polity["name"] not in new_polities:
+                new_polities[polity["name"]] = _drop_empty(
+                    {key: value for key, value in polity.items() if key != "name"}
+                )
+        if polity_names:
+            compact_event["polities"] = polity_names
+        return compact_event, new_locations, new_polities
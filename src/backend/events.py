@@ -1,5 +1,36 @@
-from src.backend.constants import NOTION_TOKEN, LOCATION_DATABASE_ID, TIMELINE_DATABASE_ID
-from notion_client import Client
+from src.backend.constants import (
+    NOTION_TOKEN,
+    LOCATION_DATABASE_ID,
+    POLITY_DATABASE_ID,
+    TIMELINE_DATABASE_ID,
+    USE_MIRROR,
+    MIRROR_SYNC_INTERVAL,
+    NOTION_MAX_CONCURRENCY,
+    INDEX_TTL,
+    NAME_INDEX_REFRESH_INTERVAL,
+    SNAPSHOT_DIR,
+    SNAPSHOT_MAX_AGE,
+)
+from src.backend.cache import ENTITY_CACHE, TTLCache
+from src.backend.graph import LocationGraph
+from src.backend.intervals import OVERLAP_MODES, IntervalIndex
+from src.backend.mirror import MirrorClient, NotionMirror, normalize_id
+from src.backend.names import NameIndex
+from src.backend.ratelimit import TokenBucket
+from src.backend.scheduler import NOTION_SCHEDULER, NotionScheduler, Priority
+from src.backend.similarity import similarity_scores
+from src.backend.snapshot import read_snapshot, write_snapshot
+from src.backend.store import EventStore
+from src.backend import tracing
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+from notion_client import AsyncClient, Client
+
+# Location conditions per compound Notion filter; wider hop radii are split over several queries
+MAX_LOCATION_FILTERS = 50
 
 
 class EventsExtractor:
@@ -11,117 +42,1261 @@ class EventsExtractor:
         end_year (int | None): The end year of the event
         location (str | None): The name of the location
         near (bool): Whether to include near locations
+        client (Client | MirrorClient | None): The client to read from. Defaults to the live Notion API,
+            or to the local mirror when USE_MIRROR is set.
+        async_client (AsyncClient | None): The client used by the async methods. Defaults to an AsyncClient
+            when reading from the live API; otherwise the async methods call `client` directly.
+        cache (TTLCache | None): The cache of retrieved related pages. Defaults to the process-wide entity cache.
+        limiter (TokenBucket | None): A rate limiter for Notion requests, given its own scheduler.
+            Prefer passing `scheduler`.
+        scheduler (NotionScheduler | None): The scheduler Notion requests go through. Defaults to the
+            process-wide scheduler for the live API, and to direct calls for the local mirror.
+        max_concurrency (int): The number of Notion requests resolved in parallel
     """
 
-    def __init__(self):
-        self.client = Client(auth=NOTION_TOKEN)
+    def __init__(
+        self,
+        client: Client | MirrorClient | None = None,
+        async_client: AsyncClient | None = None,
+        cache: TTLCache | None = None,
+        limiter: TokenBucket | None = None,
+        max_concurrency: int = NOTION_MAX_CONCURRENCY,
+        scheduler: NotionScheduler | None = None,
+    ):
+        self.mirror = None
+        if client is None:
+            client = Client(auth=NOTION_TOKEN)
+            if async_client is None and not USE_MIRROR:
+                async_client = AsyncClient(auth=NOTION_TOKEN)
+            if USE_MIRROR:
+                self.mirror = NotionMirror(client=client)
+                if any(self.mirror.last_synced(db_id) is None for db_id in self.mirror.database_ids):
+                    self.mirror.sync()
+                if MIRROR_SYNC_INTERVAL > 0:
+                    self.mirror.start_background_sync(MIRROR_SYNC_INTERVAL)
+                client = MirrorClient(self.mirror, fallback=client)
+        elif isinstance(client, MirrorClient):
+            self.mirror = client.mirror
+        self.client = client
+        self.async_client = async_client
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else ENTITY_CACHE
+        if scheduler is None and limiter is not None:
+            scheduler = NotionScheduler(limiter)
+        elif scheduler is None and not isinstance(client, MirrorClient):
+            scheduler = NOTION_SCHEDULER
+        self.scheduler = scheduler
+        self.limiter = scheduler.limiter if scheduler is not None else None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="events-extractor")
+        self._timeline_lock = threading.Lock()
+        self._timeline = None  # (data version, EventStore of every event, IntervalIndex over their years, NameIndex)
+        self._graph_lock = threading.Lock()
+        self._locations = None  # (data version, LocationGraph, NameIndex)
+        self._polity_lock = threading.Lock()
+        self._polities = None  # (data version, parsed polities by normalized page ID, NameIndex)
+        self._rebuild_lock = threading.Lock()
+        self._rebuilding: set[str] = set()  # the attributes of the indexes being rebuilt in the background
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the related page cache.
+        """
+        return self.cache.stats()
+
+    def scheduler_stats(self) -> dict | None:
+        """
+        Returns the queue depths and counters of the Notion request scheduler, or None when reading the mirror.
+        """
+        return self.scheduler.stats() if self.scheduler is not None else None
+
+    def resolve_event_id(self, event_name: str) -> str | None:
+        """
+        Resolves an event name to its page ID on the local name index, forgiving case and extra whitespace.
+        Returns None if the name is unknown, or the index has not been built yet (see refresh_names).
+        """
+        names = self.event_names()
+        return names.resolve(event_name) if names is not None else None
+
+    def resolve_location_id(self, location_name: str) -> str | None:
+        """
+        Resolves a location name to its page ID on the local name index, see resolve_event_id.
+        """
+        names = self.location_names()
+        return names.resolve(location_name) if names is not None else None
+
+    def resolve_polity_id(self, polity_name: str) -> str | None:
+        """
+        Resolves a polity name to its page ID on the polity table, see resolve_event_id and load_relation_names.
+        """
+        polities = self._polities
+        return polities[2].resolve(polity_name) if polities is not None else None
+
+    def load_relation_names(self) -> None:
+        """
+        Builds the location graph and the polity table if they are stale, so that resolve_location_id and
+        resolve_polity_id answer from memory. Costs one bulk read of each database, instead of a title query
+        per name.
+        """
+        self._location_graph()
+        self._polity_table()
+
+    def suggest_event_names(self, query: str, limit: int = 10) -> list[str]:
+        """
+        Returns event names completing or approximately matching the query, without Notion calls.
+        Empty until the name index has been built (see refresh_names).
+        """
+        names = self.event_names()
+        return names.suggest(query, limit) if names is not None else []
+
+    def suggest_location_names(self, query: str, limit: int = 10) -> list[str]:
+        """
+        Returns location names completing or approximately matching the query, see suggest_event_names.
+        """
+        names = self.location_names()
+        return names.suggest(query, limit) if names is not None else []
+
+    def event_names(self) -> NameIndex | None:
+        """
+        Returns the name index of the Timeline last built, or None if it has not been built yet.
+        """
+        timeline = self._timeline
+        return timeline[3] if timeline is not None else None
+
+    def location_names(self) -> NameIndex | None:
+        """
+        Returns the name index of the Location database last built, or None if it has not been built yet.
+        """
+        locations = self._locations
+        return locations[2] if locations is not None else None
+
+    def refresh_names(self) -> None:
+        """
+        Builds the event and location name indexes, or rebuilds them if the data they were built from is stale.
+        Waits for the rebuild, unlike the lookups, which keep serving the stale indexes in the meantime.
+        """
+        self._timeline_index(wait=True)
+        self._location_graph(wait=True)
+
+    def start_name_refresh(
+        self, interval: float = NAME_INDEX_REFRESH_INTERVAL, snapshot_dir: str | None = None
+    ) -> threading.Thread:
+        """
+        Starts a daemon thread that builds the name indexes right away, then checks every `interval` seconds
+        whether they need a rebuild. Lookups keep using the previous indexes while a rebuild runs.
+
+        Args:
+            interval (float): The seconds between checks
+            snapshot_dir (str | None): Where to save a snapshot of the world data after every rebuild, if given
+        """
+
+        def run():
+            stop = threading.Event()
+            while True:
+                try:
+                    timeline = self._timeline
+                    self.refresh_names()
+                    if snapshot_dir and self._timeline is not timeline:
+                        self.save_snapshot(snapshot_dir)
+                except Exception as e:
+                    print(f"Error refreshing the name indexes: {e}")
+                stop.wait(interval)
+
+        thread = threading.Thread(target=run, name="name-index-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def load_snapshot(self, directory: str = SNAPSHOT_DIR, max_age: float = SNAPSHOT_MAX_AGE) -> bool:
+        """
+        Installs the events, location graph and polities of the current snapshot as the in-memory indexes,
+        memory-mapped rather than read from Notion. With the local mirror, only a snapshot of the mirror's current
+        content is used; with the live API, only one younger than `max_age`, treated as current until the next
+        INDEX_TTL rebuild.
+
+        Args:
+            directory (str): The snapshot directory
+            max_age (float): The maximum age in seconds of a snapshot of the live API
+
+        Returns:
+            bool: Whether a snapshot was loaded
+        """
+        snapshot = read_snapshot(directory)
+        if snapshot is None:
+            return False
+        # Read before the state: a sync in between leaves the indexes installed below stale, so they are rebuilt
+        version = self._data_version()
+        if self.mirror is not None:
+            if snapshot.manifest.get("source_state") != self.mirror.content_state():
+                print(f"snapshot: ignoring {directory}, taken of another mirror state")
+                return False
+        elif time.time() - snapshot.manifest.get("created", 0) > max_age:
+            print(f"snapshot: ignoring {directory}, older than {max_age:.0f} seconds")
+            return False
+        events, graph = snapshot.events, snapshot.locations
+        try:
+            index = IntervalIndex(events.start_years, events.end_years)
+            event_names = NameIndex(events.ids, events.names)
+            location_names = NameIndex(graph.ids, graph.names)
+            polity_names = self._polity_names(snapshot.polities)
+        except Exception as e:
+            # A damaged snapshot falls back to building the indexes from the source, as without one
+            print(f"snapshot: ignoring {directory}, invalid: {e!r}")
+            return False
+        with self._timeline_lock:
+            self._timeline = (version, events, index, event_names)
+        with self._graph_lock:
+            self._locations = (version, graph, location_names)
+        with self._polity_lock:
+            self._polities = (version, snapshot.polities, polity_names)
+        return True
+
+    def save_snapshot(self, directory: str = SNAPSHOT_DIR) -> str:
+        """
+        Writes the current events, location graph and polities as a new snapshot, building any that is stale.
+
+        Args:
+            directory (str): The snapshot directory
+
+        Returns:
+            str: The path of the snapshot
+        """
+        # Read before the indexes: data newer than the recorded state only makes the snapshot rejected, never stale
+        source_state = self.mirror.content_state() if self.mirror is not None else None
+        events, _ = self._timeline_index(wait=True)
+        graph = self._location_graph(wait=True)
+        polities = self._polity_table(wait=True)
+        return write_snapshot(directory, events, graph, polities, source_state)
 
     def get_event_by_name(self, event_name: str) -> dict:
         """
         Gets an event by its name. Parses the event.
         """
         event = self._get_event_by_name(event_name)
-        event = self._parse_event(event)
+        event = self._materialize_event(event)
         return event
 
+    def get_event_by_id(self, event_id: str) -> dict:
+        """
+        Gets an event by its page ID. Parses the event.
+        """
+        return self._materialize_event(self._get_event_by_id(event_id))
+
     def get_similar_events_to_event(
-        self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True
-    ) -> tuple[dict, list[dict]]:
+        self,
+        event_name: str | None,
+        delta_year: int,
+        near: bool = True,
+        symmetric: bool = True,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        event_id: str | None = None,
+        semantic: bool = False,
+        limit: int | None = None,
+        with_similarities: bool = False,
+    ) -> tuple[dict, list[dict]] | tuple[dict, list[dict], list[float]]:
         """
         Gets similar events to the given event.
 
         Args:
-            event_name (str): The name of the event
+            event_name (str | None): The name of the event
             delta_year (int): The delta rangeyear of the event
             near (bool): Whether to include near locations
             symmetric (bool): Whether the delta year is symmetric around the event.
+            overlap (str): How events must relate to the year range, see get_similar_events_in_range
+            hops (int | None): The "Near" hop radius around the event's location, see get_similar_events_in_range
+            rank_by_distance (bool): Whether to rank the events by distance-weighted importance
+            event_id (str | None): The page ID of the event, used instead of `event_name`
+            semantic (bool): Whether to re-rank the events found in the year and location window by the cosine
+                similarity of their texts and event type to the event's, most similar first
+            limit (int | None): The maximum number of events to return, applied after any ranking
+            with_similarities (bool): Whether to also return the cosine similarity of each event to the event,
+                computed once with the semantic ranking
 
         Returns:
             dict: The event
             list[dict]: A list of dictionaries with the similar events
+            list[float]: Their similarities to the event, if `with_similarities`
         """
 
-        event = self._get_event_by_name(event_name)
+        event = self._get_event_by_id(event_id) if event_id else self._get_event_by_name(event_name)
+        if not event:
+            return []
 
-        start_year_event = self._extract_number(event, "Start Year")
-        end_year_event = self._extract_number(event, "End Year")
-        location_id_event = self._extract_relation(event, "Location")
-        location_event = self.client.pages.retrieve(page_id=location_id_event)
-        location_name_event = self._extract_name(location_event)
+        # The seed's Location relation is searched by ID: its page is never retrieved just for its name
+        start_year_search, end_year_search = self._search_window(event, delta_year, symmetric)
+        events = self.get_similar_events_in_range(
+            start_year=start_year_search,
+            end_year=end_year_search,
+            location_id=self._location_of(event),
+            near=near,
+            exclude_event=event["name"],
+            limit=None if semantic else limit,
+            overlap=overlap,
+            hops=hops,
+            rank_by_distance=rank_by_distance,
+        )
+        event = self._materialize_event(event)
+        return self._with_similarities(event, events, semantic, limit, with_similarities)
 
-        if end_year_event is None:
-            end_year_event = start_year_event
+    def get_similar_events_in_range(
+        self,
+        start_year: int,
+        end_year: int | None = None,
+        location: str | None = None,
+        near: bool = False,
+        exclude_event: str | None = None,
+        limit: int | None = None,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        location_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Gets similar events to the given location.
 
-        if symmetric:
-            start_year_search = start_year_event - delta_year
-            end_year_search = end_year_event + delta_year
-        else:
-            start_year_search = start_year_event - delta_year
-            end_year_search = end_year_event
+        Args:
+            start_year (int): The start year of the event
+            end_year (int | None): The end year of the event
+            location (str | None): The name of the location
+            near (bool): Whether to include near locations
+            exclude_event (str | None): The name of the event to exclude
+            limit (int | None): The maximum number of events to return. Defaults to every matching event.
+            overlap (str): How events must relate to the year range: "start" for events starting in it (default),
+                "overlap" for events sharing at least one year with it, "contained" for events lying entirely within it.
+                "overlap" and "contained" are answered from an in-memory interval index over the whole Timeline.
+            hops (int | None): The number of "Near" hops around the location to include, resolved on the in-memory
+                location graph. Defaults to 1 if `near` else 0.
+            rank_by_distance (bool): Whether to order the events by importance halved for every hop between their
+                location and `location`, instead of by query order. The limit then applies after ranking.
+            location_id (str | None): The page ID of the location, used instead of `location`
+        Returns:
+            list[dict]: A list of dictionaries with the event details
+        """
+        return list(
+            self.iter_similar_events_in_range(
+                start_year,
+                end_year=end_year,
+                location=location,
+                near=near,
+                exclude_event=exclude_event,
+                limit=limit,
+                overlap=overlap,
+                hops=hops,
+                rank_by_distance=rank_by_distance,
+                location_id=location_id,
+            )
+        )
 
-        if event:
-            event = self._parse_event(event)
-            event_name = event["name"]
+    def iter_similar_events_in_range(
+        self,
+        start_year: int,
+        end_year: int | None = None,
+        location: str | None = None,
+        near: bool = False,
+        exclude_event: str | None = None,
+        limit: int | None = None,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        location_id: str | None = None,
+    ) -> Iterator[dict]:
+        """
+        Lazily yields the parsed events of get_similar_events_in_range as their pages arrive.
+        Stop iterating (or pass `limit`) once enough events were collected; no further pages are fetched.
 
-            events = self.get_similar_events_in_range(
+        Args:
+            start_year (int): The start year of the event
+            end_year (int | None): The end year of the event
+            location (str | None): The name of the location
+            near (bool): Whether to include near locations
+            exclude_event (str | None): The name of the event to exclude
+            limit (int | None): The maximum number of events to yield
+            overlap (str): How events must relate to the year range, see get_similar_events_in_range
+            hops (int | None): The "Near" hop radius around the location, see get_similar_events_in_range
+            rank_by_distance (bool): Whether to rank the events by distance-weighted importance
+            location_id (str | None): The page ID of the location, used instead of `location`
+
+        Yields:
+            dict: The event details
+        """
+        distances = self._location_distances(location, near, hops, location_id)
+        for records in self._iter_records(
+            start_year, end_year, distances, exclude_event, limit, overlap, rank_by_distance
+        ):
+            # Resolve the relations of the whole batch concurrently before materializing it
+            self._prefetch_relations(records)
+            for record in records:
+                yield self._materialize_event(record)
+
+    def iter_query(
+        self,
+        database_id: str,
+        filter: dict | None = None,
+        page_size: int = 100,
+        limit: int | None = None,
+        priority: Priority = Priority.CONTEXT,
+    ) -> Iterator[dict]:
+        """
+        Iterates over the raw pages matching a database query, following `next_cursor` lazily.
+        The next page of results is requested in the background while the current one is consumed.
+
+        Args:
+            database_id (str): The ID of the database to query
+            filter (dict | None): The Notion filter of the query
+            page_size (int): The number of results requested per round trip (at most 100)
+            limit (int | None): The maximum number of pages to yield
+            priority (Priority): The scheduling priority of the requests
+
+        Yields:
+            dict: The raw page
+        """
+        for results in self.iter_query_batches(database_id, filter, page_size, limit, priority):
+            yield from results
+
+    def iter_query_batches(
+        self,
+        database_id: str,
+        filter: dict | None = None,
+        page_size: int = 100,
+        limit: int | None = None,
+        priority: Priority = Priority.CONTEXT,
+    ) -> Iterator[list[dict]]:
+        """
+        Like iter_query, but yields the results of each round trip as one list.
+
+        Yields:
+            list[dict]: The raw pages of one response
+        """
+        if limit is not None and limit <= 0:
+            return
+        query = {"database_id": database_id, "page_size": min(page_size, limit or 100, 100)}
+        if filter is not None:
+            query["filter"] = filter
+
+        yielded = 0
+        # Run in the caller's context, so that the requests are recorded on its trace span
+        call = tracing.copy_context_call(self._call)
+        pending = self._executor.submit(call, "databases.query", self.client.databases.query, priority, **query)
+        try:
+            while pending is not None:
+                response = pending.result()
+                pending = None
+                results = response.get("results", [])
+                if limit is not None:
+                    results = results[: limit - yielded]
+                yielded += len(results)
+                next_cursor = response.get("next_cursor")
+                if response.get("has_more") and next_cursor and (limit is None or yielded < limit):
+                    pending = self._executor.submit(
+                        call,
+                        "databases.query",
+                        self.client.databases.query,
+                        priority,
+                        **query,
+                        start_cursor=next_cursor,
+                    )
+                if results:
+                    yield results
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def aget_event_by_name(self, event_name: str) -> dict:
+        """
+        Async counterpart of get_event_by_name.
+        """
+        event = await self._aget_event_by_name(event_name)
+        return await self._amaterialize_event(event)
+
+    async def aget_event_by_id(self, event_id: str) -> dict:
+        """
+        Async counterpart of get_event_by_id.
+        """
+        event = await self._aget_event_by_id(event_id)
+        return await self._amaterialize_event(event)
+
+    async def aget_similar_events_to_event(
+        self,
+        event_name: str | None,
+        delta_year: int,
+        near: bool = True,
+        symmetric: bool = True,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        event_id: str | None = None,
+        semantic: bool = False,
+        limit: int | None = None,
+        with_similarities: bool = False,
+    ) -> tuple[dict, list[dict]] | tuple[dict, list[dict], list[float]]:
+        """
+        Async counterpart of get_similar_events_to_event. The seed event is materialized while its similar events
+        are being retrieved.
+        """
+        event = await (self._aget_event_by_id(event_id) if event_id else self._aget_event_by_name(event_name))
+        if not event:
+            return []
+
+        start_year_search, end_year_search = self._search_window(event, delta_year, symmetric)
+        event, events = await asyncio.gather(
+            self._amaterialize_event(event),
+            self.aget_similar_events_in_range(
                 start_year=start_year_search,
                 end_year=end_year_search,
-                location=location_name_event,
+                location_id=self._location_of(event),
                 near=near,
-                exclude_event=event_name,
+                exclude_event=event["name"],
+                limit=None if semantic else limit,
+                overlap=overlap,
+                hops=hops,
+                rank_by_distance=rank_by_distance,
+            ),
+        )
+        return self._with_similarities(event, events, semantic, limit, with_similarities)
+
+    async def aget_similar_events_to_events(
+        self,
+        event_ids: list[str],
+        delta_year: int,
+        near: bool = True,
+        symmetric: bool = True,
+        semantic: bool = False,
+        limit: int | None = None,
+        with_similarities: bool = False,
+    ) -> list[tuple[dict, list[dict]]] | list[tuple[dict, list[dict], list[float]]]:
+        """
+        Gets the similar events of several events at once, e.g. neighbours in time and space. The union of their
+        year windows and locations is queried once and its relations resolved once; each event then keeps the
+        results in its own window and location radius, as aget_similar_events_to_event would have returned them.
+
+        Args:
+            event_ids (list[str]): The page IDs of the events
+            delta_year (int): The delta range year of the events
+            near (bool): Whether to include near locations
+            symmetric (bool): Whether the delta year is symmetric around each event
+            semantic (bool): Whether to re-rank the similar events of each event by textual similarity to it,
+                see get_similar_events_to_event
+            limit (int | None): The maximum number of similar events of each event
+            with_similarities (bool): Whether to also return the similarity of each similar event to its event
+
+        Returns:
+            list[tuple]: Each event with its similar events, and their similarities if `with_similarities`, in order
+        """
+        seeds = await asyncio.gather(*(self._aget_event_by_id(event_id) for event_id in event_ids))
+        windows = [self._search_window(seed, delta_year, symmetric) for seed in seeds]
+        radii = [
+            await asyncio.to_thread(self._location_distances, None, near, None, self._location_of(seed))
+            for seed in seeds
+        ]
+
+        # An event without a location searches every location, and so does the shared query
+        union = None
+        if all(distances is not None for distances in radii):
+            union = {}
+            for distances in radii:
+                for location_id, hops in distances.items():
+                    union[location_id] = min(hops, union.get(location_id, hops))
+        events_filters = self._events_filters(
+            min(start for start, _ in windows), max(end for _, end in windows), union, None
+        )
+        records = [record async for batch in self._aiter_filtered_batches(events_filters, None) for record in batch]
+        retrieve = await self._aretrieve_relations(records + list(seeds))
+
+        materialized = {}
+        results = []
+        for seed, (start_year, end_year), distances in zip(seeds, windows, radii):
+            location_ids = {normalize_id(location_id) for location_id in distances} if distances is not None else None
+            events = []
+            for record in records:
+                if record["name"] == seed["name"] or record["start_year"] is None:
+                    continue
+                if not start_year <= record["start_year"] <= end_year:
+                    continue
+                if location_ids is not None and not any(
+                    normalize_id(location_id) in location_ids for location_id in record["location_ids"]
+                ):
+                    continue
+                if record["id"] not in materialized:
+                    materialized[record["id"]] = self._materialize_event(record, retrieve)
+                events.append(materialized[record["id"]])
+            results.append(events)
+        seeds = [self._materialize_event(seed, retrieve) for seed in seeds]
+        return [
+            self._with_similarities(seed, events, semantic, limit, with_similarities)
+            for seed, events in zip(seeds, results)
+        ]
+
+    async def aget_similar_events_in_range(
+        self,
+        start_year: int,
+        end_year: int | None = None,
+        location: str | None = None,
+        near: bool = False,
+        exclude_event: str | None = None,
+        limit: int | None = None,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        location_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Async counterpart of get_similar_events_in_range.
+        """
+        return [
+            event
+            async for event in self.aiter_similar_events_in_range(
+                start_year,
+                end_year=end_year,
+                location=location,
+                near=near,
+                exclude_event=exclude_event,
+                limit=limit,
+                overlap=overlap,
+                hops=hops,
+                rank_by_distance=rank_by_distance,
+                location_id=location_id,
             )
-            return event, events
-        else:
-            return []
+        ]
 
-    def get_similar_events_in_range(
+    async def aiter_similar_events_in_range(
         self,
         start_year: int,
         end_year: int | None = None,
         location: str | None = None,
         near: bool = False,
         exclude_event: str | None = None,
-    ):
+        limit: int | None = None,
+        overlap: str = "start",
+        hops: int | None = None,
+        rank_by_distance: bool = False,
+        location_id: str | None = None,
+    ) -> AsyncIterator[dict]:
         """
-        Gets similar events to the given location.
+        Async counterpart of iter_similar_events_in_range. The in-memory indexes are (re)built in a worker thread.
+        """
+        distances = await asyncio.to_thread(self._location_distances, location, near, hops, location_id)
+        if overlap == "start" and not rank_by_distance:
+            events_filters = self._events_filters(start_year, end_year, distances, exclude_event)
+            batches = self._aiter_filtered_batches(events_filters, limit)
+        else:
+            records = self._iter_records(
+                start_year, end_year, distances, exclude_event, limit, overlap, rank_by_distance
+            )
+            batches = await asyncio.to_thread(list, records)
+        async for records in self._as_async_iterator(batches):
+            retrieve = await self._aretrieve_relations(records)
+            for record in records:
+                yield self._materialize_event(record, retrieve)
+
+    async def aiter_query_batches(
+        self,
+        database_id: str,
+        filter: dict | None = None,
+        page_size: int = 100,
+        limit: int | None = None,
+        priority: Priority = Priority.CONTEXT,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Async counterpart of iter_query_batches.
+        """
+        if limit is not None and limit <= 0:
+            return
+        query = {"database_id": database_id, "page_size": min(page_size, limit or 100, 100)}
+        if filter is not None:
+            query["filter"] = filter
+
+        yielded = 0
+        query_fn = self._aclient.databases.query
+        pending = asyncio.ensure_future(self._acall("databases.query", query_fn, priority, **query))
+        try:
+            while pending is not None:
+                response = await pending
+                pending = None
+                results = response.get("results", [])
+                if limit is not None:
+                    results = results[: limit - yielded]
+                yielded += len(results)
+                next_cursor = response.get("next_cursor")
+                if response.get("has_more") and next_cursor and (limit is None or yielded < limit):
+                    pending = asyncio.ensure_future(
+                        self._acall("databases.query", query_fn, priority, **query, start_cursor=next_cursor)
+                    )
+                if results:
+                    yield results
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    @property
+    def _aclient(self) -> AsyncClient | Client | MirrorClient:
+        return self.async_client if self.async_client is not None else self.client
+
+    async def _acall(
+        self, endpoint: str, fn: Callable[..., Any], priority: Priority = Priority.CONTEXT, **kwargs
+    ) -> Any:
+        """
+        Async counterpart of _call. Works with both AsyncClient and plain client methods: without an async client,
+        e.g. reading the mirror, the blocking call runs in a thread, off the event loop.
+        """
+        fn = tracing.traced_notion_call(endpoint, fn)
+        if self.async_client is None:
+            blocking = tracing.copy_context_call(fn)
+
+            async def call(**kwargs) -> Any:
+                return await asyncio.to_thread(blocking, **kwargs)
+
+        else:
+
+            async def call(**kwargs) -> Any:
+                return await fn(**kwargs)
+
+        if self.scheduler is None:
+            return await call(**kwargs)
+        return await self.scheduler.acall(endpoint, call, priority, **kwargs)
+
+    async def _as_async_iterator(self, batches) -> AsyncIterator[list[dict]]:
+        if hasattr(batches, "__aiter__"):
+            async for batch in batches:
+                yield batch
+        else:
+            for batch in batches:
+                yield batch
+
+    async def _aiter_filtered_batches(self, filters: list[dict], limit: int | None) -> AsyncIterator[list[dict]]:
+        """
+        Async counterpart of _iter_filtered_batches.
+        """
+        seen = set()
+        for events_filter in filters:
+            remaining = None if limit is None else limit - len(seen)
+            if remaining is not None and remaining <= 0:
+                return
+            async for results in self.aiter_query_batches(TIMELINE_DATABASE_ID, filter=events_filter, limit=remaining):
+                results = [page for page in results if page["id"] not in seen]
+                seen.update(page["id"] for page in results)
+                if results:
+                    yield [self._event_record(page) for page in results]
+
+    async def _aget_event_by_name(self, event_name: str) -> dict | None:
+        event = self._indexed_event(event_name=event_name)
+        if event is not None:
+            return event
+        async for results in self.aiter_query_batches(
+            TIMELINE_DATABASE_ID, filter=self._name_filter(event_name), limit=1, priority=Priority.INTERACTIVE
+        ):
+            return self._event_record(results[0])
+        return None
+
+    async def _aget_event_by_id(self, event_id: str) -> dict:
+        event = self._indexed_event(event_id=event_id)
+        if event is not None:
+            return event
+        return self._event_record(await self._aretrieve_page(event_id, Priority.INTERACTIVE))
+
+    async def _aretrieve_page(self, page_id: str, priority: Priority = Priority.CONTEXT) -> dict:
+        page = self.cache.get(page_id)
+        if page is None:
+            page = await self._acall("pages.retrieve", self._aclient.pages.retrieve, priority, page_id=page_id)
+            self.cache.set(page_id, page)
+        return page
+
+    async def _aretrieve_pages(self, page_ids: list[str], pages: dict[str, dict | Exception]) -> None:
+        """
+        Retrieves the pages not in `pages` yet concurrently into it, by normalized ID, recording the error of
+        each page that could not be retrieved.
+        """
+        missing = [page_id for page_id in dict.fromkeys(page_ids) if normalize_id(page_id) not in pages]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def retrieve(page_id: str) -> None:
+            async with semaphore:
+                try:
+                    pages[normalize_id(page_id)] = await self._aretrieve_page(page_id)
+                except Exception as e:
+                    pages[normalize_id(page_id)] = e
+
+        await asyncio.gather(*(retrieve(page_id) for page_id in missing))
+
+    async def _aretrieve_relations(self, records: list[dict]) -> Callable[[str], dict]:
+        """
+        Retrieves the Location and Polity pages of the events, then the Near pages of those locations, without
+        blocking the event loop, and returns the page lookup to materialize the events with. The lookup only
+        reads the pages retrieved here, so materializing never makes a (blocking) Notion request on the loop,
+        even if a page was evicted from the cache since; it raises the error of a page that could not be retrieved.
+        """
+        await asyncio.to_thread(self._location_graph)
+        await asyncio.to_thread(self._load_polities, records)
+        pages: dict[str, dict | Exception] = {}
+        location_ids = self._unresolved_location_ids(records)
+        await self._aretrieve_pages(location_ids + self._unresolved_polity_ids(records), pages)
+        near_ids = [
+            near_id
+            for location_id in location_ids
+            if isinstance(pages.get(normalize_id(location_id)), dict)
+            for near_id in self._extract_multi_relation_ids(pages[normalize_id(location_id)], "Near")
+        ]
+        await self._aretrieve_pages(near_ids, pages)
+
+        def retrieve(page_id: str) -> dict:
+            page = pages.get(normalize_id(page_id))
+            if page is None:
+                raise KeyError(f"Page {page_id} was not retrieved")
+            if isinstance(page, Exception):
+                raise page
+            return page
+
+        return retrieve
+
+    async def _amaterialize_event(self, record: dict) -> dict:
+        """
+        Resolves the relations of the event record without blocking the event loop, then materializes it from
+        the pages retrieved.
+        """
+        return self._materialize_event(record, await self._aretrieve_relations([record]))
+
+    def get_nearest_events(
+        self,
+        year: int,
+        k: int = 10,
+        location: str | None = None,
+        near: bool = False,
+        exclude_event: str | None = None,
+        location_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Gets the events closest in time to the year, optionally restricted to a location and its near locations.
+        Events spanning the year come first. Answered from the in-memory interval index over the Timeline.
 
         Args:
-            start_year (int): The start year of the event
-            end_year (int | None): The end year of the event
+            year (int): The year
+            k (int): The number of events to return
             location (str | None): The name of the location
             near (bool): Whether to include near locations
             exclude_event (str | None): The name of the event to exclude
+            location_id (str | None): The page ID of the location, used instead of `location`
+
         Returns:
-            list[dict]: A list of dictionaries with the event details
+            list[dict]: A list of dictionaries with the event details, closest first
         """
-        location_id = None
-        location_result = None  # To pass to _parse_event later
-        near_location_ids = []  # Initialize for safety
-
-        if location:
-            # Query the Location database to find the main location by its name
-            location_query_results = self.client.databases.query(
-                **{
-                    "database_id": LOCATION_DATABASE_ID,
-                "filter": {
-                        "property": "Name",  # Assuming "Name" is the title property
-                        "title": {"equals": location},
-                    },
-                }
-            ).get("results", [])
+        store, index = self._timeline_index()
+        distances = self._location_distances(location, near, None, location_id)
+
+        # Widen the candidate set until enough of the nearest events pass the location filter
+        wanted = k
+        while True:
+            positions = index.nearest(year, wanted)
+            selected = store.select(positions, distances, exclude_event)
+            if len(selected) >= k or len(positions) < wanted:
+                break
+            wanted *= 2
+        records = [store.record(position) for position in selected[:k].tolist()]
+        self._prefetch_relations(records)
+        return [self._materialize_event(record) for record in records]
+
+    def incomplete_events(self) -> list[dict]:
+        """
+        Gets the records of every Timeline event with an empty Description or Excerpt, in Timeline order.
+        Answered from the in-memory Timeline index, built with one bulk read if needed.
 
-            if location_query_results:  # If the main location was found
-                location_id = location_query_results[0]["id"]
-                location_result = location_query_results[0]  # Save the full page object
-                if near:
-                    # If near=True, get IDs of locations related via the 'Near' property
-                    near_location_ids = self._extract_multi_relation_ids(location_result, "Near")
+        Returns:
+            list[dict]: The event records, with their relations as page IDs
+        """
+        store, _ = self._timeline_index()
+        descriptions, excerpts = store.descriptions.to_list(), store.excerpts.to_list()
+        return [
+            store.record(position)
+            for position in range(len(store))
+            if not (descriptions[position] or "").strip() or not (excerpts[position] or "").strip()
+        ]
+
+    def get_location_hops(self, location: str | None, hops: int = 2) -> dict[str, int]:
+        """
+        Gets the "Near" hop distance of every location name within the radius of a location.
 
+        Args:
+            location (str | None): The name of the location
+            hops (int): The hop radius
+
+        Returns:
+            dict[str, int]: The hop distance of each location name, empty if the location is unknown
+        """
+        if not location:
+            return {}
+        graph = self._location_graph()
+        node = graph.node_by_name(location)
+        if node is None:
+            return {}
+        return {
+            graph.names[other]: distance for other, distance in graph.k_hop(node, hops).items() if graph.names[other]
+        }
+
+    def near_location_ids(self, location_id: str, hops: int = 1) -> set[str]:
+        """
+        Gets the normalized page IDs of the locations within `hops` "Near" hops of a location, itself included,
+        on the location graph.
+        """
+        distances = self._location_distances(None, True, hops, location_id) or {}
+        return {normalize_id(near_id) for near_id in distances}
+
+    async def aget_location_hops(self, location: str | None, hops: int = 2) -> dict[str, int]:
+        """
+        Async counterpart of get_location_hops. The graph is built off the event loop.
+        """
+        return await asyncio.to_thread(self.get_location_hops, location, hops)
+
+    def _timeline_index(self, wait: bool = False) -> tuple[EventStore, IntervalIndex]:
+        """
+        Returns every Timeline event and an interval index over their years. Built on first use and rebuilt when
+        the mirror is synced, or after INDEX_TTL seconds when reading from the live API. A stale index is returned
+        as is while it is rebuilt in the background, see _current_index.
+
+        Args:
+            wait (bool): Whether to wait for the rebuild of a stale index instead
+
+        Returns:
+            EventStore: The events, stored column by column. The raw pages are dropped as they are read.
+            IntervalIndex: The index, whose positions refer to the rows of the store
+        """
+
+        def build(version: int) -> tuple:
+            pages = self.iter_query(TIMELINE_DATABASE_ID, priority=Priority.BULK)
+            store = EventStore.from_records(self._event_record(page) for page in pages)
+            index = IntervalIndex(store.start_years, store.end_years)
+            return version, store, index, NameIndex(store.ids, store.names)
+
+        timeline = self._current_index("_timeline", self._timeline_lock, build, wait)
+        return timeline[1], timeline[2]
+
+    def _indexed_event(self, event_id: str | None = None, event_name: str | None = None) -> dict | None:
+        """
+        Looks up an event record by page ID or exact name in the in-memory Timeline index, if it is loaded.
+        """
+        timeline = self._loaded_timeline()
+        if timeline is None:
+            return None
+        store, names = timeline
+        if event_id is None:
+            event_id = names.id_of(event_name)
+        position = names.position(event_id) if event_id is not None else None
+        return store.record(position) if position is not None else None
+
+    def _loaded_timeline(self) -> tuple[EventStore, NameIndex] | None:
+        """
+        Returns every Timeline event and their name index if the in-memory index is built and current,
+        without building it.
+        """
+        timeline = self._timeline
+        if timeline is None or timeline[0] != self._data_version():
+            return None
+        return timeline[1], timeline[3]
+
+    def _location_graph(self, wait: bool = False) -> LocationGraph:
+        """
+        Returns the "Near" graph of every location. Built on first use and rebuilt like the Timeline index:
+        a stale graph keeps answering until the new one is installed.
+        """
+
+        def build(version: int) -> tuple:
+            location_pages = list(self.iter_query(LOCATION_DATABASE_ID, priority=Priority.BULK))
+            graph = LocationGraph(location_pages)
+            return version, graph, NameIndex(graph.ids, graph.names)
+
+        return self._current_index("_locations", self._graph_lock, build, wait)[1]
+
+    def _polity_table(self, wait: bool = False) -> dict[str, dict]:
+        """
+        Returns every parsed polity by normalized page ID. Built on first use and rebuilt like the Timeline index.
+        """
+
+        def build(version: int) -> tuple:
+            pages = self.iter_query(POLITY_DATABASE_ID, priority=Priority.BULK)
+            polities = {normalize_id(page["id"]): self._parse_polity(page) for page in pages}
+            return version, polities, self._polity_names(polities)
+
+        return self._current_index("_polities", self._polity_lock, build, wait)[1]
+
+    def _polity_names(self, polities: dict[str, dict]) -> NameIndex:
+        return NameIndex(list(polities), [polity["name"] for polity in polities.values()])
+
+    def _loaded_polities(self) -> dict[str, dict]:
+        """
+        Returns the polity table last built, even if a rebuild is due, without building it; otherwise an empty table.
+        """
+        polities = self._polities
+        return polities[1] if polities is not None else {}
+
+    def _load_polities(self, records: list[dict]) -> None:
+        """
+        Builds the polity table if any of the events has polities, so that they are resolved from the one bulk read
+        of the Polity database rather than retrieved page by page.
+        """
+        if any(record["polity_ids"] for record in records):
+            self._polity_table()
+
+    def _current_index(
+        self, attribute: str, lock: threading.Lock, build: Callable[[int], tuple], wait: bool = False
+    ) -> tuple:
+        """
+        Returns an in-memory index, a tuple starting with the data version it was built from, building it on
+        first use. A stale index is served as is while a single background thread rebuilds it and installs the
+        new one, so that interactive requests never wait on a full BULK scan once the index has been built.
+
+        Args:
+            attribute (str): The attribute holding the index
+            lock (threading.Lock): The lock serializing its builds
+            build (Callable[[int], tuple]): Builds the index for a data version
+            wait (bool): Whether to wait for the rebuild of a stale index instead
+
+        Returns:
+            tuple: The index
+        """
+        version = self._data_version()
+        current = getattr(self, attribute)
+        if current is not None and current[0] == version:
+            return current
+        if current is not None and not wait:
+            self._start_rebuild(attribute, lock, build)
+            return current
+        with lock:
+            current = getattr(self, attribute)
+            if current is None or current[0] != version:
+                current = build(version)
+                setattr(self, attribute, current)
+            return current
+
+    def _start_rebuild(self, attribute: str, lock: threading.Lock, build: Callable[[int], tuple]) -> None:
+        """
+        Rebuilds a stale index in a daemon thread, unless a rebuild of it is already running.
+        """
+        with self._rebuild_lock:
+            if attribute in self._rebuilding:
+                return
+            self._rebuilding.add(attribute)
+
+        def run():
+            try:
+                self._current_index(attribute, lock, build, wait=True)
+            except Exception as e:
+                # The stale index keeps being served; the next lookup tries again
+                print(f"Error rebuilding {attribute.lstrip('_')}: {e}")
+            finally:
+                with self._rebuild_lock:
+                    self._rebuilding.discard(attribute)
+
+        threading.Thread(target=run, name=f"rebuild{attribute}", daemon=True).start()
+
+    def _data_version(self) -> int:
+        """
+        Returns a token that changes whenever indexes built from the source data should be rebuilt.
+        """
+        if self.mirror is not None:
+            return self.mirror.current_version()
+        return int(time.monotonic() // INDEX_TTL)
+
+    def _location_distances(
+        self, location: str | None, near: bool, hops: int | None, location_id: str | None = None
+    ) -> dict[str, int] | None:
+        """
+        Resolves a location to the IDs of every location within the hop radius, on the location graph.
+
+        Args:
+            location (str | None): The name of the location
+            near (bool): Whether to include near locations
+            hops (int | None): The hop radius. Defaults to 1 if `near` else 0.
+            location_id (str | None): The page ID of the location, used instead of `location`
+
+        Returns:
+            dict[str, int] | None: The hop distance of each location ID, or None if no location was given
+                or its name was not found (the search then spans every location)
+        """
+        if not location and not location_id:
+            return None
+        if hops is None:
+            hops = 1 if near else 0
+        graph = self._location_graph()
+        node = graph.node(location_id) if location_id else graph.node_by_name(location)
+        if node is None:
+            # A location created since the graph was built still restricts the search to itself
+            return {location_id: 0} if location_id else None
+        return {graph.ids[other]: distance for other, distance in graph.k_hop(node, hops).items()}
+
+    def _iter_records(
+        self,
+        start_year: int,
+        end_year: int | None,
+        distances: dict[str, int] | None,
+        exclude_event: str | None,
+        limit: int | None,
+        overlap: str,
+        rank_by_distance: bool,
+    ) -> Iterator[list[dict]]:
+        """
+        Yields the event records of a range search in batches, from the Notion query or from the interval index.
+        """
+        if rank_by_distance:
+            records = [
+                record
+                for batch in self._iter_records(start_year, end_year, distances, exclude_event, None, overlap, False)
+                for record in batch
+            ]
+            records = self._rank_by_distance(records, distances)[:limit]
+            for i in range(0, len(records), 100):
+                yield records[i : i + 100]
+        elif overlap == "start":
+            yield from self._iter_filtered_batches(
+                self._events_filters(start_year, end_year, distances, exclude_event), limit
+            )
+        else:
+            yield from self._iter_indexed_batches(
+                self._timeline_index(), start_year, end_year, distances, exclude_event, limit, overlap
+            )
+
+    def _iter_filtered_batches(self, filters: list[dict], limit: int | None) -> Iterator[list[dict]]:
+        """
+        Runs the Timeline queries one after another, dropping events already returned by a previous one.
+        """
+        seen = set()
+        for events_filter in filters:
+            remaining = None if limit is None else limit - len(seen)
+            if remaining is not None and remaining <= 0:
+                return
+            for results in self.iter_query_batches(TIMELINE_DATABASE_ID, filter=events_filter, limit=remaining):
+                results = [page for page in results if page["id"] not in seen]
+                seen.update(page["id"] for page in results)
+                if results:
+                    yield [self._event_record(page) for page in results]
+
+    def _iter_indexed_batches(
+        self,
+        timeline: tuple[EventStore, IntervalIndex],
+        start_year: int,
+        end_year: int | None,
+        distances: dict[str, int] | None,
+        exclude_event: str | None,
+        limit: int | None,
+        overlap: str,
+    ) -> Iterator[list[dict]]:
+        """
+        Yields the event records matching a year range query on the interval index, in batches of 100.
+        """
+        if overlap not in OVERLAP_MODES:
+            raise ValueError(f"Unknown overlap mode {overlap!r}, expected one of {OVERLAP_MODES}")
+        store, index = timeline
+        positions = store.select(index.query(start_year, end_year, overlap), distances, exclude_event)[:limit]
+        for i in range(0, len(positions), 100):
+            yield [store.record(position) for position in positions[i : i + 100].tolist()]
+
+    def _rank_by_distance(self, records: list[dict], distances: dict[str, int] | None) -> list[dict]:
+        """
+        Orders event records by importance, halved for every "Near" hop between their location and the searched one.
+        """
+        normalized = {normalize_id(location_id): hops for location_id, hops in (distances or {}).items()}
+        farthest = max(normalized.values(), default=0) + 1
+
+        def score(record: dict) -> float:
+            location_id = self._location_of(record)
+            hops = normalized.get(normalize_id(location_id), farthest) if location_id else farthest
+            return (record["importance"] or 0) * 0.5**hops
+
+        return sorted(records, key=score, reverse=True)
+
+    def _rank_by_similarity(self, event: dict, events: list[dict]) -> tuple[list[dict], list[float]]:
+        """
+        Orders parsed events by the cosine similarity of their TF-IDF vectors to the event's, ties in query order.
+
+        Returns:
+            list[dict]: The events, most similar first
+            list[float]: Their similarities, in the same order
+        """
+        scores = similarity_scores(event, events)
+        order = sorted(range(len(events)), key=lambda i: -scores[i])
+        return [events[i] for i in order], [scores[i] for i in order]
+
+    def _with_similarities(
+        self, event: dict, events: list[dict], semantic: bool, limit: int | None, with_similarities: bool
+    ) -> tuple[dict, list[dict]] | tuple[dict, list[dict], list[float]]:
+        """
+        Ranks the similar events of an event by similarity if `semantic`, keeps the first `limit`, and pairs them
+        with their similarities if `with_similarities`. The similarities are computed at most once.
+        """
+        if semantic:
+            events, scores = self._rank_by_similarity(event, events)
+        elif with_similarities:
+            scores = similarity_scores(event, events)
+        if not with_similarities:
+            return event, events[:limit]
+        return event, events[:limit], scores[:limit]
+
+    def _name_filter(self, name: str) -> dict:
+        # Assuming "Name" is the title property
+        return {"property": "Name", "title": {"equals": name}}
+
+    def _search_window(self, record: dict, delta_year: int, symmetric: bool) -> tuple[int, int]:
+        """
+        Computes the year range searched for events similar to the event.
+
+        Args:
+            record (dict): The event record
+            delta_year (int): The delta range year of the event
+            symmetric (bool): Whether the delta year is symmetric around the event.
+
+        Returns:
+            tuple[int, int]: The start and end year of the search
+        """
+        start_year_event = record["start_year"]
+        end_year_event = record["end_year"]
+
+        if end_year_event is None:
+            end_year_event = start_year_event
+
+        if symmetric:
+            start_year_search = start_year_event - delta_year
+            end_year_search = end_year_event + delta_year
+        else:
+            start_year_search = start_year_event - delta_year
+            end_year_search = end_year_event
+        return start_year_search, end_year_search
+
+    def _events_filters(
+        self,
+        start_year: int | None,
+        end_year: int | None,
+        distances: dict[str, int] | None,
+        exclude_event: str | None,
+    ) -> list[dict]:
+        """
+        Builds the Timeline database filters of a range search. Wide hop radii are split into several filters
+        so that no compound filter exceeds MAX_LOCATION_FILTERS location conditions.
+        """
+        location_ids = list(distances) if distances else []
+        if len(location_ids) <= MAX_LOCATION_FILTERS:
+            return [self._events_filter(start_year, end_year, distances, exclude_event)]
+        return [
+            self._events_filter(
+                start_year, end_year, location_ids[i : i + MAX_LOCATION_FILTERS], exclude_event
+            )
+            for i in range(0, len(location_ids), MAX_LOCATION_FILTERS)
+        ]
+
+    def _events_filter(
+        self,
+        start_year: int | None,
+        end_year: int | None,
+        location_ids: Iterable[str] | None,
+        exclude_event: str | None,
+    ) -> dict:
+        """
+        Builds the Timeline database filter for events starting in a year range at any of the locations.
+        Pass None for both years to filter by location and exclusion only.
+        """
         # --- Construct the filter for the main events query ---
         top_level_and_filters = []
 
         # 1. Add year-based filters
-        top_level_and_filters.append({"property": "Start Year", "number": {"greater_than_or_equal_to": start_year}})
+        if start_year is not None:
+            top_level_and_filters.append(
+                {"property": "Start Year", "number": {"greater_than_or_equal_to": start_year}}
+            )
         if end_year is not None:
             top_level_and_filters.append({"property": "Start Year", "number": {"less_than_or_equal_to": end_year}})
 
@@ -138,12 +1313,7 @@ class EventsExtractor:
         location_or_sub_filters = []
 
         # Collect all unique location IDs that should be part of the OR condition
-        unique_ids_for_location_or_clause = set()
-        if location_id:
-            unique_ids_for_location_or_clause.add(location_id)
-        # near_location_ids is already a list of IDs (or empty)
-        for nid in near_location_ids:
-            unique_ids_for_location_or_clause.add(nid)
+        unique_ids_for_location_or_clause = dict.fromkeys(location_ids or [])
 
         for loc_id_for_or_filter in unique_ids_for_location_or_clause:
             location_or_sub_filters.append(
@@ -162,36 +1332,141 @@ class EventsExtractor:
                 # If multiple location conditions, wrap them in an 'or'
                 top_level_and_filters.append({"or": location_or_sub_filters})
 
-        # 4. Construct the final query payload for the Events database
-        final_events_query_payload = {"database_id": TIMELINE_DATABASE_ID}
-        if top_level_and_filters:  # Should always be true if start_year is mandatory
-            final_events_query_payload["filter"] = {"and": top_level_and_filters}
+        return {"and": top_level_and_filters}
 
-        raw_events: list[dict] = self.client.databases.query(**final_events_query_payload).get("results", [])
-
-        # --- Parse results ---
-        events = []
-        for raw_event in raw_events:
-            # location_result is the page object for the main 'location', or None
-            # near_location_ids is the list of IDs for 'near' locations
-            events.append(self._parse_event(raw_event))
-
-        return events
-    
     def _get_event_by_name(self, event_name: str) -> dict | None:
         """
-        Gets an event by its name. Does not parse the event.
+        Gets the record of an event by its name. Answered from the in-memory Timeline index when it is loaded,
+        otherwise by a title query.
 
         Args:
             event_name (str): The name of the event
 
         Returns:
-            dict: The event
+            dict | None: The event record, None if no event has that name
         """
-        event = self.client.databases.query(
-            **{"database_id": TIMELINE_DATABASE_ID, "filter": {"property": "Name", "title": {"equals": event_name}}}
+        event = self._indexed_event(event_name=event_name)
+        if event is not None:
+            return event
+        page = next(
+            self.iter_query(
+                TIMELINE_DATABASE_ID, filter=self._name_filter(event_name), limit=1, priority=Priority.INTERACTIVE
+            ),
+            None,
         )
-        return event.get("results", [])[0] if event.get("results", []) else None
+        return self._event_record(page) if page is not None else None
+
+    def _get_event_by_id(self, event_id: str) -> dict:
+        """
+        Gets the record of an event by its page ID. Answered from the in-memory Timeline index when it is loaded,
+        otherwise by a (cached) page retrieval.
+
+        Args:
+            event_id (str): The page ID of the event
+
+        Returns:
+            dict: The event record
+        """
+        event = self._indexed_event(event_id=event_id)
+        if event is not None:
+            return event
+        return self._event_record(self._retrieve_page(event_id, Priority.INTERACTIVE))
+
+    def _retrieve_page(self, page_id: str, priority: Priority = Priority.CONTEXT) -> dict:
+        """
+        Retrieves a page by its ID, going through the related page cache.
+
+        Args:
+            page_id (str): The ID of the page
+            priority (Priority): The scheduling priority of the request on a cache miss
+
+        Returns:
+            dict: The page
+        """
+        page = self.cache.get(page_id)
+        if page is None:
+            page = self._call("pages.retrieve", self.client.pages.retrieve, priority, page_id=page_id)
+            self.cache.set(page_id, page)
+        return page
+
+    def _call(self, endpoint: str, fn: Callable[..., Any], priority: Priority = Priority.CONTEXT, **kwargs) -> Any:
+        """
+        Calls a Notion client method through the scheduler: identical requests in flight are shared, and the rest
+        are rate limited in priority order, retrying rate limited requests.
+
+        Args:
+            endpoint (str): The name of the endpoint, e.g. "pages.retrieve"
+            fn (Callable): The client method
+            priority (Priority): The scheduling priority
+        """
+        # Wrapped inside the scheduler, so that only the request itself is timed, not its wait for a token
+        fn = tracing.traced_notion_call(endpoint, fn)
+        if self.scheduler is None:
+            return fn(**kwargs)
+        return self.scheduler.call(endpoint, fn, priority, **kwargs)
+
+    def _prefetch_pages(self, page_ids: list[str]) -> None:
+        """
+        Retrieves the pages that are not cached yet concurrently, so the parsing that follows hits the cache.
+        Failures are left for the sequential retrieval to report.
+
+        Args:
+            page_ids (list[str]): The IDs of the pages
+        """
+        missing = [page_id for page_id in dict.fromkeys(page_ids) if page_id not in self.cache]
+        if len(missing) < 2:
+            return
+        retrieve = tracing.copy_context_call(self._retrieve_page)
+        wait([self._executor.submit(retrieve, page_id) for page_id in missing])
+
+    def _prefetch_relations(self, records: list[dict]) -> None:
+        """
+        Resolves the Location and Polity pages of the events, then the Near pages of those locations,
+        one concurrent round per level.
+
+        Args:
+            records (list[dict]): The event records
+        """
+        self._load_polities(records)
+        location_ids = self._unresolved_location_ids(records)
+        polity_ids = self._unresolved_polity_ids(records)
+        self._prefetch_pages(location_ids + polity_ids)
+        self._prefetch_pages(self._near_ids(location_ids))
+
+    def _unresolved_location_ids(self, records: list[dict]) -> list[str]:
+        """
+        Returns the Location IDs of the events that the location graph cannot resolve without a retrieval.
+        """
+        graph = self._locations[1] if self._locations else None
+        location_ids = [self._location_of(record) for record in records]
+        return [
+            location_id
+            for location_id in location_ids
+            if location_id and (graph is None or graph.node(location_id) is None)
+        ]
+
+    def _unresolved_polity_ids(self, records: list[dict]) -> list[str]:
+        """
+        Returns the Polity IDs of the events that are not in the polity table.
+        """
+        polities = self._loaded_polities()
+        return [
+            polity_id
+            for record in records
+            for polity_id in record["polity_ids"]
+            if normalize_id(polity_id) not in polities
+        ]
+
+    def _near_ids(self, location_ids: list[str]) -> list[str]:
+        """
+        Returns the Near IDs of the cached location pages.
+        """
+        near_ids = []
+        for location_id in location_ids:
+            location = self.cache.get(location_id)
+            if location is not None:
+                near_ids.extend(self._extract_multi_relation_ids(location, "Near"))
+        return near_ids
 
     def _parse_event(self, raw_event: dict) -> dict:
         """
@@ -203,35 +1478,96 @@ class EventsExtractor:
         Returns:
             dict: A dictionary with the event details
         """
+        return self._materialize_event(self._event_record(raw_event))
 
-        # query the location database to get the location object
-        location_id = self._extract_relation(raw_event, "Location")
+    def _event_record(self, raw_event: dict) -> dict:
+        """
+        Flattens a raw event into a record of its own fields, with its relations as page IDs (see store.EventStore).
+        Years and importance are kept as stored in Notion, including zeros.
+
+        Args:
+            raw_event (dict): The raw event data from Notion
 
-        if location_id:
-            location = self.client.pages.retrieve(page_id=location_id)
-            location = self._parse_location(location)
+        Returns:
+            dict: The event record
+        """
+        return {
+            "id": raw_event["id"],
+            "name": self._extract_name(raw_event),
+            "start_year": self._extract_year(raw_event, "Start Year"),
+            "end_year": self._extract_year(raw_event, "End Year"),
+            "event_type": self._extract_select(raw_event, "Event Type"),
+            "importance": self._extract_year(raw_event, "Importance"),
+            "description": self._extract_rich_text(raw_event, "Description"),
+            "excerpt": self._extract_rich_text(raw_event, "Excerpt"),
+            "location_ids": self._extract_multi_relation_ids(raw_event, "Location"),
+            "polity_ids": self._extract_multi_relation_ids(raw_event, "Polity"),
+        }
+
+    def _location_of(self, record: dict) -> str | None:
+        """
+        Returns the ID of the event's location, the first page of its Location relation.
+        """
+        return record["location_ids"][0] if record["location_ids"] else None
+
+    def _materialize_event(self, record: dict, retrieve: Callable[[str], dict] | None = None) -> dict:
+        """
+        Builds the nested event dictionary sent to prompts and the UI from an event record, resolving its
+        location (with the names of the near locations) and polities.
+
+        Args:
+            record (dict): The event record
+            retrieve (Callable[[str], dict] | None): Looks up the related pages by ID, e.g. the pages retrieved by
+                _aretrieve_relations. Defaults to retrieving them from the cache or Notion.
+
+        Returns:
+            dict: A dictionary with the event details
+        """
+
+        # query the location database to get the location object
+        location_id = self._location_of(record)
+        polity_ids = record["polity_ids"]
+        if retrieve is None:
+            self._load_polities([record])
+            self._prefetch_pages(self._unresolved_location_ids([record]) + self._unresolved_polity_ids([record]))
+            retrieve = self._retrieve_page
+
+        # The location graph, when built, holds every location with its near names
+        graph = self._locations[1] if self._locations else None
+        location_node = graph.node(location_id) if graph is not None and location_id else None
+
+        if location_node is not None:
+            location = graph.location(location_node)
+        elif location_id:
+            location = retrieve(location_id)
+            location = self._parse_location(location, retrieve)
         else:
             location = None
 
-        polity_ids = self._extract_multi_relation_ids(raw_event, "Polity")
         if polity_ids:
+            # The polity table holds every parsed polity, unless the page was created since it was built
+            polity_table = self._loaded_polities()
             polities = []
             for polity_id in polity_ids:
-                polity = self.client.pages.retrieve(page_id=polity_id)
-                polity = self._parse_polity(polity)
+                polity = polity_table.get(normalize_id(polity_id))
+                if polity is None:
+                    polity = retrieve(polity_id)
+                    polity = self._parse_polity(polity)
                 polities.append(polity)
         else:
             polities = None
 
+        tracing.count("events_parsed")
+        # Zero years and importance read as missing, as _extract_number reports them
         return {
-            #            "id": raw_event['id'],
-            "name": self._extract_name(raw_event),
-            "start_year": self._extract_number(raw_event, "Start Year"),
-            "end_year": self._extract_number(raw_event, "End Year"),
-            "event_type": self._extract_select(raw_event, "Event Type"),
-            "importance": self._extract_number(raw_event, "Importance"),
-            "description": self._extract_rich_text(raw_event, "Description"),
-            "excerpt": self._extract_rich_text(raw_event, "Excerpt"),
+            #            "id": record['id'],
+            "name": record["name"],
+            "start_year": record["start_year"] or None,
+            "end_year": record["end_year"] or None,
+            "event_type": record["event_type"],
+            "importance": record["importance"] or None,
+            "description": record["description"],
+            "excerpt": record["excerpt"],
             "location": location,
             "polities": polities,
         }
@@ -276,7 +1612,9 @@ class EventsExtractor:
                 ]
         return []
 
-    def _extract_multi_relation(self, raw_event: dict, property_name: str) -> list[dict]:
+    def _extract_multi_relation(
+        self, raw_event: dict, property_name: str, retrieve: Callable[[str], dict] | None = None
+    ) -> list[dict]:
         """
         Extracts the names of all related pages from a multi-relation property in raw_event.properties[property_name]
         and returns a list of dictionaries with the page ID and name.
@@ -284,6 +1622,7 @@ class EventsExtractor:
         Args:
             raw_event (dict): The raw event data from Notion
             property_name (str): The name of the multi-relation property to extract
+            retrieve (Callable[[str], dict] | None): Looks up the related pages by ID, see _materialize_event
 
         Returns:
             list[dict]: A list of dictionaries with the page ID and name of the related pages
@@ -296,9 +1635,12 @@ class EventsExtractor:
         if not relation_ids:
             return []
 
+        if retrieve is None:
+            self._prefetch_pages(relation_ids)
+            retrieve = self._retrieve_page
         for r_id in relation_ids:
             try:
-                entity = self.client.pages.retrieve(page_id=r_id)
+                entity = retrieve(r_id)
 
                 name = None
                 # Ensure 'Name' property and 'title' array exist and are not empty
@@ -356,6 +1698,13 @@ class EventsExtractor:
             else None
         )
 
+    def _extract_year(self, raw_event: dict, property_name: str) -> float | None:
+        """
+        Extracts a number property as stored, e.g. a year, keeping 0 (which _extract_number reports as None).
+        """
+        prop = raw_event["properties"].get(property_name)
+        return prop.get("number") if prop else None
+
     def _extract_select(self, raw_event: dict, property_name: str) -> str:
         """
         Extracts the name of the select property from the raw_event.
@@ -372,12 +1721,12 @@ class EventsExtractor:
             else None
         )
 
-    def _parse_location(self, location_result: dict) -> dict:
+    def _parse_location(self, location_result: dict, retrieve: Callable[[str], dict] | None = None) -> dict:
         return {
             #            "id": location_result['id'],
             "name": self._extract_name(location_result),
             "biome": self._extract_select(location_result, "Biome"),
-            "near": self._extract_multi_relation(location_result, "Near"),
+            "near": self._extract_multi_relation(location_result, "Near", retrieve),
         }
 
     def _parse_polity(self, polity_result: dict) -> dict:
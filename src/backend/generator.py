@@ -1,12 +1,77 @@
+import asyncio
+import dataclasses
 import json
-from src.backend.llm import LLM
+from concurrent.futures import Future
+from typing import AsyncIterator, Coroutine
+from src.backend.aio import BackgroundIterator, amerge, get_background_loop
+from src.backend.constants import CANDIDATE_TEMPERATURE_SPREAD
+from src.backend.context import ContextPacker, PackedContext, compact_json
+from src.backend.llm import LLM, StreamUpdate
 from src.backend.events import EventsExtractor
 from src.backend.schemas import Event
+from src.backend import tracing
+
+# The sampling temperature of generations; candidates generated together are spread around it
+TEMPERATURE = 0.7
+
+# The schema and tool definitions never change, so they are built once and sent as a cached prompt prefix.
+EVENT_SCHEMA = Event.model_json_schema()
+
+SIMILAR_EVENT_TOOL_NAME = "generate_similar_event"
+COMPLETE_EVENT_TOOL_NAME = "complete_event"
+EVENT_IN_RANGE_TOOL_NAME = "generate_event_in_range"
+
+SIMILAR_EVENT_TOOLS = [
+    {
+        "name": SIMILAR_EVENT_TOOL_NAME,
+        "description": "Generate a similar event to the given event. The event should be a single event, not a list of events.",
+        "input_schema": EVENT_SCHEMA,
+    }
+]
+COMPLETE_EVENT_TOOLS = [
+    {
+        "name": COMPLETE_EVENT_TOOL_NAME,
+        "description": "Complete the event. The event should be a single event, not a list of events.",
+        "input_schema": EVENT_SCHEMA,
+    }
+]
+EVENT_IN_RANGE_TOOLS = [
+    {
+        "name": EVENT_IN_RANGE_TOOL_NAME,
+        "description": "Generate a new event within a given time range. The event should be a single event, not a list of events.",
+        "input_schema": EVENT_SCHEMA,
+    }
+]
+
+def candidate_temperatures(n_candidates: int, spread: float = CANDIDATE_TEMPERATURE_SPREAD) -> list[float]:
+    """
+    Returns the sampling temperature of each of `n_candidates` generated from the same prompt, evenly spread
+    from TEMPERATURE - spread to TEMPERATURE + spread (within [0, 1]), so that the candidates differ.
+    The Messages API takes no seed, so temperature is what varies.
+    """
+    if n_candidates == 1:
+        return [TEMPERATURE]
+    low, high = max(TEMPERATURE - spread, 0.0), min(TEMPERATURE + spread, 1.0)
+    return [round(low + (high - low) * i / (n_candidates - 1), 3) for i in range(n_candidates)]
+
 
 class Generator:
-    def __init__(self):
-        self.llm = LLM()
-        self.events_extractor = EventsExtractor()
+    """
+    Generates events with the LLM from context retrieved by the EventsExtractor.
+
+    The async methods (agenerate_similar_event, acomplete_event, agenerate_event_in_range) do the work;
+    the sync methods run them on the process-wide background event loop, so concurrent Streamlit
+    sessions share one loop instead of each holding a thread for the whole round trip.
+
+    Every method takes `n_candidates` to generate several versions of the event at once: the context is
+    retrieved and packed once, then the LLM calls are made concurrently, so N candidates take about as long as one.
+    """
+
+    def __init__(self, llm: LLM | None = None, events_extractor: EventsExtractor | None = None):
+        self.llm = llm if llm is not None else LLM()
+        self.events_extractor = events_extractor if events_extractor is not None else EventsExtractor()
+        self.loop = get_background_loop()
+        self.context_packer = ContextPacker()
 
     def _craft_system_prompt_similar_event(self) -> str:
         return """
@@ -58,7 +123,7 @@ class Generator:
         The output must be a single, well-described event that fits all criteria. Pay close attention to the specified Time Range and Location for the new event.
         """
 
-    def generate_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True) -> dict:
+    def generate_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
         """
         Generate a similar event to the given event.
 
@@ -67,30 +132,18 @@ class Generator:
             delta_year: The number of years to offset the event by.
             near: Whether to generate a similar event in the same region.
             symmetric: Whether to generate a similar event in the same time range.
+            with_usage: Whether to also return the token usage, including prompt cache reads and writes.
+            n_candidates: The number of events to generate concurrently from the same context, None for one.
 
         Returns:
-            dict: The generated event.
+            dict: The generated event, or the list of candidates if `n_candidates`, paired with the usage
+                (a list with candidates) if `with_usage`.
         """
-        # extract the event and similiar events.
-        event, events = self.events_extractor.get_similar_events_to_event(event_name, delta_year, near, symmetric)
-
-        event_schema = Event.model_json_schema()
-        tool_name = "generate_similar_event"
-
-        tools = [
-            {
-                "name": tool_name,
-                "description": "Generate a similar event to the given event. The event should be a single event, not a list of events.",
-                "input_schema": event_schema,
-            }
-        ]
+        return self.loop.run(
+            self.agenerate_similar_event(event_name, delta_year, near, symmetric, with_usage, n_candidates)
+        )
 
-        # generate the event
-        system_prompt = self._craft_system_prompt_similar_event()
-        user_prompt = f"Event:\n```\n{json.dumps(event, indent=4)}\n```\nSimilar Events:\n```\n{json.dumps(events, indent=4)}\n```"
-        return self.llm.generate(system_prompt, user_prompt, tools=tools, tool_choice=tool_name, temperature=0.7)
-    
-    def complete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True) -> dict:
+    def complete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
         """
         Complete the event.
 
@@ -99,33 +152,16 @@ class Generator:
             delta_year: The number of years to offset the event by.
             near: Whether to generate a similar event in the same region.
             symmetric: Whether to generate a similar event in the same time range.
+            with_usage: Whether to also return the token usage, including prompt cache reads and writes.
+            n_candidates: The number of completions to generate concurrently from the same context, None for one.
 
         Returns:
-            dict: The completed event.
+            dict: The completed event, or the list of candidates if `n_candidates`, paired with the usage
+                (a list with candidates) if `with_usage`.
         """
+        return self.loop.run(self.acomplete_event(event_name, delta_year, near, symmetric, with_usage, n_candidates))
 
-        # extract the event and similiar events.
-        event, events = self.events_extractor.get_similar_events_to_event(event_name, delta_year, near, symmetric)
-
-        print(f"queried event: {json.dumps(event, indent=4)}")
-        
-        event_schema = Event.model_json_schema()
-        tool_name = "complete_event"
-
-        tools = [
-            {
-                "name": tool_name,
-                "description": "Complete the event. The event should be a single event, not a list of events.",
-                "input_schema": event_schema,
-            }
-        ]
-        
-        # generate the event
-        system_prompt = self._craft_system_prompt_complete_event()
-        user_prompt = f"Event to Complete:\n```\n{json.dumps(event, indent=4)}\n```\nSimilar Events:\n```\n{json.dumps(events, indent=4)}\n```"
-        return self.llm.generate(system_prompt, user_prompt, tools=tools, tool_choice=tool_name, temperature=0.7)
-
-    def generate_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True) -> dict:
+    def generate_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
         """
         Generate a new event within a given time range.
 
@@ -136,22 +172,336 @@ class Generator:
             range_end_year: The end year of the range for contextually seached events.
             location: The location of the event.
             near: Whether to generate a similar event in the same region.
+            with_usage: Whether to also return the token usage, including prompt cache reads and writes.
+            n_candidates: The number of events to generate concurrently from the same context, None for one.
+
+        Returns:
+            dict: The generated event, or the list of candidates if `n_candidates`, paired with the usage
+                (a list with candidates) if `with_usage`.
+        """
+        return self.loop.run(
+            self.agenerate_event_in_range(
+                start_year, end_year, range_start_year, range_end_year, location, near, with_usage, n_candidates
+            )
+        )
+
+    def stream_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> BackgroundIterator:
+        """
+        Streaming counterpart of generate_similar_event.
+
+        Args:
+            prefetched: The context retrieval started by prefetch_similar_event with the same parameters, if any.
 
         Returns:
-            dict: The generated event.
-        """
-        events = self.events_extractor.get_similar_events_in_range(range_start_year, end_year=range_end_year, location=location, near=near, exclude_event=None)
-        event_schema = Event.model_json_schema()
-        tool_name = "generate_event_in_range"
-
-        tools = [
-            {
-                "name": tool_name,
-                "description": "Generate a new event within a given time range. The event should be a single event, not a list of events.",
-                "input_schema": event_schema,
-            }
+            BackgroundIterator: The StreamUpdates of the generated event as it is written. Cancel it to stop the generation.
+                With `n_candidates`, the updates of every candidate interleaved, told apart by their `candidate`.
+        """
+        return self.loop.iterate(
+            self.astream_similar_event(event_name, delta_year, near, symmetric, n_candidates, prefetched)
+        )
+
+    def stream_complete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> BackgroundIterator:
+        """
+        Streaming counterpart of complete_event.
+
+        Args:
+            prefetched: The context retrieval started by prefetch_complete_event with the same parameters, if any.
+
+        Returns:
+            BackgroundIterator: The StreamUpdates of the completed event as it is written. Cancel it to stop the generation.
+                With `n_candidates`, the updates of every candidate interleaved, told apart by their `candidate`.
+        """
+        return self.loop.iterate(
+            self.astream_complete_event(event_name, delta_year, near, symmetric, n_candidates, prefetched)
+        )
+
+    def stream_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> BackgroundIterator:
+        """
+        Streaming counterpart of generate_event_in_range.
+
+        Args:
+            prefetched: The context retrieval started by prefetch_event_in_range with the same parameters, if any.
+
+        Returns:
+            BackgroundIterator: The StreamUpdates of the generated event as it is written. Cancel it to stop the generation.
+                With `n_candidates`, the updates of every candidate interleaved, told apart by their `candidate`.
+        """
+        return self.loop.iterate(
+            self.astream_event_in_range(
+                start_year, end_year, range_start_year, range_end_year, location, near, n_candidates, prefetched
+            )
+        )
+
+    def prefetch_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True) -> Future:
+        """
+        Starts retrieving the context of generate_similar_event on the background loop, e.g. while the user is
+        still filling in the form. Pass the future to stream_similar_event as `prefetched` to skip the retrieval;
+        cancel it if the parameters change.
+        """
+        return self.loop.submit(
+            self._aprefetch("similar_event", self._aprompt_similar_event(event_name, delta_year, near, symmetric))
+        )
+
+    def prefetch_complete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True) -> Future:
+        """
+        Starts retrieving the context of complete_event, see prefetch_similar_event.
+        """
+        return self.loop.submit(
+            self._aprefetch("complete_event", self._aprompt_complete_event(event_name, delta_year, near, symmetric))
+        )
+
+    def prefetch_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True) -> Future:
+        """
+        Starts retrieving the context of generate_event_in_range, see prefetch_similar_event.
+        """
+        return self.loop.submit(
+            self._aprefetch(
+                "event_in_range",
+                self._aprompt_event_in_range(start_year, end_year, range_start_year, range_end_year, location, near),
+            )
+        )
+
+    async def agenerate_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
+        """
+        Async counterpart of generate_similar_event.
+        """
+        with tracing.span("generate_similar_event", event_name=event_name, candidates=n_candidates or 1):
+            system_prompt, user_prompt = await self._aprompt_similar_event(event_name, delta_year, near, symmetric)
+            output, usage = await self._agenerate(
+                system_prompt, user_prompt, SIMILAR_EVENT_TOOLS, SIMILAR_EVENT_TOOL_NAME, n_candidates
+            )
+            return (output, usage) if with_usage else output
+
+    async def acomplete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
+        """
+        Async counterpart of complete_event.
+        """
+        with tracing.span("complete_event", event_name=event_name, candidates=n_candidates or 1):
+            system_prompt, user_prompt = await self._aprompt_complete_event(event_name, delta_year, near, symmetric)
+            output, usage = await self._agenerate(
+                system_prompt, user_prompt, COMPLETE_EVENT_TOOLS, COMPLETE_EVENT_TOOL_NAME, n_candidates
+            )
+            return (output, usage) if with_usage else output
+
+    async def acomplete_event_with_context(self, event: dict, events: list[dict], with_usage: bool = False, similarities: list[float] | None = None) -> dict | tuple:
+        """
+        Completes an event from context the caller already retrieved, e.g. shared by neighbouring events
+        (see EventsExtractor.aget_similar_events_to_events).
+
+        Args:
+            event: The event to complete, as returned by the extractor.
+            events: Its similar events.
+            with_usage: Whether to also return the token usage.
+            similarities: The textual similarity of each similar event to the event, weighing them in the context.
+
+        Returns:
+            dict: The completed event, paired with the usage if `with_usage`.
+        """
+        with tracing.span("complete_event", event_name=event["name"], candidates=1):
+            system_prompt, user_prompt = await self._aprompt_complete_event_with_context(event, events, similarities)
+            output, usage = await self._agenerate(
+                system_prompt, user_prompt, COMPLETE_EVENT_TOOLS, COMPLETE_EVENT_TOOL_NAME, None
+            )
+            return (output, usage) if with_usage else output
+
+    async def agenerate_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True, with_usage: bool = False, n_candidates: int | None = None) -> dict | list[dict] | tuple:
+        """
+        Async counterpart of generate_event_in_range.
+        """
+        with tracing.span("generate_event_in_range", location=location, candidates=n_candidates or 1):
+            system_prompt, user_prompt = await self._aprompt_event_in_range(
+                start_year, end_year, range_start_year, range_end_year, location, near
+            )
+            output, usage = await self._agenerate(
+                system_prompt, user_prompt, EVENT_IN_RANGE_TOOLS, EVENT_IN_RANGE_TOOL_NAME, n_candidates
+            )
+            return (output, usage) if with_usage else output
+
+    async def abatch_request_event_in_range(self, custom_id: str, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True) -> dict:
+        """
+        Retrieves the context of generate_event_in_range and builds the Message Batch request for it
+        instead of calling the LLM.
+
+        Args:
+            custom_id: The ID matching the request to its result in the batch.
+
+        Returns:
+            dict: The batch request.
+        """
+        system_prompt, user_prompt = await self._aprompt_event_in_range(
+            start_year, end_year, range_start_year, range_end_year, location, near
+        )
+        return self.llm.batch_request(
+            custom_id,
+            system_prompt,
+            user_prompt,
+            EVENT_IN_RANGE_TOOLS,
+            tool_choice=EVENT_IN_RANGE_TOOL_NAME,
+            temperature=TEMPERATURE,
+        )
+
+    async def astream_similar_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> AsyncIterator[StreamUpdate]:
+        """
+        Async streaming counterpart of generate_similar_event.
+        """
+        with tracing.span("stream_similar_event", event_name=event_name, candidates=n_candidates or 1):
+            prompts = await self._aprefetched_prompts(prefetched)
+            system_prompt, user_prompt = prompts or await self._aprompt_similar_event(event_name, delta_year, near, symmetric)
+            async for update in self._astream(
+                system_prompt, user_prompt, SIMILAR_EVENT_TOOLS, SIMILAR_EVENT_TOOL_NAME, n_candidates
+            ):
+                yield update
+
+    async def astream_complete_event(self, event_name: str, delta_year: int, near: bool = True, symmetric: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> AsyncIterator[StreamUpdate]:
+        """
+        Async streaming counterpart of complete_event.
+        """
+        with tracing.span("stream_complete_event", event_name=event_name, candidates=n_candidates or 1):
+            prompts = await self._aprefetched_prompts(prefetched)
+            system_prompt, user_prompt = prompts or await self._aprompt_complete_event(event_name, delta_year, near, symmetric)
+            async for update in self._astream(
+                system_prompt, user_prompt, COMPLETE_EVENT_TOOLS, COMPLETE_EVENT_TOOL_NAME, n_candidates
+            ):
+                yield update
+
+    async def astream_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool = True, n_candidates: int | None = None, prefetched: Future | None = None) -> AsyncIterator[StreamUpdate]:
+        """
+        Async streaming counterpart of generate_event_in_range.
+        """
+        with tracing.span("stream_event_in_range", location=location, candidates=n_candidates or 1):
+            prompts = await self._aprefetched_prompts(prefetched)
+            system_prompt, user_prompt = prompts or await self._aprompt_event_in_range(
+                start_year, end_year, range_start_year, range_end_year, location, near
+            )
+            async for update in self._astream(
+                system_prompt, user_prompt, EVENT_IN_RANGE_TOOLS, EVENT_IN_RANGE_TOOL_NAME, n_candidates
+            ):
+                yield update
+
+    async def _aprefetch(self, kind: str, prompts: Coroutine) -> tuple[str, str]:
+        with tracing.span("prefetch_context", kind=kind):
+            return await prompts
+
+    async def _aprefetched_prompts(self, prefetched: Future | None) -> tuple[str, str] | None:
+        """
+        Waits for the prompts of a prefetched context retrieval, or returns None to retrieve them again if there
+        is none, or it was cancelled or failed.
+        """
+        if prefetched is None or prefetched.cancelled():
+            return None
+        with tracing.span("retrieve_context", prefetched=True):
+            try:
+                return await asyncio.wrap_future(prefetched)
+            except Exception as e:
+                print(f"Prefetched context retrieval failed, retrieving it again: {e}")
+                return None
+
+    async def _agenerate(
+        self, system_prompt: str, user_prompt: str, tools: list[dict], tool_name: str, n_candidates: int | None
+    ) -> tuple[dict, dict] | tuple[list[dict], list[dict]]:
+        """
+        Calls the LLM once, or once per candidate concurrently, each at its own temperature.
+
+        Returns:
+            dict | list[dict]: The tool input, or that of each candidate
+            dict | list[dict]: The token usage, or that of each candidate
+        """
+        if n_candidates is None:
+            return await self.llm.agenerate_with_usage(
+                system_prompt, user_prompt, tools, tool_choice=tool_name, temperature=TEMPERATURE
+            )
+        candidates = await asyncio.gather(
+            *(
+                self.llm.agenerate_with_usage(system_prompt, user_prompt, tools, tool_choice=tool_name, temperature=t)
+                for t in candidate_temperatures(n_candidates)
+            )
+        )
+        return [output for output, _ in candidates], [usage for _, usage in candidates]
+
+    async def _astream(
+        self, system_prompt: str, user_prompt: str, tools: list[dict], tool_name: str, n_candidates: int | None
+    ) -> AsyncIterator[StreamUpdate]:
+        """
+        Streams the LLM response, or those of every candidate concurrently, interleaved as their updates arrive.
+        """
+        if n_candidates is None:
+            async for update in self.llm.astream(
+                system_prompt, user_prompt, tools, tool_choice=tool_name, temperature=TEMPERATURE
+            ):
+                yield update
+            return
+        streams = [
+            self.llm.astream(system_prompt, user_prompt, tools, tool_choice=tool_name, temperature=t)
+            for t in candidate_temperatures(n_candidates)
         ]
+        async for candidate, update in amerge(streams):
+            yield dataclasses.replace(update, candidate=candidate)
+
+    async def _aprompt_similar_event(self, event_name: str, delta_year: int, near: bool, symmetric: bool) -> tuple[str, str]:
+        """
+        Retrieves the context of a similar event generation and crafts its system and user prompts.
+        """
+        # extract the event and similiar events.
+        with tracing.span("retrieve_context"):
+            # Every event of the window is kept: the context packer's token budget decides which ones fit
+            event, events, similarities = await self.events_extractor.aget_similar_events_to_event(event_name, delta_year, near, symmetric, semantic=True, with_similarities=True)
+        context = await self._apack_context(events, event["start_year"], (event["location"] or {}).get("name"), similarities)
+
+        system_prompt = self._craft_system_prompt_similar_event()
+        user_prompt = f"Event:\n```\n{compact_json(event)}\n```\nSimilar Events:\n```\n{context.text}\n```"
+        return system_prompt, user_prompt
+
+    async def _aprompt_complete_event(self, event_name: str, delta_year: int, near: bool, symmetric: bool) -> tuple[str, str]:
+        """
+        Retrieves the context of an event completion and crafts its system and user prompts.
+        """
+        # extract the event and similiar events.
+        with tracing.span("retrieve_context"):
+            event, events, similarities = await self.events_extractor.aget_similar_events_to_event(event_name, delta_year, near, symmetric, semantic=True, with_similarities=True)
+
+        print(f"queried event: {json.dumps(event, indent=4)}")
+        return await self._aprompt_complete_event_with_context(event, events, similarities)
+
+    async def _aprompt_complete_event_with_context(self, event: dict, events: list[dict], similarities: list[float] | None = None) -> tuple[str, str]:
+        """
+        Crafts the system and user prompts of an event completion from its already retrieved context.
+        """
+        context = await self._apack_context(events, event["start_year"], (event["location"] or {}).get("name"), similarities)
+
+        system_prompt = self._craft_system_prompt_complete_event()
+        user_prompt = f"Event to Complete:\n```\n{compact_json(event)}\n```\nSimilar Events:\n```\n{context.text}\n```"
+        return system_prompt, user_prompt
+
+    async def _aprompt_event_in_range(self, start_year: int, end_year: int, range_start_year: int, range_end_year: int, location: str, near: bool) -> tuple[str, str]:
+        """
+        Retrieves the context of an event generation in a time range and crafts its system and user prompts.
+        """
+        with tracing.span("retrieve_context"):
+            events = await self.events_extractor.aget_similar_events_in_range(range_start_year, end_year=range_end_year, location=location, near=near, exclude_event=None)
+        context = await self._apack_context(events, (start_year + end_year) // 2, location)
 
         system_prompt = self._craft_system_prompt_generate_event()
-        user_prompt = f"Time Range:\n```\n{start_year} to {end_year}\n```\nLocation:\n```\n{location}\n```\nEvents:\n```\n{json.dumps(events, indent=4)}\n```"
-        return self.llm.generate(system_prompt, user_prompt, tools=tools, tool_choice=tool_name, temperature=0.7)
\ No newline at end of file
+        user_prompt = f"Time Range:\n```\n{start_year} to {end_year}\n```\nLocation:\n```\n{location}\n```\nEvents:\n```\n{context.text}\n```"
+        return system_prompt, user_prompt
+
+    async def _apack_context(self, events: list[dict], reference_year: int | None, location: str | None, similarities: list[float] | None = None) -> PackedContext:
+        """
+        Packs the contextual events into the token budget, favouring important events close to the reference
+        year and location, and similar to the seed event.
+
+        Args:
+            events (list[dict]): The contextual events
+            reference_year (int | None): The year of the event being generated
+            location (str | None): The name of the location of the event being generated
+            similarities (list[float] | None): The textual similarity of each contextual event to the seed event
+
+        Returns:
+            PackedContext: The packed context
+        """
+        with tracing.span("pack_context", events=len(events)):
+            location_hops = await self.events_extractor.aget_location_hops(location)
+            context = self.context_packer.pack(events, reference_year, location_hops, similarities)
+            tracing.annotate(packed=len(context.events), tokens=context.tokens, dropped=context.dropped)
+            if context.dropped:
+                tracing.count("context_events_dropped", context.dropped)
+        return context
@@ -0,0 +1,125 @@
+from collections import deque
+
+import numpy as np
+
+from src.backend.mirror import normalize_id
+
+
+class LocationGraph:
+    """
+    The "Near" relation between every location, stored as a compressed sparse row adjacency structure
+    over integer node IDs.
+
+    Args:
+        location_pages (list[dict]): Every page of the Location database
+    """
+
+    def __init__(self, location_pages: list[dict]):
+        self.ids: list[str] = [page["id"] for page in location_pages]
+        self.names: list[str | None] = []
+        self.biomes: list[str | None] = []
+        self._nodes = {normalize_id(page_id): node for node, page_id in enumerate(self.ids)}
+        self._nodes_by_name: dict[str, int] = {}
+
+        indptr = [0]
+        indices = []
+        for node, page in enumerate(location_pages):
+            properties = page.get("properties", {})
+            title = properties.get("Name", {}).get("title") or []
+            name = title[0]["plain_text"] if title else None
+            biome = properties.get("Biome", {}).get("select")
+            self.names.append(name)
+            self.biomes.append(biome["name"] if biome else None)
+            if name is not None:
+                self._nodes_by_name.setdefault(name, node)
+            near = properties.get("Near", {}).get("relation") or []
+            # Near pages outside the Location database (e.g. trashed pages) have no node and are dropped
+            indices.extend(
+                self._nodes[normalize_id(relation["id"])]
+                for relation in near
+                if normalize_id(relation["id"]) in self._nodes
+            )
+            indptr.append(len(indices))
+
+        self.indptr = np.asarray(indptr, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        ids: list[str],
+        names: list[str | None],
+        biomes: list[str | None],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+    ) -> "LocationGraph":
+        """
+        Rebuilds a graph from its arrays, e.g. memory-mapped from a snapshot (see src/backend/snapshot.py).
+        """
+        graph = cls.__new__(cls)
+        graph.ids = ids
+        graph.names = names
+        graph.biomes = biomes
+        graph._nodes = {normalize_id(page_id): node for node, page_id in enumerate(ids)}
+        graph._nodes_by_name = {}
+        for node, name in enumerate(names):
+            if name is not None:
+                graph._nodes_by_name.setdefault(name, node)
+        graph.indptr = indptr
+        graph.indices = indices
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def node(self, location_id: str) -> int | None:
+        """
+        Returns the node of a location page ID, or None if it is not in the graph.
+        """
+        return self._nodes.get(normalize_id(location_id))
+
+    def node_by_name(self, name: str) -> int | None:
+        """
+        Returns the node of a location name, or None if no location has that name.
+        """
+        return self._nodes_by_name.get(name)
+
+    def neighbours(self, node: int) -> np.ndarray:
+        """
+        Returns the nodes listed in the location's "Near" relation.
+        """
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def k_hop(self, node: int, hops: int) -> dict[int, int]:
+        """
+        Finds every location reachable within `hops` steps of "Near" relations (breadth-first).
+
+        Args:
+            node (int): The starting location
+            hops (int): The hop radius. 0 returns only the starting location.
+
+        Returns:
+            dict[int, int]: The hop distance of each reachable node, including the start at distance 0
+        """
+        distances = {node: 0}
+        frontier = deque([node])
+        while frontier:
+            current = frontier.popleft()
+            distance = distances[current]
+            if distance >= hops:
+                continue
+            for neighbour in self.neighbours(current).tolist():
+                if neighbour not in distances:
+                    distances[neighbour] = distance + 1
+                    frontier.append(neighbour)
+        return distances
+
+    def location(self, node: int) -> dict:
+        """
+        Returns the location in the same shape as EventsExtractor._parse_location.
+        """
+        return {
+            "name": self.names[node],
+            "biome": self.biomes[node],
+            "near": [self.names[neighbour] or "Unknown" for neighbour in self.neighbours(node).tolist()],
+        }
@@ -0,0 +1,162 @@
+import numpy as np
+
+OVERLAP_MODES = ("start", "overlap", "contained")
+
+
+class IntervalIndex:
+    """
+    A static centered interval tree over event year ranges, stored in NumPy arrays.
+
+    Overlap queries run in O(log n + k). Events without an end year are treated as punctual.
+
+    Args:
+        start_years (array-like): The start year of each interval
+        end_years (array-like): The end year of each interval, NaN/None for punctual events
+    """
+
+    def __init__(self, start_years, end_years):
+        starts = np.asarray(start_years, dtype=np.float64)
+        ends = np.asarray([np.nan if end is None else end for end in end_years], dtype=np.float64)
+        ends = np.where(np.isnan(ends), starts, ends)
+        # An end year before the start year is a data entry slip; index the interval the right way round.
+        self.starts = np.minimum(starts, ends)
+        self.ends = np.maximum(starts, ends)
+        valid = np.flatnonzero(~np.isnan(self.starts))
+
+        self._start_order = valid[np.argsort(self.starts[valid], kind="stable")]
+        self._sorted_starts = self.starts[self._start_order]
+
+        # Flattened tree: per node the center, child node numbers, and this node's intervals
+        # sorted by start (ascending) and by end (ascending).
+        self._centers: list[float] = []
+        self._children: list[tuple[int, int]] = []
+        self._by_start: list[np.ndarray] = []
+        self._by_end: list[np.ndarray] = []
+        self._root = self._build(valid)
+
+    def __len__(self) -> int:
+        return len(self._start_order)
+
+    def _build(self, positions: np.ndarray) -> int:
+        if len(positions) == 0:
+            return -1
+        node = len(self._centers)
+        center = float(np.median((self.starts[positions] + self.ends[positions]) / 2))
+        here = positions[(self.starts[positions] <= center) & (self.ends[positions] >= center)]
+        left = positions[self.ends[positions] < center]
+        right = positions[self.starts[positions] > center]
+
+        self._centers.append(center)
+        self._children.append((-1, -1))
+        self._by_start.append(here[np.argsort(self.starts[here], kind="stable")])
+        self._by_end.append(here[np.argsort(self.ends[here], kind="stable")])
+        self._children[node] = (self._build(left), self._build(right))
+        return node
+
+    def overlapping(self, start_year: float, end_year: float | None = None) -> np.ndarray:
+        """
+        Finds the intervals that share at least one year with [start_year, end_year].
+
+        Args:
+            start_year (float): The start of the window
+            end_year (float | None): The end of the window, None for an open-ended window
+
+        Returns:
+            np.ndarray: The positions of the matching intervals, sorted by start year
+        """
+        end_year = np.inf if end_year is None else end_year
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            center = self._centers[node]
+            left, right = self._children[node]
+            if end_year < center:
+                by_start = self._by_start[node]
+                found.append(by_start[: np.searchsorted(self.starts[by_start], end_year, side="right")])
+                stack.append(left)
+            elif start_year > center:
+                by_end = self._by_end[node]
+                found.append(by_end[np.searchsorted(self.ends[by_end], start_year, side="left") :])
+                stack.append(right)
+            else:
+                found.append(self._by_start[node])
+                stack.extend((left, right))
+        return self._sort_by_start(found)
+
+    def contained(self, start_year: float, end_year: float | None = None) -> np.ndarray:
+        """
+        Finds the intervals lying entirely within [start_year, end_year].
+
+        Returns:
+            np.ndarray: The positions of the matching intervals, sorted by start year
+        """
+        positions = self.overlapping(start_year, end_year)
+        end_year = np.inf if end_year is None else end_year
+        return positions[(self.starts[positions] >= start_year) & (self.ends[positions] <= end_year)]
+
+    def starting(self, start_year: float, end_year: float | None = None) -> np.ndarray:
+        """
+        Finds the intervals whose start year falls within [start_year, end_year].
+
+        Returns:
+            np.ndarray: The positions of the matching intervals, sorted by start year
+        """
+        low = np.searchsorted(self._sorted_starts, start_year, side="left")
+        high = len(self._sorted_starts) if end_year is None else np.searchsorted(self._sorted_starts, end_year, "right")
+        return self._start_order[low:high]
+
+    def query(self, start_year: float, end_year: float | None = None, mode: str = "overlap") -> np.ndarray:
+        """
+        Runs a window query with the given semantics.
+
+        Args:
+            start_year (float): The start of the window
+            end_year (float | None): The end of the window, None for an open-ended window
+            mode (str): "start" for intervals starting in the window, "overlap" for intervals sharing a year with it,
+                "contained" for intervals lying entirely within it
+
+        Returns:
+            np.ndarray: The positions of the matching intervals, sorted by start year
+        """
+        if mode == "start":
+            return self.starting(start_year, end_year)
+        if mode == "overlap":
+            return self.overlapping(start_year, end_year)
+        if mode == "contained":
+            return self.contained(start_year, end_year)
+        raise ValueError(f"Unknown overlap mode {mode!r}, expected one of {OVERLAP_MODES}")
+
+    def nearest(self, year: float, k: int = 10) -> np.ndarray:
+        """
+        Finds the k intervals closest in time to the year. Intervals containing the year are at distance 0.
+        The search window doubles until it holds k intervals, so this takes O(log(span) * (log n + k)).
+
+        Args:
+            year (float): The year
+            k (int): The number of intervals to return
+
+        Returns:
+            np.ndarray: The positions of the nearest intervals, closest first
+        """
+        if len(self) == 0 or k <= 0:
+            return np.empty(0, dtype=np.intp)
+        span = max(float(self.ends.max(initial=year, where=~np.isnan(self.ends))) - year, 0.0)
+        span = max(span, year - float(self._sorted_starts[0]))
+        radius = 1.0
+        while True:
+            positions = self.overlapping(year - radius, year + radius)
+            if len(positions) >= k or radius > span:
+                break
+            radius *= 2
+        distances = np.maximum(np.maximum(self.starts[positions] - year, year - self.ends[positions]), 0)
+        order = np.argsort(distances, kind="stable")[:k]
+        return positions[order]
+
+    def _sort_by_start(self, found: list[np.ndarray]) -> np.ndarray:
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        positions = np.concatenate(found)
+        return positions[np.argsort(self.starts[positions], kind="stable")]
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from typing import Callable
+
+from src.backend.constants import (
+    COMPLETION_CHECKPOINT_PATH,
+    COMPLETION_CLUSTER_SIZE,
+    COMPLETION_MAX_WORKERS,
+)
+from src.backend.generator import Generator
+from src.backend.mirror import normalize_id
+from src.backend.schemas import Event
+from src.backend import tracing
+
+# Statuses of the checkpoint lines whose events are not attempted again on resume
+FINISHED_STATUSES = ("succeeded", "skipped")
+
+
+def neighbour_clusters(
+    records: list[dict],
+    delta_year: int,
+    size: int = COMPLETION_CLUSTER_SIZE,
+    near_ids: Callable[[str], set[str]] | None = None,
+) -> list[list[dict]]:
+    """
+    Groups event records into clusters of neighbours in time and space, so that the context windows of a cluster
+    overlap and one query serves them all. Going through the events chronologically, an event joins the cluster
+    of an event starting at most `delta_year` before it at the same location, or at a near one.
+
+    Args:
+        records (list[dict]): The event records, with a Start Year
+        delta_year (int): The largest gap in years between an event and the last event of its cluster
+        size (int): The largest number of events in a cluster
+        near_ids (Callable[[str], set[str]] | None): Maps a location ID to the normalized IDs of the locations
+            near it, itself included. Defaults to clustering events of the same location only.
+
+    Returns:
+        list[list[dict]]: The clusters, in the order they were opened
+    """
+    clusters: list[list[dict]] = []
+    open_clusters: list[tuple[set[str], list[dict]]] = []  # the locations near each open cluster, and its events
+    for record in sorted(records, key=lambda record: record["start_year"]):
+        location_id = normalize_id(record["location_ids"][0]) if record["location_ids"] else None
+        open_clusters = [
+            (locations, cluster)
+            for locations, cluster in open_clusters
+            if len(cluster) < size and record["start_year"] - cluster[-1]["start_year"] <= delta_year
+        ]
+        for locations, cluster in open_clusters:
+            if location_id in locations:
+                cluster.append(record)
+                break
+        else:
+            if location_id is None:
+                locations = {None}
+            elif near_ids is not None:
+                locations = near_ids(record["location_ids"][0])
+            else:
+                locations = {location_id}
+            cluster = [record]
+            clusters.append(cluster)
+            open_clusters.append((locations, cluster))
+    return clusters
+
+
+class CompletionCheckpoint:
+    """
+    An append-only JSONL record of the outcome of every event a CompletionJob attempted, one line per outcome,
+    flushed to disk as it is written. The last line of an event wins, so a failed event succeeding on a later run
+    is recorded as such, and a line torn by a crash is ignored.
+
+    Args:
+        path (str): The path of the JSONL file
+    """
+
+    def __init__(self, path: str = COMPLETION_CHECKPOINT_PATH):
+        self.path = path
+
+    def load(self) -> dict[str, dict]:
+        """
+        Returns the last recorded outcome of every event, by page ID.
+        """
+        outcomes = {}
+        if not os.path.exists(self.path):
+            return outcomes
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    outcome = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                outcomes[outcome["id"]] = outcome
+        return outcomes
+
+    def finished(self) -> set[str]:
+        """
+        Returns the page IDs of the events that succeeded or were skipped, not to be attempted again.
+        """
+        return {event_id for event_id, outcome in self.load().items() if outcome["status"] in FINISHED_STATUSES}
+
+    def append(self, outcome: dict) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(outcome, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class CompletionJob:
+    """
+    Completes every Timeline event with an empty Description or Excerpt, headless.
+
+    The incomplete events are found on the in-memory Timeline index and grouped into clusters of neighbours in time
+    and space (see neighbour_clusters). A bounded pool of workers takes one cluster at a time: its context is
+    retrieved with one query for the whole cluster, then its events are completed one after another. Every outcome
+    is checkpointed as it happens, so a run that crashed or was stopped resumes with the events left.
+
+    A run stops early after `max_consecutive_failures` failures in a row, e.g. a rate limit storm outlasting the
+    retries: the remaining events are left for the next run instead of being failed one by one.
+
+    Args:
+        generator (Generator): The generator whose extractor and LLM are used
+        checkpoint (CompletionCheckpoint | None): The checkpoint to resume from and record to
+        max_workers (int): The number of clusters completed concurrently
+        cluster_size (int): The largest number of events sharing one context retrieval
+        delta_year (int): The years searched for context before and after each event, as in complete_event
+        near (bool): Whether to include near locations in the context
+        symmetric (bool): Whether the delta year is symmetric around each event
+        max_consecutive_failures (int): The failures in a row after which the run stops
+    """
+
+    def __init__(
+        self,
+        generator: Generator,
+        checkpoint: CompletionCheckpoint | None = None,
+        max_workers: int = COMPLETION_MAX_WORKERS,
+        cluster_size: int = COMPLETION_CLUSTER_SIZE,
+        delta_year: int = 100,
+        near: bool = True,
+        symmetric: bool = True,
+        max_consecutive_failures: int = 10,
+    ):
+        self.generator = generator
+        self.checkpoint = checkpoint if checkpoint is not None else CompletionCheckpoint()
+        self.max_workers = max_workers
+        self.cluster_size = cluster_size
+        self.delta_year = delta_year
+        self.near = near
+        self.symmetric = symmetric
+        self.max_consecutive_failures = max_consecutive_failures
+        self._consecutive_failures = 0
+
+    def pending(self) -> list[dict]:
+        """
+        Returns the records of the incomplete events not finished by a previous run, in Timeline order.
+        """
+        finished = self.checkpoint.finished()
+        return [
+            record for record in self.generator.events_extractor.incomplete_events() if record["id"] not in finished
+        ]
+
+    def run(self, limit: int | None = None) -> dict[str, int]:
+        """
+        Completes the pending events, recording every outcome to the checkpoint.
+
+        Args:
+            limit (int | None): The maximum number of events attempted in this run
+
+        Returns:
+            dict[str, int]: The number of events per status: "succeeded", "failed" (attempted again next run),
+                "skipped" (events without a Start Year, which have no context window) and "stopped" (left for the
+                next run after too many failures in a row)
+        """
+        records = self.pending()[:limit]
+        with tracing.span("completion_job", events=len(records)):
+            counts = Counter()
+            datable = []
+            for record in records:
+                if record["start_year"] is None:
+                    self._record(record, "skipped", error="No Start Year to search context around")
+                    counts["skipped"] += 1
+                else:
+                    datable.append(record)
+            near_ids = self.generator.events_extractor.near_location_ids if self.near else None
+            clusters = neighbour_clusters(datable, self.delta_year, self.cluster_size, near_ids)
+            print(f"completion: {len(datable)} events in {len(clusters)} clusters, {self.max_workers} workers")
+            counts.update(self.generator.loop.run(self._arun(clusters)))
+            return dict(counts)
+
+    async def _arun(self, clusters: list[list[dict]]) -> Counter:
+        counts = Counter()
+        queue = asyncio.Queue()
+        for cluster in clusters:
+            queue.put_nowait(cluster)
+        self._consecutive_failures = 0
+        await asyncio.gather(*(self._worker(queue, counts) for _ in range(self.max_workers)))
+        return counts
+
+    async def _worker(self, queue: asyncio.Queue, counts: Counter) -> None:
+        while not queue.empty():
+            cluster = queue.get_nowait()
+            if self._stopped():
+                counts["stopped"] += len(cluster)
+                continue
+            await self._complete_cluster(cluster, counts)
+
+    async def _complete_cluster(self, cluster: list[dict], counts: Counter) -> None:
+        """
+        Retrieves the shared context of a cluster, then completes its events one after another.
+        """
+        extractor = self.generator.events_extractor
+        try:
+            with tracing.span("retrieve_context", events=len(cluster)):
+                contexts = await extractor.aget_similar_events_to_events(
+                    [record["id"] for record in cluster],
+                    self.delta_year,
+                    self.near,
+                    self.symmetric,
+                    semantic=True,
+                    with_similarities=True,
+                )
+        except Exception as e:
+            print(f"Error retrieving the context of {len(cluster)} events around '{cluster[0]['name']}': {e}")
+            for record in cluster:
+                self._failed(record, e, counts)
+            return
+
+        for position, (record, (event, events, similarities)) in enumerate(zip(cluster, contexts)):
+            if self._stopped():
+                counts["stopped"] += len(cluster) - position
+                return
+            try:
+                output = await self.generator.acomplete_event_with_context(event, events, similarities=similarities)
+                completed = Event.model_validate(output).model_dump(mode="json")
+            except Exception as e:
+                print(f"Error completing event '{record['name']}': {e}")
+                self._failed(record, e, counts)
+                continue
+            self._consecutive_failures = 0
+            self._record(record, "succeeded", event=completed)
+            tracing.count("events_completed")
+            counts["succeeded"] += 1
+
+    def _failed(self, record: dict, error: Exception, counts: Counter) -> None:
+        self._consecutive_failures += 1
+        self._record(record, "failed", error=str(error))
+        counts["failed"] += 1
+        if self._consecutive_failures == self.max_consecutive_failures:
+            print(f"completion: stopping after {self._consecutive_failures} failures in a row, run again to resume")
+
+    def _stopped(self) -> bool:
+        return self._consecutive_failures >= self.max_consecutive_failures
+
+    def _record(self, record: dict, status: str, event: dict | None = None, error: str | None = None) -> None:
+        self.checkpoint.append(
+            {"id": record["id"], "name": record["name"], "status": status, "event": event, "error": error}
+        )
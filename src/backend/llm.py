@@ -1,21 +1,304 @@
-from anthropic import Anthropic
-from src.backend.constants import ANTHROPIC_API_KEY, MODEL_NAME
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator
+
+from anthropic import Anthropic, AsyncAnthropic
+from anthropic.types import Message
+from src.backend.constants import ANTHROPIC_API_KEY, LLM_CACHE_MODE, MODEL_NAME
+from src.backend.llm_cache import LLMResponseCache, fingerprint
+from src.backend.partial_json import FieldUpdate, PartialJSONObject
+from src.backend import tracing
+
+# Marks the end of a prompt prefix to cache. Anthropic caches tools, then system, then messages, in that order.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+MAX_TOKENS = 4096
+
+
+def usage_of(message: Message) -> dict:
+    """
+    Extracts the token usage of a response, including prompt cache reads and writes.
+    """
+    usage = message.usage
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+
+
+def trace_usage(usage: dict) -> None:
+    """
+    Records the token usage of a response on the active trace span. A response cache hit spent no tokens,
+    so only its status is recorded.
+    """
+    tracing.annotate(response_cache=usage.get("response_cache"))
+    tracing.count("llm_requests", response_cache=usage.get("response_cache"))
+    if usage.get("response_cache") == "hit":
+        return
+    for name in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+        tracing.count(f"llm_{name}", usage.get(name, 0))
+
+
+def trace_first_token(span: tracing.Span) -> None:
+    """
+    Records the time to the first streamed token of a request, from the start of its span.
+    """
+    span.attributes["ttft_ms"] = round(span.duration_ms, 2)
+    tracing.METRICS.observe("kautos_llm_ttft_seconds", span.duration_ms / 1000)
+
+
+@dataclass
+class StreamUpdate:
+    """
+    One step of a streamed tool call.
+
+    Attributes:
+        snapshot (dict): The tool input so far. A string field still being written holds the text received so far.
+        changed (list[FieldUpdate]): The fields completed or grown since the previous update
+        done (bool): Whether the response is complete. The snapshot of the last update is the full tool input.
+        usage (dict | None): The token usage, on the last update only
+        candidate (int): The position of the candidate the update belongs to, when several are generated at once
+    """
+
+    snapshot: dict
+    changed: list[FieldUpdate] = field(default_factory=list)
+    done: bool = False
+    usage: dict | None = None
+    candidate: int = 0
 
 
 class LLM:
-    def __init__(self):
+    def __init__(
+        self,
+        cache_prompts: bool = True,
+        response_cache: LLMResponseCache | None = None,
+        client: Anthropic | None = None,
+        async_client: AsyncAnthropic | None = None,
+    ):
         self.model_name = MODEL_NAME
-        self.client = Anthropic(api_key=ANTHROPIC_API_KEY)
+        self.cache_prompts = cache_prompts
+        self.client = client if client is not None else Anthropic(api_key=ANTHROPIC_API_KEY)
+        self.async_client = async_client if async_client is not None else AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+        if response_cache is None and LLM_CACHE_MODE != "off":
+            response_cache = LLMResponseCache()
+        self.response_cache = response_cache
 
-    def generate(self, system_prompt: str, user_prompt: str, tools: list[dict] = None, tool_choice: str | None = None, temperature: float = 0.0) -> str:
-
-        message = self.client.messages.create(
-            max_tokens=4096,
+    def _request(
+        self, system_prompt: str, user_prompt: str, tools: list[dict] | None, tool_choice: str | None, temperature: float
+    ) -> dict:
+        system = system_prompt
+        if self.cache_prompts:
+            # Breakpoints on the last tool and on the system prompt cache the static prefix of every request;
+            # only the user prompt is processed anew. The tool dicts are shared constants, so copy before marking.
+            if tools:
+                tools = [*tools[:-1], {**tools[-1], "cache_control": CACHE_CONTROL}]
+            system = [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+        return dict(
+            max_tokens=MAX_TOKENS,
             model=self.model_name,
-            system=system_prompt,
+            system=system,
             messages=[{"role": "user", "content": user_prompt}],
             temperature=temperature,
             tools=tools,
             tool_choice={"type": "tool", "name": tool_choice} if tool_choice else None
         )
-        return message.content[0].input
+
+    def _cache_key(
+        self, system_prompt: str, user_prompt: str, tools: list[dict] | None, tool_choice: str | None, temperature: float
+    ) -> str | None:
+        if self.response_cache is None or not self.response_cache.enabled:
+            return None
+        return fingerprint(self.model_name, system_prompt, user_prompt, tools, tool_choice, temperature, MAX_TOKENS)
+
+    def _cached(self, key: str | None) -> tuple[dict, dict] | None:
+        """
+        Returns the cached tool input and usage of a request, or None. The usage is that of the original call.
+        """
+        if key is None:
+            return None
+        response = self.response_cache.get(key)
+        if response is None:
+            return None
+        return response["input"], {**response["usage"], "response_cache": "hit"}
+
+    def _store(self, key: str | None, tool_input: dict, usage: dict) -> dict:
+        """
+        Caches a response and returns its usage, tagged with the response cache status.
+        """
+        if key is None:
+            return {**usage, "response_cache": "off"}
+        self.response_cache.set(key, {"input": tool_input, "usage": usage})
+        return {**usage, "response_cache": "miss"}
+
+    async def _acached(self, key: str | None) -> tuple[dict, dict] | None:
+        """
+        Async counterpart of _cached. The SQLite lookup runs in a thread, off the event loop.
+        """
+        if key is None:
+            return None
+        return await asyncio.to_thread(self._cached, key)
+
+    async def _astore(self, key: str | None, tool_input: dict, usage: dict) -> dict:
+        """
+        Async counterpart of _store. The SQLite write, and any eviction, runs in a thread, off the event loop.
+        """
+        if key is None:
+            return self._store(key, tool_input, usage)
+        return await asyncio.to_thread(self._store, key, tool_input, usage)
+
+    def batch_request(
+        self,
+        custom_id: str,
+        system_prompt: str,
+        user_prompt: str,
+        tools: list[dict] = None,
+        tool_choice: str | None = None,
+        temperature: float = 0.0,
+    ) -> dict:
+        """
+        Builds one request of a Message Batch, with the same parameters generate would send.
+
+        Args:
+            custom_id (str): The ID matching the request to its result (letters, digits, "_" and "-", up to 64)
+        """
+        return {
+            "custom_id": custom_id,
+            "params": self._request(system_prompt, user_prompt, tools, tool_choice, temperature),
+        }
+
+    def generate(self, system_prompt: str, user_prompt: str, tools: list[dict] = None, tool_choice: str | None = None, temperature: float = 0.0) -> str:
+
+        return self.generate_with_usage(system_prompt, user_prompt, tools, tool_choice, temperature)[0]
+
+    async def agenerate(self, system_prompt: str, user_prompt: str, tools: list[dict] = None, tool_choice: str | None = None, temperature: float = 0.0) -> str:
+
+        return (await self.agenerate_with_usage(system_prompt, user_prompt, tools, tool_choice, temperature))[0]
+
+    def generate_with_usage(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        tools: list[dict] = None,
+        tool_choice: str | None = None,
+        temperature: float = 0.0,
+    ) -> tuple[dict, dict]:
+        """
+        Like generate, but also returns the token usage of the request.
+
+        Returns:
+            dict: The tool input produced by the model
+            dict: The input, output, cache creation and cache read token counts, and the response cache status
+                ("hit", "miss" or "off")
+        """
+        with tracing.span("llm", model=self.model_name):
+            key = self._cache_key(system_prompt, user_prompt, tools, tool_choice, temperature)
+            cached = self._cached(key)
+            if cached is not None:
+                trace_usage(cached[1])
+                return cached
+            message = self.client.messages.create(
+                **self._request(system_prompt, user_prompt, tools, tool_choice, temperature)
+            )
+            usage = self._store(key, message.content[0].input, usage_of(message))
+            trace_usage(usage)
+            return message.content[0].input, usage
+
+    async def agenerate_with_usage(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        tools: list[dict] = None,
+        tool_choice: str | None = None,
+        temperature: float = 0.0,
+    ) -> tuple[dict, dict]:
+        """
+        Async counterpart of generate_with_usage.
+        """
+        with tracing.span("llm", model=self.model_name):
+            key = self._cache_key(system_prompt, user_prompt, tools, tool_choice, temperature)
+            cached = await self._acached(key)
+            if cached is not None:
+                trace_usage(cached[1])
+                return cached
+            message = await self.async_client.messages.create(
+                **self._request(system_prompt, user_prompt, tools, tool_choice, temperature)
+            )
+            usage = await self._astore(key, message.content[0].input, usage_of(message))
+            trace_usage(usage)
+            return message.content[0].input, usage
+
+    def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        tools: list[dict] = None,
+        tool_choice: str | None = None,
+        temperature: float = 0.0,
+    ) -> Iterator[StreamUpdate]:
+        """
+        Like generate, but yields the tool input while it is being written: each top-level field when it
+        completes, and string fields as they grow.
+
+        Yields:
+            StreamUpdate: The fields changed by each chunk, then a final update with the full input and the usage.
+                A response cache hit yields only the final update.
+        """
+        with tracing.span("llm", model=self.model_name, stream=True) as span:
+            key = self._cache_key(system_prompt, user_prompt, tools, tool_choice, temperature)
+            cached = self._cached(key)
+            if cached is not None:
+                trace_usage(cached[1])
+                yield StreamUpdate(cached[0], done=True, usage=cached[1])
+                return
+            parser = PartialJSONObject()
+            with self.client.messages.stream(
+                **self._request(system_prompt, user_prompt, tools, tool_choice, temperature)
+            ) as stream:
+                for event in stream:
+                    if event.type == "input_json":
+                        if "ttft_ms" not in span.attributes:
+                            trace_first_token(span)
+                        changed = parser.feed(event.partial_json)
+                        if changed:
+                            yield StreamUpdate(parser.snapshot, changed)
+                message = stream.get_final_message()
+            usage = self._store(key, message.content[0].input, usage_of(message))
+            trace_usage(usage)
+            yield StreamUpdate(message.content[0].input, done=True, usage=usage)
+
+    async def astream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        tools: list[dict] = None,
+        tool_choice: str | None = None,
+        temperature: float = 0.0,
+    ) -> AsyncIterator[StreamUpdate]:
+        """
+        Async counterpart of stream. Closing the generator (or cancelling the task consuming it) closes
+        the HTTP stream.
+        """
+        with tracing.span("llm", model=self.model_name, stream=True) as span:
+            key = self._cache_key(system_prompt, user_prompt, tools, tool_choice, temperature)
+            cached = await self._acached(key)
+            if cached is not None:
+                trace_usage(cached[1])
+                yield StreamUpdate(cached[0], done=True, usage=cached[1])
+                return
+            parser = PartialJSONObject()
+            async with self.async_client.messages.stream(
+                **self._request(system_prompt, user_prompt, tools, tool_choice, temperature)
+            ) as stream:
+                async for event in stream:
+                    if event.type == "input_json":
+                        if "ttft_ms" not in span.attributes:
+                            trace_first_token(span)
+                        changed = parser.feed(event.partial_json)
+                        if changed:
+                            yield StreamUpdate(parser.snapshot, changed)
+                message = await stream.get_final_message()
+            usage = await self._astore(key, message.content[0].input, usage_of(message))
+            trace_usage(usage)
+            yield StreamUpdate(message.content[0].input, done=True, usage=usage)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.backend.constants import LLM_CACHE_MAX_MB, LLM_CACHE_MODE, LLM_CACHE_PATH
+
+# "off" never caches, "on" reads and writes the cache, "replay" only reads it and fails on a miss
+LLM_CACHE_MODES = ("off", "on", "replay")
+
+
+class ReplayMiss(LookupError):
+    """
+    Raised in replay mode when a request has no cached response.
+    """
+
+
+def fingerprint(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    tools: list[dict] | None,
+    tool_choice: str | None,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """
+    Hashes everything that determines an LLM response into a cache key.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": system_prompt,
+            "user": user_prompt,
+            "tools": tools,
+            "tool_choice": tool_choice,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    A persistent SQLite cache of LLM responses keyed by prompt fingerprint.
+
+    Entries are evicted least recently used first once the stored responses exceed `max_bytes`.
+
+    Args:
+        path (str): The path of the SQLite file
+        mode (str): "on" to read and write, "replay" to only read (a miss raises ReplayMiss), "off" to bypass
+        max_bytes (int): The maximum total size of the stored responses
+    """
+
+    def __init__(
+        self, path: str = LLM_CACHE_PATH, mode: str = LLM_CACHE_MODE, max_bytes: int = LLM_CACHE_MAX_MB << 20
+    ):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {LLM_CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def get(self, key: str) -> dict | None:
+        """
+        Returns the cached response of a fingerprint, or None. Raises ReplayMiss on a miss in replay mode.
+        """
+        if not self.enabled:
+            return None
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            if self.mode == "replay":
+                raise ReplayMiss(f"No cached LLM response for fingerprint {key} (replay mode)")
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, response: dict) -> None:
+        """
+        Stores a response, then evicts the least recently used responses beyond the size budget.
+        Does nothing unless the mode is "on".
+        """
+        if self.mode != "on":
+            return
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._lock, self._conn:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            while self._bytes > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used LIMIT 64"
+                ).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    self._bytes -= old_size
+                    self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the size of the cache.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,440 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Iterator
+
+from notion_client import Client
+
+from src.backend.cache import ENTITY_CACHE
+from src.backend.constants import (
+    LOCATION_DATABASE_ID,
+    MIRROR_PATH,
+    NOTION_TOKEN,
+    POLITY_DATABASE_ID,
+    TIMELINE_DATABASE_ID,
+)
+from src.backend import tracing
+
+if TYPE_CHECKING:
+    from src.backend.scheduler import NotionScheduler
+
+MIRRORED_DATABASE_IDS = [TIMELINE_DATABASE_ID, LOCATION_DATABASE_ID, POLITY_DATABASE_ID]
+
+
+def normalize_id(notion_id: str) -> str:
+    """
+    Normalizes a Notion page or database ID so dashed and undashed forms compare equal.
+    """
+    return notion_id.replace("-", "").lower()
+
+
+class NotionMirror:
+    """
+    Local SQLite mirror of the Timeline, Location and Polity databases.
+
+    The first sync pulls every page of each database. Later syncs only fetch pages whose
+    `last_edited_time` is at or after the newest one already mirrored, and only write the pages that differ
+    from their mirrored copy. Each database has a revision, persisted with its sync state, that is bumped
+    when a sync changes its pages, so a sync finding nothing new leaves the mirror (and what is derived from it)
+    as it is, in this process and in others reading the same file.
+
+    Args:
+        path (str): The path of the SQLite file
+        client (Client | None): The Notion client used to sync. Defaults to a client built from NOTION_TOKEN.
+        database_ids (list[str] | None): The databases to mirror. Defaults to Timeline, Location and Polity.
+        scheduler (NotionScheduler | None): The scheduler the sync's queries go through at bulk priority, sharing
+            the rate limit and the retries on 429. Defaults to the process-wide scheduler.
+    """
+
+    def __init__(
+        self,
+        path: str = MIRROR_PATH,
+        client: Client | None = None,
+        database_ids: list[str] | None = None,
+        scheduler: "NotionScheduler | None" = None,
+    ):
+        # Imported here: the scheduler imports normalize_id from this module
+        from src.backend.scheduler import NOTION_SCHEDULER
+
+        self.path = path
+        self.client = client if client is not None else Client(auth=NOTION_TOKEN)
+        self.scheduler = scheduler if scheduler is not None else NOTION_SCHEDULER
+        self.database_ids = [db_id for db_id in (database_ids or MIRRORED_DATABASE_IDS) if db_id]
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._pages: dict[str, dict[str, dict]] | None = None  # database -> page id -> page, decoded lazily
+        self._data_version = None
+        self.version = 0  # bumped whenever the mirrored pages change, so derived indexes know to rebuild
+        self._create_tables()
+        self._revisions = self.revisions()
+
+    def _create_tables(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    id TEXT PRIMARY KEY,
+                    database_id TEXT NOT NULL,
+                    last_edited_time TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_database ON pages (database_id)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    database_id TEXT PRIMARY KEY,
+                    last_edited_time TEXT,
+                    synced_at TEXT NOT NULL,
+                    revision INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sync_state)")}
+            if "revision" not in columns:
+                # Mirrors created before revisions were tracked
+                self._conn.execute("ALTER TABLE sync_state ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    def sync(self, full: bool = False) -> dict[str, int]:
+        """
+        Pulls new and updated pages from Notion into the mirror.
+
+        Args:
+            full (bool): Whether to pull every page again. A full sync also drops pages that were deleted
+                or archived in Notion, which an incremental sync cannot see.
+
+        Returns:
+            dict[str, int]: The number of pages added, changed or dropped per database ID
+        """
+        written = {}
+        for database_id in self.database_ids:
+            written[database_id] = self._sync_database(database_id, full)
+        if any(written.values()):
+            with self._lock:
+                self._pages = None
+                self._revisions = self.revisions()
+                self.version += 1
+        return written
+
+    def _sync_database(self, database_id: str, full: bool) -> int:
+        key = normalize_id(database_id)
+        high_water_mark = None if full else self.last_edited_time(database_id)
+
+        query = {"database_id": database_id, "page_size": 100}
+        if high_water_mark:
+            # Notion rounds last_edited_time to the minute, so re-fetch the boundary minute rather than miss edits.
+            query["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": high_water_mark}}
+
+        fetched = {}
+        newest = high_water_mark
+        for page in self._query_pages(query):
+            fetched[normalize_id(page["id"])] = page
+            if newest is None or page["last_edited_time"] > newest:
+                newest = page["last_edited_time"]
+
+        with self._lock, self._conn:
+            # The boundary minute is fetched again on every sync: only pages that differ from their copy are written
+            stored = self._stored_data(list(fetched))
+            rows = []
+            updated_ids = []
+            for page_id, page in fetched.items():
+                data = json.dumps(page)
+                if stored.get(page_id) != data:
+                    rows.append((page_id, key, page["last_edited_time"], data))
+                    updated_ids.append(page["id"])
+            stale = set()
+            if full:
+                existing = {row[0] for row in self._conn.execute("SELECT id FROM pages WHERE database_id = ?", (key,))}
+                stale = existing - set(fetched)
+                self._conn.executemany("DELETE FROM pages WHERE id = ?", [(page_id,) for page_id in stale])
+                for page_id in stale:
+                    ENTITY_CACHE.invalidate(str(uuid.UUID(page_id)))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (id, database_id, last_edited_time, data) VALUES (?, ?, ?, ?)", rows
+            )
+            changed = len(rows) + len(stale)
+            self._conn.execute(
+                """
+                INSERT INTO sync_state (database_id, last_edited_time, synced_at, revision) VALUES (?, ?, ?, ?)
+                ON CONFLICT (database_id) DO UPDATE SET
+                    last_edited_time = excluded.last_edited_time,
+                    synced_at = excluded.synced_at,
+                    revision = revision + ?
+                """,
+                (key, newest, datetime.now(timezone.utc).isoformat(), 1 if changed else 0, 1 if changed else 0),
+            )
+
+        # Pages already cached under their dashed ID would otherwise outlive the update.
+        for page_id in updated_ids:
+            ENTITY_CACHE.invalidate(page_id)
+        return changed
+
+    def _query_pages(self, query: dict) -> Iterator[dict]:
+        """
+        Yields every page matching a database query, one scheduled request per page of results.
+        """
+        from src.backend.scheduler import Priority
+
+        query_fn = tracing.traced_notion_call("databases.query", self.client.databases.query)
+        cursor = None
+        while True:
+            cursor_arg = {"start_cursor": cursor} if cursor else {}
+            response = self.scheduler.call("databases.query", query_fn, Priority.BULK, **query, **cursor_arg)
+            yield from response["results"]
+            if not response.get("has_more"):
+                return
+            cursor = response["next_cursor"]
+
+    def _stored_data(self, page_ids: list[str]) -> dict[str, str]:
+        """
+        Returns the mirrored JSON of the pages that are in the mirror, by normalized ID.
+        """
+        stored = {}
+        for i in range(0, len(page_ids), 500):
+            chunk = page_ids[i : i + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            stored.update(self._conn.execute(f"SELECT id, data FROM pages WHERE id IN ({placeholders})", chunk))
+        return stored
+
+    def revisions(self) -> dict[str, int]:
+        """
+        Returns the revision of every synced database, by normalized ID. Persisted in the mirror file and bumped
+        by every sync that changes the database's pages, in any process: unlike `version`, it identifies the
+        mirrored content across restarts.
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT database_id, revision FROM sync_state ORDER BY database_id"))
+
+    def content_state(self) -> dict[str, list]:
+        """
+        Returns the revision and newest `last_edited_time` of every synced database, by normalized ID. Persisted
+        in the mirror file, it identifies the mirrored content across processes and restarts, e.g. the content
+        a snapshot was taken of, where `version` only counts the changes seen by this process.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT database_id, revision, last_edited_time FROM sync_state ORDER BY database_id"
+            ).fetchall()
+        return {database_id: [revision, last_edited_time] for database_id, revision, last_edited_time in rows}
+
+    def last_edited_time(self, database_id: str) -> str | None:
+        """
+        Returns the newest `last_edited_time` mirrored for the database, or None if it was never synced.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_edited_time FROM sync_state WHERE database_id = ?", (normalize_id(database_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def last_synced(self, database_id: str) -> str | None:
+        """
+        Returns the wall-clock time of the last sync of the database, or None if it was never synced.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM sync_state WHERE database_id = ?", (normalize_id(database_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _load(self) -> dict[str, dict[str, dict]]:
+        with self._lock:
+            # data_version changes when another connection (e.g. the sync script) commits to the file;
+            # a sync that found nothing new only updates its sync time, and leaves the revisions as they were.
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                revisions = self.revisions()
+                if revisions != self._revisions:
+                    self._revisions = revisions
+                    self._pages = None
+                    self.version += 1
+            if self._pages is None:
+                pages: dict[str, dict[str, dict]] = {}
+                for page_id, database_id, data in self._conn.execute("SELECT id, database_id, data FROM pages"):
+                    pages.setdefault(database_id, {})[page_id] = json.loads(data)
+                self._pages = pages
+            return self._pages
+
+    def current_version(self) -> int:
+        """
+        Returns the version of the mirrored pages, picking up syncs made by other processes.
+        """
+        self._load()
+        return self.version
+
+    def start_background_sync(self, interval: float) -> threading.Thread:
+        """
+        Starts a daemon thread that runs an incremental sync every `interval` seconds.
+        """
+
+        def run():
+            stop = threading.Event()
+            while not stop.wait(interval):
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Error syncing the Notion mirror: {e}")
+
+        thread = threading.Thread(target=run, name="notion-mirror-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def get_page(self, page_id: str) -> dict | None:
+        """
+        Gets a mirrored page by its ID from any mirrored database.
+        """
+        page_id = normalize_id(page_id)
+        for pages in self._load().values():
+            if page_id in pages:
+                return pages[page_id]
+        return None
+
+    def iter_pages(self, database_id: str) -> Iterator[dict]:
+        """
+        Iterates over every mirrored page of the database.
+        """
+        yield from list(self._load().get(normalize_id(database_id), {}).values())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _MirrorPages:
+    def __init__(self, mirror: NotionMirror, fallback: Client | None):
+        self.mirror = mirror
+        self.fallback = fallback
+
+    def retrieve(self, page_id: str, **kwargs) -> dict:
+        page = self.mirror.get_page(page_id)
+        if page is None:
+            if self.fallback is None:
+                raise KeyError(f"Page {page_id} is not in the mirror")
+            return self.fallback.pages.retrieve(page_id=page_id, **kwargs)
+        return page
+
+
+class _MirrorDatabases:
+    def __init__(self, mirror: NotionMirror):
+        self.mirror = mirror
+
+    def query(
+        self,
+        database_id: str,
+        filter: dict | None = None,
+        sorts: list | None = None,
+        start_cursor: str | None = None,
+        page_size: int = 100,
+        **kwargs,
+    ) -> dict:
+        if sorts:
+            raise ValueError("Sorting is not supported by the mirror")
+        results = [
+            page for page in self.mirror.iter_pages(database_id) if filter is None or matches_filter(page, filter)
+        ]
+        offset = int(start_cursor) if start_cursor else 0
+        page_size = min(page_size, 100)
+        chunk = results[offset : offset + page_size]
+        has_more = offset + page_size < len(results)
+        return {
+            "object": "list",
+            "results": chunk,
+            "has_more": has_more,
+            "next_cursor": str(offset + page_size) if has_more else None,
+        }
+
+
+class MirrorClient:
+    """
+    Serves the subset of the `notion_client.Client` API used by EventsExtractor from a NotionMirror,
+    so the extractor can run entirely against the local copy.
+
+    Args:
+        mirror (NotionMirror): The mirror to read from
+        fallback (Client | None): A live client used for pages outside the mirrored databases
+    """
+
+    def __init__(self, mirror: NotionMirror, fallback: Client | None = None):
+        self.mirror = mirror
+        self.fallback = fallback
+        self.pages = _MirrorPages(mirror, fallback)
+        self.databases = _MirrorDatabases(mirror)
+
+
+def _plain_text(segments: list[dict]) -> str:
+    return "".join(segment.get("plain_text", "") for segment in segments or [])
+
+
+def _property_value(prop: dict):
+    prop_type = prop.get("type")
+    if prop_type in ("title", "rich_text"):
+        return _plain_text(prop.get(prop_type))
+    if prop_type == "select":
+        return prop["select"]["name"] if prop.get("select") else None
+    if prop_type == "relation":
+        return [normalize_id(relation["id"]) for relation in prop.get("relation") or []]
+    return prop.get(prop_type)
+
+
+def _compare(value, condition: dict) -> bool:
+    (operator, operand), = condition.items()
+    if operator == "is_empty":
+        return value in (None, "", [])
+    if operator == "is_not_empty":
+        return value not in (None, "", [])
+    if isinstance(value, list):  # relation
+        if operator == "contains":
+            return normalize_id(operand) in value
+        if operator == "does_not_contain":
+            return normalize_id(operand) not in value
+    elif operator == "equals":
+        return value == operand
+    elif operator == "does_not_equal":
+        return value != operand
+    elif value is None:
+        return False
+    elif operator in ("contains", "does_not_contain", "starts_with", "ends_with"):
+        return {
+            "contains": operand in value,
+            "does_not_contain": operand not in value,
+            "starts_with": value.startswith(operand),
+            "ends_with": value.endswith(operand),
+        }[operator]
+    elif operator in ("greater_than", "after"):
+        return value > operand
+    elif operator in ("less_than", "before"):
+        return value < operand
+    elif operator in ("greater_than_or_equal_to", "on_or_after"):
+        return value >= operand
+    elif operator in ("less_than_or_equal_to", "on_or_before"):
+        return value <= operand
+    raise ValueError(f"Unsupported filter condition: {condition}")
+
+
+def matches_filter(page: dict, notion_filter: dict) -> bool:
+    """
+    Evaluates a Notion database query filter against a page.
+    Supports the compound, property and timestamp filters used by the extractor.
+    """
+    if "and" in notion_filter:
+        return all(matches_filter(page, sub_filter) for sub_filter in notion_filter["and"])
+    if "or" in notion_filter:
+        return any(matches_filter(page, sub_filter) for sub_filter in notion_filter["or"])
+    if "timestamp" in notion_filter:
+        timestamp = notion_filter["timestamp"]
+        return _compare(page.get(timestamp), notion_filter[timestamp])
+
+    prop = page.get("properties", {}).get(notion_filter["property"])
+    if prop is None:
+        raise ValueError(f"Unknown property: {notion_filter['property']}")
+    conditions = [value for key, value in notion_filter.items() if key != "property"]
+    if len(conditions) != 1:
+        raise ValueError(f"Unsupported filter: {notion_filter}")
+    return _compare(_property_value(prop), conditions[0])
@@ -0,0 +1,185 @@
+from bisect import bisect_left
+from collections import Counter
+
+from src.backend.mirror import normalize_id
+
+
+def normalize_name(name: str) -> str:
+    """
+    Folds the case and whitespace of a name for lookups that should forgive them.
+    """
+    return " ".join(name.casefold().split())
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Returns the character trigrams of a normalized name, padded so that short names and word starts count.
+    """
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """
+    Computes the Levenshtein distance between two strings, giving up with `bound + 1` once it must exceed `bound`.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    A two-way mapping between the titles and page IDs of a database, over integer positions that follow
+    the order of the pages.
+
+    Besides exact lookups, it answers prefix searches on a sorted array of normalized names (binary search)
+    and fuzzy searches through a trigram inverted index whose candidates are ranked by edit distance,
+    for autocomplete and typo-tolerant name resolution without a Notion query.
+
+    Args:
+        ids (list[str]): The page IDs
+        names (list[str | None]): The title of each page, None if untitled
+    """
+
+    def __init__(self, ids: list[str], names: list[str | None]):
+        self.ids = list(ids)
+        self.names = list(names)
+        self._positions = {normalize_id(page_id): position for position, page_id in enumerate(self.ids)}
+        self._positions_by_name: dict[str, int] = {}
+        self._positions_by_key: dict[str, list[int]] = {}
+        self._trigrams: dict[str, list[int]] | None = None  # built on the first fuzzy search
+        keyed = []
+        for position, name in enumerate(self.names):
+            if name is None:
+                continue
+            self._positions_by_name.setdefault(name, position)
+            key = normalize_name(name)
+            self._positions_by_key.setdefault(key, []).append(position)
+            if len(self._positions_by_key[key]) == 1:
+                keyed.append((key, position))
+        keyed.sort()
+        self._sorted_keys = [key for key, _ in keyed]
+        self._sorted_positions = [position for _, position in keyed]
+
+    @classmethod
+    def from_pages(cls, pages: list[dict], title_property: str = "Name") -> "NameIndex":
+        """
+        Builds the index of raw Notion pages from their title property.
+        """
+        names = []
+        for page in pages:
+            title = page.get("properties", {}).get(title_property, {}).get("title") or []
+            names.append(title[0]["plain_text"] if title else None)
+        return cls([page["id"] for page in pages], names)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions_by_name
+
+    def position(self, page_id: str) -> int | None:
+        """
+        Returns the position of a page ID, or None if it is not indexed.
+        """
+        return self._positions.get(normalize_id(page_id))
+
+    def id_of(self, name: str) -> str | None:
+        """
+        Returns the ID of the first page with that exact name, or None.
+        """
+        position = self._positions_by_name.get(name)
+        return self.ids[position] if position is not None else None
+
+    def name_of(self, page_id: str) -> str | None:
+        """
+        Returns the name of a page ID, or None if it is not indexed or untitled.
+        """
+        position = self.position(page_id)
+        return self.names[position] if position is not None else None
+
+    def sorted_names(self) -> list[str]:
+        """
+        Returns every distinct name in case-insensitive alphabetical order, e.g. as autocomplete options.
+        """
+        return [self.names[position] for position in self._sorted_positions]
+
+    def resolve(self, name: str) -> str | None:
+        """
+        Resolves a name to its page ID, ignoring case and extra whitespace when that still singles out one page.
+
+        Returns:
+            str | None: The page ID, or None if no page (or several pages) match
+        """
+        page_id = self.id_of(name)
+        if page_id is not None:
+            return page_id
+        positions = self._positions_by_key.get(normalize_name(name), [])
+        return self.ids[positions[0]] if len(positions) == 1 else None
+
+    def prefix(self, query: str, limit: int = 10) -> list[str]:
+        """
+        Returns the names starting with the query (case-insensitively), in alphabetical order.
+        """
+        key = normalize_name(query)
+        matches = []
+        for i in range(bisect_left(self._sorted_keys, key), len(self._sorted_keys)):
+            if len(matches) >= limit or not self._sorted_keys[i].startswith(key):
+                break
+            matches.append(self.names[self._sorted_positions[i]])
+        return matches
+
+    def fuzzy(self, query: str, limit: int = 10) -> list[str]:
+        """
+        Returns the names closest to the query, tolerating typos and missing or reordered words.
+
+        Candidates sharing the most trigrams with the query are ranked by edit distance. A name is kept if it is
+        within a third of the query's length in edits, or shares at least half of its trigrams with the query.
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+        query_trigrams = trigrams(key)
+        postings = self._trigram_postings()
+        shared = Counter(position for trigram in query_trigrams for position in postings.get(trigram, ()))
+        bound = max(1, len(key) // 3)
+        scored = []
+        for position, count in shared.most_common(limit * 5):
+            candidate = normalize_name(self.names[position])
+            dice = 2 * count / (len(query_trigrams) + len(trigrams(candidate)))
+            distance = edit_distance(key, candidate, bound)
+            if distance <= bound or dice >= 0.5:
+                scored.append((distance, -dice, self.names[position]))
+        return [name for _, _, name in sorted(scored)[:limit]]
+
+    def _trigram_postings(self) -> dict[str, list[int]]:
+        """
+        Returns the positions of the names containing each trigram, building the inverted index on first use
+        so that indexes only used for exact lookups never pay for it.
+        """
+        if self._trigrams is None:
+            postings: dict[str, list[int]] = {}
+            for key, position in zip(self._sorted_keys, self._sorted_positions):
+                for trigram in trigrams(key):
+                    postings.setdefault(trigram, []).append(position)
+            self._trigrams = postings
+        return self._trigrams
+
+    def suggest(self, query: str, limit: int = 10) -> list[str]:
+        """
+        Returns autocomplete suggestions for a partially typed or misspelled name: prefix matches first,
+        then fuzzy matches.
+        """
+        suggestions = dict.fromkeys(self.prefix(query, limit))
+        if len(suggestions) < limit:
+            suggestions.update(dict.fromkeys(self.fuzzy(query, limit)))
+        return list(suggestions)[:limit]
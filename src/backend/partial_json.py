@@ -0,0 +1,170 @@
+import json
+from dataclasses import dataclass
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class FieldUpdate:
+    """
+    A change to one top-level field of a JSON object being streamed.
+
+    Attributes:
+        field (str): The field name
+        value (Any): The field value. While a string field is still streaming, the text received so far.
+        complete (bool): Whether the value is final
+    """
+
+    field: str
+    value: Any
+    complete: bool
+
+
+class PartialJSONObject:
+    """
+    Incrementally parses a JSON object that arrives in chunks, such as the tool input of a streamed message.
+
+    Each character is scanned once. A top-level field is decoded when its value closes; string values are also
+    reported while they grow, so long texts such as a description can be shown as they are written.
+    Nested objects and arrays are reported once complete.
+    """
+
+    def __init__(self):
+        self.fields: dict[str, Any] = {}
+        self._state = "start"  # start, key_or_end, key, colon, value, after_value, end
+        self._key: list[str] = []
+        self._value: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def snapshot(self) -> dict:
+        """
+        Every field seen so far, with the string being streamed (if any) as received so far.
+        """
+        snapshot = dict(self.fields)
+        partial = self._partial_string()
+        if partial is not None:
+            snapshot[self._key_name()] = partial
+        return snapshot
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the closing brace of the object has been read.
+        """
+        return self._state == "end"
+
+    def feed(self, chunk: str) -> list[FieldUpdate]:
+        """
+        Consumes the next chunk of JSON text.
+
+        Args:
+            chunk (str): The text following the previous chunk
+
+        Returns:
+            list[FieldUpdate]: The fields completed by this chunk, followed by the string field still being
+                streamed if it grew
+        """
+        updates = []
+        string_grew = False
+        for char in chunk:
+            state = self._state
+            if state == "start":
+                if char == "{":
+                    self._state = "key_or_end"
+            elif state == "key_or_end":
+                if char == '"':
+                    self._key = []
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "end"
+            elif state == "key":
+                if self._escape:
+                    self._key.append(char)
+                    self._escape = False
+                elif char == "\\":
+                    self._key.append(char)
+                    self._escape = True
+                elif char == '"':
+                    self._state = "colon"
+                else:
+                    self._key.append(char)
+            elif state == "colon":
+                if char == ":":
+                    self._value = []
+                    self._depth = 0
+                    self._in_string = False
+                    self._escape = False
+                    self._state = "value"
+            elif state == "value":
+                if not self._value and char in _WHITESPACE:
+                    continue
+                if self._in_string:
+                    self._value.append(char)
+                    if self._escape:
+                        self._escape = False
+                    elif char == "\\":
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                    if self._depth == 0:
+                        string_grew = True
+                elif self._depth == 0 and char in ",}":
+                    updates.append(self._complete_value())
+                    string_grew = False
+                    self._state = "key_or_end" if char == "," else "end"
+                else:
+                    self._value.append(char)
+                    if char == '"':
+                        self._in_string = True
+                        string_grew = self._depth == 0
+                    elif char in "{[":
+                        self._depth += 1
+                    elif char in "}]":
+                        self._depth -= 1
+                        if self._depth == 0:
+                            updates.append(self._complete_value())
+                            self._state = "after_value"
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "key_or_end"
+                elif char == "}":
+                    self._state = "end"
+
+        if string_grew:
+            partial = self._partial_string()
+            if partial is not None:
+                updates.append(FieldUpdate(self._key_name(), partial, False))
+        return updates
+
+    def _key_name(self) -> str:
+        return json.loads(f'"{"".join(self._key)}"')
+
+    def _complete_value(self) -> FieldUpdate:
+        key = self._key_name()
+        value = json.loads("".join(self._value))
+        self.fields[key] = value
+        self._value = []
+        return FieldUpdate(key, value, True)
+
+    def _partial_string(self) -> str | None:
+        """
+        Decodes the top-level string value being streamed, dropping an escape sequence cut off by the chunking.
+        """
+        if self._state != "value" or self._depth != 0 or not self._value or self._value[0] != '"':
+            return None
+        raw = "".join(self._value[1:])
+        if not self._in_string:
+            raw = raw.rstrip(_WHITESPACE)[:-1]  # the closing quote
+        backslash = raw.rfind("\\", max(len(raw) - 6, 0))
+        if backslash >= 0 and (backslash == len(raw) - 1 or raw[backslash + 1] == "u") and len(raw) - backslash < 6:
+            # Possibly a truncated escape; an escaped backslash ("\\") just before it is still complete.
+            if (len(raw[:backslash]) - len(raw[:backslash].rstrip("\\"))) % 2 == 0:
+                raw = raw[:backslash]
+        try:
+            return json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return None
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+from src.backend.constants import PREFETCH_MAX_AGE
+from src.backend import tracing
+
+
+class ContextPrefetcher:
+    """
+    Holds the speculative context retrieval of one session: at most one, for the parameters last entered in a form.
+
+    Entering new parameters cancels the retrieval of the previous ones. Submitting the form takes the retrieval
+    if it was started for the same parameters and is at most `max_age` seconds old, so that the context of a
+    stale prefetch, e.g. from before an edit in Notion, is never used; otherwise the retrieval is cancelled and
+    the generation retrieves its context itself.
+
+    Args:
+        max_age (float): The seconds a prefetched retrieval is reused for
+    """
+
+    def __init__(self, max_age: float = PREFETCH_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._key: Hashable | None = None
+        self._future: Future | None = None
+        self._started = 0.0
+
+    def prefetch(self, key: Hashable, start: Callable[[], Future]) -> None:
+        """
+        Starts the retrieval of the parameters, unless it is already running or done.
+
+        Args:
+            key (Hashable): The kind of generation and its retrieval parameters
+            start (Callable[[], Future]): Starts the retrieval, e.g. Generator.prefetch_similar_event
+        """
+        with self._lock:
+            if self._future is not None and self._key == key and not self._expired():
+                return
+            self._discard()
+            self._key, self._future, self._started = key, start(), time.monotonic()
+
+    def take(self, key: Hashable) -> Future | None:
+        """
+        Hands over the retrieval of the parameters, or cancels a retrieval of other parameters.
+
+        Returns:
+            Future | None: The retrieval, running or done, None if it was not prefetched
+        """
+        with self._lock:
+            if self._future is not None and self._key == key and not self._expired():
+                future, self._key, self._future = self._future, None, None
+                tracing.count("context_prefetches", outcome="used")
+                return future
+            self._discard()
+            return None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._discard()
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._started > self.max_age
+
+    def _discard(self) -> None:
+        if self._future is not None:
+            self._future.cancel()
+            tracing.count("context_prefetches", outcome="discarded")
+        self._key, self._future = None, None
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+from notion_client import APIErrorCode, APIResponseError
+
+from src.backend.constants import NOTION_RATE_LIMIT, NOTION_RATE_BURST
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Each request takes one token; tokens refill at `rate` per second up to `capacity`.
+    Callers that find the bucket empty reserve a future token and wait for it, so requests are spread evenly
+    instead of retried in a burst.
+
+    Args:
+        rate (float): The number of tokens added per second
+        capacity (float): The maximum number of tokens, i.e. the largest allowed burst
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns the number of seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._not_before - now)
+
+    def refund(self) -> None:
+        """
+        Gives back a reserved token that was not used, e.g. for a request cancelled while waiting for it.
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """
+        Waits without blocking the event loop until a token is available.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every request for the given number of seconds, e.g. after a 429 with a Retry-After header.
+        """
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+
+def retry_after(error: Exception, attempt: int) -> float | None:
+    """
+    Returns the number of seconds to wait before retrying a rate limited Notion request,
+    or None if the error is not a rate limit.
+
+    Args:
+        error (Exception): The error raised by the Notion client
+        attempt (int): The number of attempts made so far, used for the fallback exponential backoff
+
+    Returns:
+        float | None: The delay in seconds
+    """
+    if not isinstance(error, APIResponseError) or not (error.code == APIErrorCode.RateLimited or error.status == 429):
+        return None
+    try:
+        return float(error.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return min(2.0**attempt, 30.0)
+
+
+# Shared by every EventsExtractor in the process, so concurrent sessions stay under Notion's published rate.
+NOTION_RATE_LIMITER = TokenBucket(rate=NOTION_RATE_LIMIT, capacity=NOTION_RATE_BURST)
@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Callable
+
+from notion_client import APIResponseError
+
+from src.backend.constants import NOTION_MAX_RETRIES
+from src.backend.mirror import normalize_id
+from src.backend.ratelimit import NOTION_RATE_LIMITER, TokenBucket, retry_after
+from src.backend import tracing
+
+
+class Priority(IntEnum):
+    """
+    The order in which queued Notion requests are let through; lower goes first.
+    """
+
+    INTERACTIVE = 0  # what a user is waiting on directly, e.g. the seed event of a generation
+    CONTEXT = 1  # context of an interactive request, e.g. similar events and their relations
+    BULK = 2  # background work, e.g. full scans for the in-memory indexes
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on a flight whose leader was cancelled, so its followers issue the request themselves.
+    """
+
+
+class _Ticket:
+    """
+    A queued request waiting for the dispatcher to let it through. Sync callers wait on an Event,
+    async callers on a future of their own event loop.
+    """
+
+    __slots__ = ("event", "loop", "future", "cancelled")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+        self.loop = loop
+        self.event = None if loop is not None else threading.Event()
+        self.future = loop.create_future() if loop is not None else None
+        self.cancelled = False
+
+    def grant(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class NotionScheduler:
+    """
+    A process-wide gate in front of Notion requests.
+
+    Identical requests made while one is in flight share its response instead of being sent again
+    ("single-flight"), whether the callers are threads or coroutines. Requests that are sent wait in a priority
+    queue; a dispatcher thread lets the most urgent one through each time the rate limiter has a token,
+    so a user's seed event overtakes queued bulk reads.
+
+    Args:
+        limiter (TokenBucket): The rate limiter
+        max_retries (int): The number of times a rate limited request is retried
+    """
+
+    def __init__(self, limiter: TokenBucket = NOTION_RATE_LIMITER, max_retries: int = NOTION_MAX_RETRIES):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._lock = threading.Condition()
+        self._queue: list[tuple[int, int, _Ticket]] = []
+        self._sequence = itertools.count()
+        self._flights: dict[tuple[str, str], Future] = {}
+        self._dispatcher: threading.Thread | None = None
+        self.dispatched = 0
+        self.coalesced = 0
+        self.max_queue_depth = 0
+
+    def call(self, endpoint: str, fn: Callable[..., Any], priority: Priority = Priority.CONTEXT, **kwargs) -> Any:
+        """
+        Calls a Notion client method, sharing the response of an identical request in flight.
+
+        Args:
+            endpoint (str): The name of the endpoint, e.g. "databases.query". Requests to the same endpoint with
+                the same arguments are identical, whichever client (sync or async) makes them.
+            fn (Callable): The client method
+            priority (Priority): The queueing priority
+
+        Returns:
+            Any: The response
+        """
+        key = self._key(endpoint, kwargs)
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return flight.result()
+            except _LeaderCancelled:
+                continue
+
+        try:
+            result = self._call_with_retry(fn, priority, kwargs)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result=result)
+        return result
+
+    async def acall(
+        self, endpoint: str, fn: Callable[..., Any], priority: Priority = Priority.CONTEXT, **kwargs
+    ) -> Any:
+        """
+        Async counterpart of call. `fn` may be a coroutine function, awaited on the event loop, or a plain one,
+        e.g. a sync Client method, run in a thread so that it does not block the loop.
+        """
+        key = self._key(endpoint, kwargs)
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded so that cancelling this follower does not cancel the shared flight
+                return await asyncio.shield(asyncio.wrap_future(flight))
+            except _LeaderCancelled:
+                continue
+
+        try:
+            result = await self._acall_with_retry(fn, priority, kwargs)
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result=result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Returns the queue depth per priority and the request counters.
+        """
+        with self._lock:
+            depths = {priority.name.lower(): 0 for priority in Priority}
+            for priority, _, ticket in self._queue:
+                if not ticket.cancelled:
+                    depths[Priority(priority).name.lower()] += 1
+            return {
+                "queue_depth": sum(depths.values()),
+                "queue_depth_by_priority": depths,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": len(self._flights),
+                "dispatched": self.dispatched,
+                "coalesced": self.coalesced,
+            }
+
+    def _key(self, endpoint: str, kwargs: dict) -> tuple[str, str]:
+        normalized = {
+            name: normalize_id(value) if name.endswith("_id") and isinstance(value, str) else value
+            for name, value in kwargs.items()
+        }
+        return endpoint, json.dumps(normalized, sort_keys=True, default=str)
+
+    def _join(self, key: tuple[str, str]) -> tuple[Future, bool]:
+        """
+        Returns the flight of an identical request, or starts one. The second value tells whether the caller
+        leads the flight, i.e. has to make the request.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = Future()
+            flight.set_running_or_notify_cancel()  # only the leader resolves it
+            self._flights[key] = flight
+            return flight, True
+
+    def _land(self, key: tuple[str, str], flight: Future, result: Any = None, error: BaseException | None = None):
+        with self._lock:
+            self._flights.pop(key, None)
+        if error is None:
+            flight.set_result(result)
+        elif isinstance(error, (asyncio.CancelledError, KeyboardInterrupt)):
+            flight.set_exception(_LeaderCancelled())
+        else:
+            flight.set_exception(error)
+
+    def _call_with_retry(self, fn: Callable[..., Any], priority: Priority, kwargs: dict) -> Any:
+        for attempt in range(self.max_retries + 1):
+            ticket = self._enqueue(priority, _Ticket())
+            ticket.event.wait()
+            try:
+                return fn(**kwargs)
+            except APIResponseError as e:
+                delay = retry_after(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                self.limiter.pause(delay)
+
+    async def _acall_with_retry(self, fn: Callable[..., Any], priority: Priority, kwargs: dict) -> Any:
+        for attempt in range(self.max_retries + 1):
+            ticket = self._enqueue(priority, _Ticket(asyncio.get_running_loop()))
+            try:
+                await ticket.future
+            except asyncio.CancelledError:
+                ticket.cancelled = True
+                raise
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    return await fn(**kwargs)
+                result = await asyncio.to_thread(tracing.copy_context_call(fn), **kwargs)
+                # e.g. an AsyncClient method, which returns an awaitable without being a coroutine function
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            except APIResponseError as e:
+                delay = retry_after(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                self.limiter.pause(delay)
+
+    def _enqueue(self, priority: Priority, ticket: _Ticket) -> _Ticket:
+        with self._lock:
+            heapq.heappush(self._queue, (int(priority), next(self._sequence), ticket))
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="notion-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._lock.notify()
+        return ticket
+
+    def _dispatch(self) -> None:
+        """
+        Lets the most urgent queued request through each time the limiter has a token. The request is only
+        picked once the token is available, so requests queued during the wait can still overtake.
+        """
+        while True:
+            with self._lock:
+                while not self._drop_cancelled():
+                    self._lock.wait()
+            wait = self.limiter.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            with self._lock:
+                if not self._drop_cancelled():
+                    # Every queued request was cancelled during the wait: the token goes to the next one
+                    self.limiter.refund()
+                    continue
+                _, _, ticket = heapq.heappop(self._queue)
+                self.dispatched += 1
+            ticket.grant()
+
+    def _drop_cancelled(self) -> bool:
+        """
+        Pops cancelled tickets off the top of the queue and tells whether a live one is left.
+        """
+        while self._queue and self._queue[0][2].cancelled:
+            heapq.heappop(self._queue)
+        return bool(self._queue)
+
+
+# Shared by every EventsExtractor reading from the live API, so all sessions queue behind one rate limit.
+NOTION_SCHEDULER = NotionScheduler()
@@ -0,0 +1,125 @@
+import re
+import zlib
+
+import numpy as np
+
+from src.backend.constants import SIMILARITY_FEATURES
+
+_TOKEN = re.compile(r"\w+")
+
+# Words too common to tell events apart
+STOPWORDS = frozenset(
+    "a an and are as at be by for from had has have he her his in into is it its of on or over she that the their "
+    "them they this to was were which while who with".split()
+)
+
+
+def event_text(event: dict) -> str:
+    """
+    Returns the text an event is compared on: its name, description and excerpt.
+    """
+    return " ".join(event.get(key) or "" for key in ("name", "description", "excerpt"))
+
+
+def event_features(event: dict) -> list[str]:
+    """
+    Returns the n-gram features of a parsed event: word unigrams and bigrams of its text without stopwords,
+    and its event type. The event type is counted twice, so that events of the same kind stay close when their texts are short.
+    """
+    words = [word for word in _TOKEN.findall(event_text(event).casefold()) if word not in STOPWORDS]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if event.get("event_type"):
+        features += [f"type:{event['event_type']}"] * 2
+    return features
+
+
+class SimilarityIndex:
+    """
+    A local TF-IDF index of parsed events for cosine similarity search, without any network call.
+
+    Features are hashed into `n_features` signed buckets (the hashing trick), so no vocabulary is kept. Term
+    frequencies are dampened logarithmically, weighted by inverse document frequency over the indexed events,
+    and rows are L2-normalized, so that a matrix product gives the cosine similarities of a whole batch.
+
+    Args:
+        events (list[dict]): The parsed events to index
+        n_features (int): The number of hash buckets
+    """
+
+    def __init__(self, events: list[dict], n_features: int = SIMILARITY_FEATURES):
+        self.n_features = n_features
+        counts = self._counts([event_features(event) for event in events])
+        document_frequency = np.count_nonzero(counts, axis=0)
+        # Smoothed, as if one extra document contained every feature
+        self.idf = (np.log((1 + len(events)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.vectors = self._normalize(self._weigh(counts))
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def transform(self, events: list[dict]) -> np.ndarray:
+        """
+        Vectorizes events with the weights of the index.
+
+        Returns:
+            np.ndarray: One L2-normalized row per event
+        """
+        return self._normalize(self._weigh(self._counts([event_features(event) for event in events])))
+
+    def scores(self, events: list[dict]) -> np.ndarray:
+        """
+        Returns the cosine similarity of each query event (rows) to each indexed event (columns).
+        """
+        return self.transform(events) @ self.vectors.T
+
+    def top_k(self, events: list[dict], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k indexed events most similar to each query event, for the whole batch at once.
+
+        Returns:
+            np.ndarray: The positions of the indexed events, one row per query, most similar first
+            np.ndarray: Their cosine similarities
+        """
+        scores = self.scores(events)
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            empty = np.empty((len(events), 0))
+            return empty.astype(np.int64), empty
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def _counts(self, documents: list[list[str]]) -> np.ndarray:
+        """
+        Hashes the features of every document into a signed count matrix.
+        """
+        rows, columns, signs = [], [], []
+        for row, features in enumerate(documents):
+            for feature in features:
+                # crc32 is stable across processes, unlike hash()
+                digest = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(digest % self.n_features)
+                signs.append(1.0 if digest & 0x80000000 else -1.0)
+        counts = np.zeros((len(documents), self.n_features), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)), signs)
+        return counts
+
+    def _weigh(self, counts: np.ndarray) -> np.ndarray:
+        return np.sign(counts) * np.log1p(np.abs(counts)) * self.idf
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+def similarity_scores(seed: dict, events: list[dict]) -> list[float]:
+    """
+    Returns the cosine similarity of each event to the seed event, with inverse document frequencies taken over
+    the events and the seed.
+    """
+    if not events:
+        return []
+    index = SimilarityIndex(events + [seed])
+    return index.scores([seed])[0, : len(events)].tolist()
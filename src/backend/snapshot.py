@@ -0,0 +1,237 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.backend.graph import LocationGraph
+from src.backend.mirror import normalize_id
+from src.backend.store import EventStore, RelationColumn, StringColumn, stored_number
+
+# Bumped whenever the layout of the arrays changes; snapshots of another format are ignored
+SNAPSHOT_FORMAT = 1
+
+# The file naming the directory of the latest snapshot
+CURRENT_FILE = "CURRENT"
+
+# The number of snapshots kept, so that processes still mapping the previous one keep their files
+KEEP_SNAPSHOTS = 2
+
+
+@dataclass
+class Snapshot:
+    """
+    The parsed world data read back from a snapshot. Arrays are memory-mapped: pages are read from disk on
+    first access and shared by every process mapping the same files.
+
+    Attributes:
+        manifest (dict): The format, creation time, source mirror state and row counts
+        events (EventStore): Every Timeline event
+        locations (LocationGraph): Every location and the "Near" relation between them
+        polities (dict[str, dict]): Every polity, parsed as EventsExtractor._parse_polity does, by normalized page ID
+    """
+
+    manifest: dict
+    events: EventStore
+    locations: LocationGraph
+    polities: dict[str, dict]
+
+
+class _Writer:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def array(self, name: str, array: np.ndarray) -> None:
+        np.save(os.path.join(self.directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    def strings(self, name: str, column: StringColumn | list[str | None]) -> None:
+        if not isinstance(column, StringColumn):
+            column = StringColumn.from_strings(column)
+        self.array(f"{name}.data", column.data)
+        self.array(f"{name}.offsets", column.offsets)
+        self.array(f"{name}.nulls", column.nulls)
+
+    def relation(self, name: str, column: RelationColumn) -> None:
+        self.strings(f"{name}.ids", column.ids)
+        self.array(f"{name}.indptr", column.indptr)
+        self.array(f"{name}.codes", column.codes)
+
+
+class _Reader:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def array(self, name: str) -> np.ndarray:
+        # A plain ndarray view of the mapping: indexing an np.memmap is several times slower
+        return np.asarray(np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False))
+
+    def strings(self, name: str) -> StringColumn:
+        return StringColumn(self.array(f"{name}.data"), self.array(f"{name}.offsets"), self.array(f"{name}.nulls"))
+
+    def string_list(self, name: str) -> list[str | None]:
+        return self.strings(name).to_list()
+
+    def relation(self, name: str) -> RelationColumn:
+        return RelationColumn(
+            self.string_list(f"{name}.ids"), self.array(f"{name}.indptr"), self.array(f"{name}.codes")
+        )
+
+
+def _floats(values: list) -> np.ndarray:
+    return np.asarray([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def write_snapshot(
+    directory: str,
+    events: EventStore,
+    locations: LocationGraph,
+    polities: dict[str, dict],
+    source_state: dict | None = None,
+) -> str:
+    """
+    Writes the world data as a new snapshot under `directory` and makes it the current one. The arrays are
+    written to a fresh subdirectory, then CURRENT is replaced atomically, so readers never see a partial snapshot.
+
+    Args:
+        directory (str): The snapshot directory, e.g. in the mounted `local/` volume
+        events (EventStore): Every Timeline event
+        locations (LocationGraph): The location graph
+        polities (dict[str, dict]): Every parsed polity by page ID
+        source_state (dict | None): The mirror content the data was read from (see NotionMirror.content_state),
+            None for the live API
+
+    Returns:
+        str: The path of the new snapshot
+    """
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    writer = _Writer(path)
+
+    writer.strings("events.ids", events.ids)
+    writer.strings("events.names", events.names)
+    writer.array("events.start_years", events.start_years)
+    writer.array("events.end_years", events.end_years)
+    writer.array("events.importances", events.importances)
+    writer.strings("events.event_types", events.event_types)
+    writer.array("events.event_type_codes", events.event_type_codes)
+    writer.strings("events.descriptions", events.descriptions)
+    writer.strings("events.excerpts", events.excerpts)
+    writer.relation("events.locations", events.locations)
+    writer.relation("events.polities", events.polities)
+
+    writer.strings("locations.ids", locations.ids)
+    writer.strings("locations.names", locations.names)
+    writer.strings("locations.biomes", locations.biomes)
+    writer.array("locations.indptr", locations.indptr)
+    writer.array("locations.indices", locations.indices)
+
+    polity_ids = list(polities)
+    writer.strings("polities.ids", polity_ids)
+    writer.strings("polities.names", [polities[polity_id]["name"] for polity_id in polity_ids])
+    writer.strings("polities.types", [polities[polity_id]["type"] for polity_id in polity_ids])
+    writer.array("polities.start_years", _floats([polities[polity_id]["start_year"] for polity_id in polity_ids]))
+    writer.array("polities.end_years", _floats([polities[polity_id]["end_year"] for polity_id in polity_ids]))
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created": time.time(),
+        "source_state": source_state,
+        "events": len(events),
+        "locations": len(locations),
+        "polities": len(polities),
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    current = os.path.join(directory, CURRENT_FILE)
+    with open(f"{current}.{name}.tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(f"{current}.{name}.tmp", current)
+    _prune(directory, name)
+    return path
+
+
+def _prune(directory: str, current: str) -> None:
+    """
+    Deletes the oldest snapshots beyond KEEP_SNAPSHOTS, never the current one. Processes that still map
+    a deleted snapshot keep reading it until they unmap it.
+    """
+    snapshots = sorted(
+        entry
+        for entry in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, entry, "manifest.json")) and entry != current
+    )
+    for entry in snapshots[: max(len(snapshots) - (KEEP_SNAPSHOTS - 1), 0)]:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def read_snapshot(directory: str) -> Snapshot | None:
+    """
+    Maps the current snapshot under `directory`.
+
+    Returns:
+        Snapshot | None: The snapshot, or None if there is none, it was written in another format or it cannot be
+            read, e.g. a truncated manifest or a pruned or damaged array: the caller then starts cold
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            path = os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+    try:
+        return _read(path)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"snapshot: ignoring {path}, unreadable: {e!r}")
+        return None
+
+
+def _read(path: str) -> Snapshot | None:
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        print(f"snapshot: ignoring {path}, format {manifest.get('format')} instead of {SNAPSHOT_FORMAT}")
+        return None
+    reader = _Reader(path)
+
+    events = EventStore(
+        ids=reader.string_list("events.ids"),
+        names=reader.string_list("events.names"),
+        start_years=reader.array("events.start_years"),
+        end_years=reader.array("events.end_years"),
+        importances=reader.array("events.importances"),
+        event_types=reader.string_list("events.event_types"),
+        event_type_codes=reader.array("events.event_type_codes"),
+        descriptions=reader.strings("events.descriptions"),
+        excerpts=reader.strings("events.excerpts"),
+        locations=reader.relation("events.locations"),
+        polities=reader.relation("events.polities"),
+    )
+    locations = LocationGraph.from_arrays(
+        reader.string_list("locations.ids"),
+        reader.string_list("locations.names"),
+        reader.string_list("locations.biomes"),
+        reader.array("locations.indptr"),
+        reader.array("locations.indices"),
+    )
+    polity_ids = reader.string_list("polities.ids")
+    names = reader.string_list("polities.names")
+    types = reader.string_list("polities.types")
+    start_years = reader.array("polities.start_years")
+    end_years = reader.array("polities.end_years")
+    polities = {
+        normalize_id(polity_id): {
+            "name": names[i],
+            "type": types[i],
+            "start_year": stored_number(start_years[i]),
+            "end_year": stored_number(end_years[i]),
+        }
+        for i, polity_id in enumerate(polity_ids)
+    }
+    counts = {"events": len(events), "locations": len(locations), "polities": len(polities)}
+    if any(manifest[name] != count for name, count in counts.items()):
+        raise ValueError(f"row counts {counts} differ from the manifest")
+    return Snapshot(manifest, events, locations, polities)
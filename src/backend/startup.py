@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from src.backend.generator import Generator
+
+
+def _default_generator() -> "Generator":
+    # Imported here: anthropic, notion_client, the schemas and the NumPy indexes take most of a cold start
+    from src.backend.generator import Generator
+
+    return Generator()
+
+
+class BackgroundGenerator:
+    """
+    Builds the Generator in a daemon thread, so that the app renders its first page before the Anthropic and
+    Notion clients are even imported. Once built, the generator is warmed: the snapshot is loaded and the name
+    indexes are refreshed in the background, so that the forms find their autocomplete names.
+
+    Args:
+        snapshot_dir (str | None): The snapshot to start from and to save after every index rebuild, if any
+        factory (Callable[[], Generator] | None): Builds the generator, by default with the clients of the environment
+    """
+
+    def __init__(self, snapshot_dir: str | None = None, factory: Callable[[], "Generator"] | None = None):
+        self.snapshot_dir = snapshot_dir
+        self.factory = factory or _default_generator
+        self.ready_ms: float | None = None
+        self._ready = threading.Event()
+        self._generator: "Generator | None" = None
+        self._error: BaseException | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "BackgroundGenerator":
+        """
+        Starts building the generator, once.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="generator-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            generator = self.factory()
+            if self.snapshot_dir:
+                # Starts from the world data saved by a previous run instead of reading all of Notion again
+                generator.events_extractor.load_snapshot(self.snapshot_dir)
+            # Keeps the event and location names used for autocomplete in memory, saving a snapshot after each rebuild
+            generator.events_extractor.start_name_refresh(snapshot_dir=self.snapshot_dir)
+            self._generator = generator
+        except Exception as e:
+            print(f"Error starting the generator: {e}")
+            self._error = e
+        finally:
+            self.ready_ms = (time.perf_counter() - started) * 1000
+            self._ready.set()
+
+    def ready(self) -> bool:
+        """
+        Returns whether the generator was built (or failed to be).
+        """
+        return self._ready.is_set()
+
+    def get(self, timeout: float | None = None) -> "Generator":
+        """
+        Waits for the generator, starting it if needed.
+
+        Args:
+            timeout (float | None): The seconds to wait, None to wait until it is built
+
+        Returns:
+            Generator: The generator
+
+        Raises:
+            TimeoutError: If it is not built within `timeout` seconds
+            Exception: The error raised while building it
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("The generator is still starting")
+        if self._error is not None:
+            raise self._error
+        return self._generator
@@ -0,0 +1,275 @@
+from typing import Iterable
+
+import numpy as np
+
+from src.backend.mirror import normalize_id
+
+# The flat fields of an event record, in column order. Relations are held as page IDs, never as nested pages.
+RECORD_FIELDS = (
+    "id",
+    "name",
+    "start_year",
+    "end_year",
+    "event_type",
+    "importance",
+    "description",
+    "excerpt",
+    "location_ids",
+    "polity_ids",
+)
+
+
+def stored_number(value: float) -> int | float | None:
+    """
+    Converts a stored float back to the number Notion returned: NaN is a missing value, whole numbers are ints.
+    """
+    if np.isnan(value):
+        return None
+    return int(value) if value.is_integer() else float(value)
+
+
+class StringColumn:
+    """
+    A column of strings encoded as UTF-8 in one byte buffer, with the offset of every value: one NumPy array
+    instead of a Python string object per row. Values are decoded on access.
+
+    Args:
+        data (np.ndarray): The concatenated UTF-8 bytes (uint8)
+        offsets (np.ndarray): The start of each value in `data`, followed by the end of the last one (int64)
+        nulls (np.ndarray): Whether each value is None (bool)
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, nulls: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str | None]) -> "StringColumn":
+        encoded = []
+        nulls = []
+        for value in values:
+            nulls.append(value is None)
+            encoded.append(b"" if value is None else value.encode("utf-8"))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets, np.asarray(nulls, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    def __getitem__(self, position: int) -> str | None:
+        if self.nulls[position]:
+            return None
+        return self.data[self.offsets[position] : self.offsets[position + 1]].tobytes().decode("utf-8")
+
+    def to_list(self) -> list[str | None]:
+        """
+        Decodes every value at once, much faster than one by one.
+        """
+        data = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [
+            None if null else data[bounds[i] : bounds[i + 1]].decode("utf-8")
+            for i, null in enumerate(self.nulls.tolist())
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes + self.nulls.nbytes
+
+
+class RelationColumn:
+    """
+    A column of page relations in compressed sparse row form: the related pages of row i are
+    `ids[codes[indptr[i]:indptr[i + 1]]]`. Every related page ID is stored once, however many rows refer to it.
+
+    Args:
+        ids (list[str]): The distinct related page IDs
+        indptr (np.ndarray): The start of each row in `codes`, followed by the end of the last row (int32)
+        codes (np.ndarray): The position in `ids` of every relation (int32)
+    """
+
+    def __init__(self, ids: list[str], indptr: np.ndarray, codes: np.ndarray):
+        self.ids = ids
+        self.indptr = indptr
+        self.codes = codes
+        self._codes_by_id = {normalize_id(page_id): code for code, page_id in enumerate(ids)}
+
+    @classmethod
+    def from_lists(cls, rows: Iterable[list[str]]) -> "RelationColumn":
+        ids: list[str] = []
+        codes_by_id: dict[str, int] = {}
+        indptr = [0]
+        codes = []
+        for row in rows:
+            for page_id in row:
+                code = codes_by_id.get(page_id)
+                if code is None:
+                    code = codes_by_id[page_id] = len(ids)
+                    ids.append(page_id)
+                codes.append(code)
+            indptr.append(len(codes))
+        return cls(ids, np.asarray(indptr, dtype=np.int32), np.asarray(codes, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, position: int) -> list[str]:
+        return [self.ids[code] for code in self.codes[self.indptr[position] : self.indptr[position + 1]].tolist()]
+
+    def contains_any(self, page_ids: Iterable[str]) -> np.ndarray:
+        """
+        Returns whether each row relates to at least one of the pages, like a Notion "relation contains" filter
+        OR-ed over the pages.
+        """
+        wanted = [self._codes_by_id[key] for key in map(normalize_id, page_ids) if key in self._codes_by_id]
+        rows = np.zeros(len(self), dtype=bool)
+        if wanted:
+            hits = np.isin(self.codes, np.asarray(wanted, dtype=np.int32))
+            owners = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+            rows[owners[hits]] = True
+        return rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.codes.nbytes
+
+
+class EventStore:
+    """
+    Every Timeline event held column by column: years and importance as float arrays, event types as
+    category codes, descriptions and excerpts in UTF-8 buffers, and the Location and Polity relations as page IDs
+    into shared tables. Locations and polities themselves are not copied into events; they are resolved when an
+    event is materialized for a prompt or the UI.
+
+    Rows are addressed by position, in the order the events were added.
+
+    Args:
+        ids (list[str]): The page ID of each event
+        names (list[str | None]): The title of each event
+        start_years (np.ndarray): The "Start Year" of each event, NaN if missing
+        end_years (np.ndarray): The "End Year" of each event, NaN if missing
+        importances (np.ndarray): The "Importance" of each event, NaN if missing
+        event_types (list[str]): The distinct event types
+        event_type_codes (np.ndarray): The position in `event_types` of each event's type, -1 if missing
+        descriptions (StringColumn): The "Description" of each event
+        excerpts (StringColumn): The "Excerpt" of each event
+        locations (RelationColumn): The "Location" relation of each event
+        polities (RelationColumn): The "Polity" relation of each event
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        names: list[str | None],
+        start_years: np.ndarray,
+        end_years: np.ndarray,
+        importances: np.ndarray,
+        event_types: list[str],
+        event_type_codes: np.ndarray,
+        descriptions: StringColumn,
+        excerpts: StringColumn,
+        locations: RelationColumn,
+        polities: RelationColumn,
+    ):
+        self.ids = ids
+        self.names = names
+        self.start_years = start_years
+        self.end_years = end_years
+        self.importances = importances
+        self.event_types = event_types
+        self.event_type_codes = event_type_codes
+        self.descriptions = descriptions
+        self.excerpts = excerpts
+        self.locations = locations
+        self.polities = polities
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "EventStore":
+        """
+        Builds the store from flat event records (see RECORD_FIELDS), consuming them one at a time.
+        """
+        columns = {field: [] for field in RECORD_FIELDS}
+        for record in records:
+            for field in RECORD_FIELDS:
+                columns[field].append(record[field])
+
+        event_types = sorted({event_type for event_type in columns["event_type"] if event_type is not None})
+        codes = {event_type: code for code, event_type in enumerate(event_types)}
+
+        def floats(values: list) -> np.ndarray:
+            return np.asarray([np.nan if value is None else value for value in values], dtype=np.float64)
+
+        return cls(
+            ids=columns["id"],
+            names=columns["name"],
+            start_years=floats(columns["start_year"]),
+            end_years=floats(columns["end_year"]),
+            importances=floats(columns["importance"]),
+            event_types=event_types,
+            event_type_codes=np.asarray([codes.get(value, -1) for value in columns["event_type"]], dtype=np.int16),
+            descriptions=StringColumn.from_strings(columns["description"]),
+            excerpts=StringColumn.from_strings(columns["excerpt"]),
+            locations=RelationColumn.from_lists(columns["location_ids"]),
+            polities=RelationColumn.from_lists(columns["polity_ids"]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def record(self, position: int) -> dict:
+        """
+        Returns the flat record of an event (see RECORD_FIELDS), with its relations as page IDs.
+        """
+        code = int(self.event_type_codes[position])
+        return {
+            "id": self.ids[position],
+            "name": self.names[position],
+            "start_year": stored_number(self.start_years[position]),
+            "end_year": stored_number(self.end_years[position]),
+            "event_type": self.event_types[code] if code >= 0 else None,
+            "importance": stored_number(self.importances[position]),
+            "description": self.descriptions[position],
+            "excerpt": self.excerpts[position],
+            "location_ids": self.locations.row(position),
+            "polity_ids": self.polities.row(position),
+        }
+
+    def select(
+        self, positions: np.ndarray, location_ids: Iterable[str] | None = None, exclude_name: str | None = None
+    ) -> np.ndarray:
+        """
+        Keeps the positions of the events located at any of the locations and not named `exclude_name`,
+        in the given order.
+
+        Args:
+            positions (np.ndarray): The candidate positions
+            location_ids (Iterable[str] | None): The page IDs of the locations, None for any location
+            exclude_name (str | None): The name of an event to leave out
+
+        Returns:
+            np.ndarray: The matching positions
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        keep = np.ones(len(positions), dtype=bool)
+        if location_ids is not None:
+            keep &= self.locations.contains_any(location_ids)[positions]
+        if exclude_name:
+            keep &= np.fromiter((self.names[i] != exclude_name for i in positions.tolist()), bool, len(positions))
+        return positions[keep]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the arrays of the store, without the Python strings of the ID, name and relation tables.
+        """
+        arrays = (self.start_years, self.end_years, self.importances, self.event_type_codes)
+        return (
+            sum(array.nbytes for array in arrays)
+            + self.descriptions.nbytes
+            + self.excerpts.nbytes
+            + self.locations.nbytes
+            + self.polities.nbytes
+        )
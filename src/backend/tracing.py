@@ -0,0 +1,311 @@
+import contextvars
+import inspect
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator
+
+# The span that work done in the current thread or task belongs to
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+
+
+class Span:
+    """
+    A timed step of a request, e.g. retrieving the context or calling the LLM, with the spans nested in it.
+
+    Counters (Notion requests and their milliseconds per endpoint, events parsed, tokens) are recorded on the
+    span active when they happen; the summary of a span adds up those of its children.
+
+    Args:
+        name (str): The name of the step
+        attributes (dict): Values describing the step, e.g. the event name
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes: dict[str, Any] = attributes
+        self.counters: Counter = Counter()
+        self.children: list[Span] = []
+        self.started = time.perf_counter()
+        self.ended: float | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.ended if self.ended is not None else time.perf_counter()) - self.started) * 1000
+
+    def totals(self) -> Counter:
+        """
+        Returns the counters of the span and every span nested in it.
+        """
+        with _lock:
+            totals = Counter(self.counters)
+            children = list(self.children)
+        for child in children:
+            totals.update(child.totals())
+        return totals
+
+    def summary(self) -> dict:
+        """
+        Returns the breakdown of the span as plain data: its duration, attributes and counter totals, and the
+        flattened tree of nested spans with their depth and offset from the start of this span.
+        """
+        spans = []
+
+        def walk(span: Span, depth: int) -> None:
+            spans.append(
+                {
+                    "name": span.name,
+                    "depth": depth,
+                    "start_ms": round((span.started - self.started) * 1000, 2),
+                    "ms": round(span.duration_ms, 2),
+                    **span.attributes,
+                }
+            )
+            for child in list(span.children):
+                walk(child, depth + 1)
+
+        walk(self, 0)
+        return {
+            "name": self.name,
+            "ms": round(self.duration_ms, 2),
+            "attributes": dict(self.attributes),
+            "counters": dict(self.totals()),
+            "spans": spans,
+        }
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Times a step of the current request. Without an active span, the step starts a new trace, which is
+    kept in METRICS as a recent trace when it ends.
+
+    Args:
+        name (str): The name of the step
+        attributes: Values describing the step
+    """
+    parent = _current_span.get()
+    current = Span(name, **attributes)
+    if parent is not None:
+        with _lock:
+            parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.ended = time.perf_counter()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # An async generator closed from another context; the span is still recorded
+            pass
+        METRICS.observe("kautos_span_seconds", current.duration_ms / 1000, span=name)
+        if parent is None:
+            METRICS.record_trace(current)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """
+    Adds to a counter of the active span and to the process-wide metric `kautos_<name>_total`.
+    """
+    active = _current_span.get()
+    if active is not None:
+        with _lock:
+            active.counters[name] += value
+    METRICS.inc(f"kautos_{name}_total", value, **labels)
+
+
+def annotate(**attributes) -> None:
+    """
+    Sets attributes of the active span.
+    """
+    active = _current_span.get()
+    if active is not None:
+        active.attributes.update(attributes)
+
+
+def record_notion_call(endpoint: str, seconds: float, error: bool = False) -> None:
+    """
+    Records one Notion request and its latency on the active span and in the process-wide metrics.
+    """
+    active = _current_span.get()
+    if active is not None:
+        with _lock:
+            active.counters[f"notion.{endpoint}"] += 1
+            active.counters[f"notion.{endpoint}.ms"] += round(seconds * 1000, 3)
+            if error:
+                active.counters[f"notion.{endpoint}.errors"] += 1
+    METRICS.inc("kautos_notion_requests_total", endpoint=endpoint)
+    METRICS.observe("kautos_notion_request_seconds", seconds, endpoint=endpoint)
+    if error:
+        METRICS.inc("kautos_notion_errors_total", endpoint=endpoint)
+
+
+def traced_notion_call(endpoint: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wraps a Notion client method (sync or async) so that every request it makes is recorded.
+    """
+
+    async def finish(awaitable, started: float) -> Any:
+        error = True
+        try:
+            result = await awaitable
+            error = False
+            return result
+        finally:
+            record_notion_call(endpoint, time.perf_counter() - started, error)
+
+    @wraps(fn)
+    def call(**kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            result = fn(**kwargs)
+        except BaseException:
+            record_notion_call(endpoint, time.perf_counter() - started, error=True)
+            raise
+        if inspect.isawaitable(result):
+            return finish(result, started)
+        record_notion_call(endpoint, time.perf_counter() - started)
+        return result
+
+    return call
+
+
+def copy_context_call(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Binds a function to a copy of the current context, so that work handed to a thread pool is recorded on the
+    span that submitted it. Each call runs in its own copy, as a context cannot be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+
+    @wraps(fn)
+    def call(*args, **kwargs) -> Any:
+        return context.copy().run(fn, *args, **kwargs)
+
+    return call
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and latency summaries, in the Prometheus text format or as JSON, and the most recent
+    traces.
+
+    Args:
+        max_traces (int): The number of recent traces kept
+    """
+
+    def __init__(self, max_traces: int = 50):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._summaries: dict[tuple[str, tuple], list[float]] = {}  # [count, sum, max]
+        self._traces: deque[dict] = deque(maxlen=max_traces)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((key, str(label)) for key, label in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted((key, str(label)) for key, label in labels.items())))
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+
+    def record_trace(self, root: Span) -> None:
+        """
+        Keeps the summary of a finished trace and observes its duration as `kautos_request_seconds`.
+        """
+        self.observe("kautos_request_seconds", root.duration_ms / 1000, operation=root.name)
+        with self._lock:
+            self._traces.append(root.summary())
+
+    def recent_traces(self) -> list[dict]:
+        with self._lock:
+            return list(self._traces)
+
+    def snapshot(self) -> dict:
+        """
+        Returns every metric as JSON-serializable data.
+        """
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "summaries": [
+                    {"name": name, "labels": dict(labels), "count": count, "sum": total, "max": maximum}
+                    for (name, labels), (count, total, maximum) in sorted(self._summaries.items())
+                ],
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name in sorted({name for name, _ in self._summaries}):
+                lines.append(f"# TYPE {name} summary")
+                for (metric, labels), (count, total, _) in sorted(self._summaries.items()):
+                    if metric == name:
+                        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                        lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            body, content_type = METRICS.render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(METRICS.snapshot()), "application/json"
+        elif self.path == "/traces.json":
+            body, content_type = json.dumps(METRICS.recent_traces()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves `/metrics` (Prometheus text), `/metrics.json` and `/traces.json` (recent traces) from a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
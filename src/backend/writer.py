@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from notion_client import APIResponseError
+from pydantic import ValidationError
+
+from src.backend.constants import (
+    TIMELINE_DATABASE_ID,
+    WRITE_LEDGER_PATH,
+    WRITE_MAX_CONCURRENCY,
+    WRITE_PENDING_TIMEOUT,
+)
+from src.backend.events import EventsExtractor
+from src.backend.mirror import MirrorClient
+from src.backend.scheduler import NOTION_SCHEDULER, NotionScheduler, Priority
+from src.backend.schemas import Event
+from src.backend import tracing
+
+# Notion rejects text objects longer than this; longer texts are split over several objects
+MAX_TEXT_LENGTH = 2000
+
+
+def event_key(event: Event) -> str:
+    """
+    Hashes the content of an event into its default idempotency key, so that writing the same generated event
+    again finds the page of the first write.
+    """
+    payload = json.dumps(event.model_dump(mode="json"), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _text(text: str) -> list[dict]:
+    return [
+        {"type": "text", "text": {"content": text[start : start + MAX_TEXT_LENGTH]}}
+        for start in range(0, len(text), MAX_TEXT_LENGTH)
+    ]
+
+
+def event_properties(event: Event, location_id: str | None, polity_ids: list[str]) -> dict:
+    """
+    Converts an event into the properties of a Timeline page, the properties EventsExtractor reads back.
+
+    Args:
+        event (Event): The event
+        location_id (str | None): The page ID of its location, None to leave the relation empty
+        polity_ids (list[str]): The page IDs of its polities
+
+    Returns:
+        dict: The page properties
+    """
+    return {
+        "Name": {"title": _text(event.name)},
+        "Start Year": {"number": event.start_year},
+        "End Year": {"number": event.end_year},
+        "Event Type": {"select": {"name": event.event_type.value}},
+        "Importance": {"number": event.importance},
+        "Description": {"rich_text": _text(event.description)},
+        "Excerpt": {"rich_text": _text(event.excerpt)},
+        "Location": {"relation": [{"id": location_id}] if location_id else []},
+        "Polity": {"relation": [{"id": polity_id} for polity_id in polity_ids]},
+    }
+
+
+class WriteLedger:
+    """
+    A persistent SQLite record of the events written to the Timeline, by idempotency key.
+
+    A key is claimed (pending) by a writer before its page is created and marked created with the page ID once
+    Notion answers. While a claim is recent, the key is being written: other writers, in this process or another
+    sharing the file, report it pending instead of creating a second page. A claim left pending by a write whose
+    outcome is unknown, e.g. a timeout, or by a writer that never came back, is reconciled when the event is
+    written again.
+
+    Args:
+        path (str): The path of the SQLite file
+        pending_timeout (float): The seconds after which a claim of another writer is presumed lost
+    """
+
+    def __init__(self, path: str = WRITE_LEDGER_PATH, pending_timeout: float = WRITE_PENDING_TIMEOUT):
+        self.path = path
+        self.pending_timeout = pending_timeout
+        # Identifies the claims of this ledger, e.g. among the processes sharing the file
+        self.owner = uuid.uuid4().hex
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS writes (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    page_id TEXT,
+                    updated REAL NOT NULL,
+                    owner TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(writes)")}
+            if "owner" not in columns:
+                # Ledgers created before claims had an owner
+                self._conn.execute("ALTER TABLE writes ADD COLUMN owner TEXT")
+
+    def claim(self, key: str, name: str) -> tuple[str, str | None]:
+        """
+        Claims a key for a write, unless it was created or another write of it is in progress.
+
+        Returns:
+            str: "new" (claimed, never written before), "stale" (claimed, a previous write ended without an answer
+                and may have created the page), "pending" (another write is in progress, not claimed) or
+                "created" (not claimed)
+            str | None: The page created for the key, None unless created
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO writes (key, name, page_id, updated, owner) VALUES (?, ?, NULL, ?, ?)",
+                (key, name, now, self.owner),
+            )
+            if inserted.rowcount:
+                return "new", None
+            page_id, updated = self._conn.execute(
+                "SELECT page_id, updated FROM writes WHERE key = ?", (key,)
+            ).fetchone()
+            if page_id is not None:
+                return "created", page_id
+            if now - updated < self.pending_timeout:
+                return "pending", None
+            # Taken over only if no other writer took it over since it was read
+            taken = self._conn.execute(
+                "UPDATE writes SET updated = ?, owner = ? WHERE key = ? AND page_id IS NULL AND updated = ?",
+                (now, self.owner, key, updated),
+            )
+            return ("stale", None) if taken.rowcount else ("pending", None)
+
+    def mark_created(self, key: str, name: str, page_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO writes (key, name, page_id, updated, owner) VALUES (?, ?, ?, ?, ?)",
+                (key, name, page_id, time.time(), self.owner),
+            )
+
+    def release(self, key: str) -> None:
+        """
+        Forgets a pending key of this ledger whose write certainly created no page, so that it is written from
+        scratch next time.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM writes WHERE key = ? AND page_id IS NULL AND owner = ?", (key, self.owner))
+
+    def abandon(self, key: str) -> None:
+        """
+        Leaves a pending key of this ledger whose write ended without an answer, and may have created the page,
+        to be reconciled by the next write without waiting for the pending timeout.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE writes SET updated = 0 WHERE key = ? AND page_id IS NULL AND owner = ?", (key, self.owner)
+            )
+
+
+@dataclass
+class WriteResult:
+    """
+    The outcome of writing one event.
+
+    Attributes:
+        key (str | None): The idempotency key of the event, None if the event is invalid
+        name (str): The name of the event
+        status (str): "created", "existing" (written before, nothing was sent), "pending" (being written by
+            another writer, nothing was sent) or "failed"
+        page_id (str | None): The Timeline page of the event
+        error (str | None): Why the write failed
+        unresolved (list[str]): Location and polity names without a page, left out of the relations
+    """
+
+    key: str | None
+    name: str
+    status: str
+    page_id: str | None = None
+    error: str | None = None
+    unresolved: list[str] = field(default_factory=list)
+
+
+class TimelineWriter:
+    """
+    Writes generated events to the Timeline database as new pages.
+
+    Location and polity names are resolved to relation IDs on the extractor's in-memory indexes, loaded with one
+    bulk read of each database instead of a title query per name. Pages are created concurrently through the
+    Notion scheduler, so writes share the process-wide rate limit and are retried when rate limited.
+
+    Every event has an idempotency key, by default a hash of its content, recorded in a WriteLedger: writing an
+    event again, e.g. when retrying a failed batch, returns its page instead of creating a second one.
+
+    Args:
+        events_extractor (EventsExtractor | None): Resolves names. Pages are created with its client, or with
+            the live fallback client when it reads from the mirror.
+        ledger (WriteLedger | None): The ledger of written events
+        scheduler (NotionScheduler | None): The scheduler page creations go through. Defaults to the
+            extractor's, or to the process-wide scheduler when the extractor reads from the mirror.
+        max_concurrency (int): The number of pages created in parallel
+    """
+
+    def __init__(
+        self,
+        events_extractor: EventsExtractor | None = None,
+        ledger: WriteLedger | None = None,
+        scheduler: NotionScheduler | None = None,
+        max_concurrency: int = WRITE_MAX_CONCURRENCY,
+    ):
+        self.events_extractor = events_extractor if events_extractor is not None else EventsExtractor()
+        client = self.events_extractor.client
+        if isinstance(client, MirrorClient):
+            # The mirror is read-only: pages are created through the live API and mirrored at the next sync
+            client = client.fallback
+        self.client = client
+        self.scheduler = scheduler or self.events_extractor.scheduler or NOTION_SCHEDULER
+        self.ledger = ledger if ledger is not None else WriteLedger()
+        self.max_concurrency = max_concurrency
+
+    def write(
+        self, event: Event | dict, key: str | None = None, priority: Priority = Priority.INTERACTIVE
+    ) -> WriteResult:
+        """
+        Writes one event to the Timeline, see write_many.
+        """
+        return self.write_many([event], [key] if key is not None else None, priority)[0]
+
+    def write_many(
+        self,
+        events: list[Event | dict],
+        keys: list[str] | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> list[WriteResult]:
+        """
+        Writes events to the Timeline as one operation. Events already written are skipped, and events sharing
+        an idempotency key are written once. A failed write, including an invalid event, does not stop the
+        others, and can be retried by writing the same events again.
+
+        Args:
+            events (list[Event | dict]): The events, as models or as their JSON data
+            keys (list[str] | None): The idempotency key of each event, by default a hash of its content
+            priority (Priority): The scheduling priority of the Notion requests
+
+        Returns:
+            list[WriteResult]: The outcome of each event, in order
+        """
+        invalid = {}
+        valid = {}
+        for position, event in enumerate(events):
+            try:
+                valid[position] = Event.model_validate(event) if isinstance(event, dict) else event
+            except ValidationError as e:
+                name = str(event.get("name", ""))
+                print(f"Not writing invalid event '{name}': {e}")
+                invalid[position] = WriteResult(keys[position] if keys else None, name, "failed", error=str(e))
+        if keys is None:
+            keys = [event_key(valid[position]) if position in valid else None for position in range(len(events))]
+        with tracing.span("write_events", events=len(events), invalid=len(invalid)):
+            try:
+                self.events_extractor.load_relation_names()
+            except Exception as e:
+                # Without the names, every relation would be left out
+                print(f"Error loading the location and polity names: {e}")
+                return [
+                    invalid.get(position) or WriteResult(keys[position], valid[position].name, "failed", error=str(e))
+                    for position in range(len(events))
+                ]
+            first_positions = {}
+            for position in valid:
+                first_positions.setdefault(keys[position], position)
+            write = tracing.copy_context_call(self._write)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="timeline-writer") as pool:
+                futures = {
+                    key: pool.submit(write, valid[position], key, priority)
+                    for key, position in first_positions.items()
+                }
+                results = {key: future.result() for key, future in futures.items()}
+            return [invalid.get(position) or results[keys[position]] for position in range(len(events))]
+
+    def _write(self, event: Event, key: str, priority: Priority) -> WriteResult:
+        state, page_id = self.ledger.claim(key, event.name)
+        if state == "created":
+            return WriteResult(key, event.name, "existing", page_id=page_id)
+        if state == "pending":
+            return WriteResult(key, event.name, "pending", error="Another write of the event is in progress")
+
+        unresolved = []
+        sent = False
+        try:
+            if state == "stale":
+                # A previous write of the event ended without an answer: it may have created the page
+                page_id = self._find_page(event.name, priority)
+                if page_id is not None:
+                    self.ledger.mark_created(key, event.name, page_id)
+                    return WriteResult(key, event.name, "existing", page_id=page_id)
+
+            location_id, polity_ids, unresolved = self._resolve(event)
+            if unresolved:
+                print(f"Writing '{event.name}' without the relations to unknown pages: {', '.join(unresolved)}")
+            properties = event_properties(event, location_id, polity_ids)
+            sent = True
+            page = self._call(
+                "pages.create",
+                self.client.pages.create,
+                priority,
+                parent={"database_id": TIMELINE_DATABASE_ID},
+                properties=properties,
+            )
+        except Exception as e:
+            if (sent and isinstance(e, APIResponseError)) or (not sent and state == "new"):
+                # No page was created, by this write or (as far as is known) a previous one
+                self.ledger.release(key)
+            else:
+                # Left pending: the page may have been created, and is looked for before the event is written again
+                self.ledger.abandon(key)
+            print(f"Error writing event '{event.name}': {e}")
+            return WriteResult(key, event.name, "failed", error=str(e), unresolved=unresolved)
+        self.ledger.mark_created(key, event.name, page["id"])
+        tracing.count("events_written")
+        return WriteResult(key, event.name, "created", page_id=page["id"], unresolved=unresolved)
+
+    def _resolve(self, event: Event) -> tuple[str | None, list[str], list[str]]:
+        """
+        Resolves the location and polity names of an event to page IDs, in memory.
+
+        Returns:
+            str | None: The page ID of the location
+            list[str]: The page IDs of the polities, without duplicates
+            list[str]: The names that were not found
+        """
+        unresolved = []
+        location_id = self.events_extractor.resolve_location_id(event.location.name)
+        if location_id is None:
+            unresolved.append(event.location.name)
+        polity_ids = {}
+        for polity in event.polities:
+            polity_id = self.events_extractor.resolve_polity_id(polity.name)
+            if polity_id is None:
+                unresolved.append(polity.name)
+            else:
+                polity_ids[polity_id] = None
+        return location_id, list(polity_ids), unresolved
+
+    def _find_page(self, name: str, priority: Priority) -> str | None:
+        """
+        Looks for a Timeline page by exact title on the live API, the mirror possibly lagging behind.
+        """
+        response = self._call(
+            "databases.query",
+            self.client.databases.query,
+            priority,
+            database_id=TIMELINE_DATABASE_ID,
+            filter={"property": "Name", "title": {"equals": name}},
+            page_size=1,
+        )
+        results = response.get("results", [])
+        return results[0]["id"] if results else None
+
+    def _call(self, endpoint: str, fn: Callable[..., Any], priority: Priority, **kwargs) -> Any:
+        """
+        Calls a Notion client method through the scheduler, recording the request on the active span.
+        """
+        return self.scheduler.call(endpoint, tracing.traced_notion_call(endpoint, fn), priority, **kwargs)
@@ -0,0 +1,35 @@
+import argparse
+
+from src.backend.batch import BatchJob, FakeBatchClient, year_windows
+from src.backend.generator import Generator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate one event per year window in a location as a single Message Batch."
+    )
+    parser.add_argument("--start", type=int, required=True, help="First year of the first window.")
+    parser.add_argument("--end", type=int, required=True, help="Year after the last window.")
+    parser.add_argument("--step", type=int, default=10, help="Years per window (default: decades).")
+    parser.add_argument("--location", required=True, help="Location of the generated events.")
+    parser.add_argument("--no-near", action="store_true", help="Only use events of the location itself as context.")
+    parser.add_argument(
+        "--context-margin", type=int, default=100, help="Years searched for context around each window."
+    )
+    parser.add_argument("--output", default="local/batch.jsonl", help="JSONL file the results are written to.")
+    parser.add_argument("--fake", action="store_true", help="Answer the batch locally with placeholder events.")
+    args = parser.parse_args()
+
+    generator = Generator()
+    if args.fake:
+        job = BatchJob(generator, batches=FakeBatchClient(processing_time=2), poll_interval=1)
+    else:
+        job = BatchJob(generator)
+    counts = job.run(
+        year_windows(args.start, args.end, args.step),
+        args.location,
+        args.output,
+        near=not args.no_near,
+        context_margin=args.context_margin,
+    )
+    print(f"{args.output}: {counts}")
@@ -0,0 +1,28 @@
+import argparse
+
+from src.backend.generator import Generator
+from src.backend.jobs import CompletionCheckpoint, CompletionJob
+from src.backend.constants import COMPLETION_CHECKPOINT_PATH, COMPLETION_MAX_WORKERS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Complete every Timeline event with an empty Description or Excerpt. "
+        "Progress is checkpointed: running again resumes with the events left."
+    )
+    parser.add_argument("--checkpoint", default=COMPLETION_CHECKPOINT_PATH, help="JSONL file of the outcomes.")
+    parser.add_argument("--workers", type=int, default=COMPLETION_MAX_WORKERS, help="Clusters completed at once.")
+    parser.add_argument("--delta-year", type=int, default=100, help="Years searched for context around each event.")
+    parser.add_argument("--no-near", action="store_true", help="Only use events of the location itself as context.")
+    parser.add_argument("--limit", type=int, default=None, help="Most events attempted in this run.")
+    args = parser.parse_args()
+
+    job = CompletionJob(
+        Generator(),
+        CompletionCheckpoint(args.checkpoint),
+        max_workers=args.workers,
+        delta_year=args.delta_year,
+        near=not args.no_near,
+    )
+    counts = job.run(args.limit)
+    print(f"{args.checkpoint}: {counts}")
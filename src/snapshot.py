@@ -0,0 +1,21 @@
+import argparse
+import time
+
+from src.backend.constants import SNAPSHOT_DIR
+from src.backend.events import EventsExtractor
+from src.backend.snapshot import read_snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save or inspect the memory-mapped snapshot of the world data.")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="The snapshot directory.")
+    parser.add_argument("--info", action="store_true", help="Print the manifest of the current snapshot and exit.")
+    args = parser.parse_args()
+
+    if args.info:
+        snapshot = read_snapshot(args.dir)
+        print(snapshot.manifest if snapshot is not None else f"No snapshot in {args.dir}")
+    else:
+        start = time.perf_counter()
+        path = EventsExtractor().save_snapshot(args.dir)
+        print(f"Snapshot written to {path} in {time.perf_counter() - start:.1f} s")
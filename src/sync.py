@@ -0,0 +1,14 @@
+import argparse
+
+from src.backend.mirror import NotionMirror
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the local mirror of the Timeline, Location and Polity databases.")
+    parser.add_argument("--full", action="store_true", help="Pull every page again and drop deleted pages.")
+    args = parser.parse_args()
+
+    mirror = NotionMirror()
+    written = mirror.sync(full=args.full)
+    for database_id, count in written.items():
+        print(f"{database_id}: {count} pages changed (last edit {mirror.last_edited_time(database_id)})")
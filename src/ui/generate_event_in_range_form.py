@@ -1,11 +1,22 @@
+from typing import TYPE_CHECKING
 import streamlit as st
-from src.backend.generator import Generator
+from src.backend.constants import MAX_CANDIDATES
+from src.ui.output_display import display_generation
+from src.ui.name_input import exact_name, name_input, resolve_name
+from src.ui.prefetch import session_prefetcher
 
-def display_generate_event_in_range_form(generator: Generator):
+if TYPE_CHECKING:
+    # Only for annotations: importing it at render time would pull in the Notion and Anthropic clients
+    from src.backend.generator import Generator
+
+def display_generate_event_in_range_form(generator: "Generator"):
     st.header("Generate New Event in Range")
     st.markdown("Create a brand new event within a specified time period and location in Kautos.")
 
-    with st.form(key="generate_event_in_range_form"):
+    location_names = generator.events_extractor.location_names()
+
+    # Not a form: the page reruns as the inputs change, so the context is retrieved while the rest is filled in
+    with st.container(border=True):
         st.subheader("Define New Event's Parameters:")
         new_event_start_year = st.number_input(
             "New Event Start Year:", 
@@ -17,9 +28,10 @@ def display_generate_event_in_range_form(generator: Generator):
             step=1, value=-990,
             help="The year the new event should end. Can be same as start year for punctual events."
         )
-        location_new_event = st.text_input(
-            "Location for New Event:", 
-            help="Specify the primary location name for the new event."
+        location_new_event = name_input(
+            "Location for New Event:",
+            location_names,
+            help="Specify the primary location name for the new event; type to search by prefix or approximate name."
         )
         
         st.subheader("Define Contextual Search Parameters (for inspiration):")
@@ -39,12 +51,29 @@ def display_generate_event_in_range_form(generator: Generator):
             help="Consider events in locations near the specified 'Location for New Event' for contextual inspiration."
         )
         
-        submit_button = st.form_submit_button("Generate Event in Range")
+        n_candidates = st.number_input(
+            "Candidates:",
+            min_value=1, max_value=MAX_CANDIDATES, value=1, step=1,
+            help="Generate several versions at once from the same context, shown side by side to pick from."
+        )
+
+        submit_button = st.button("Generate Event in Range")
+
+    prefetcher = session_prefetcher()
+    prefetch_location = exact_name(location_new_event, location_names)
+    years = (new_event_start_year, new_event_end_year, context_start_year, context_end_year)
+    if prefetch_location is not None and None not in years:
+        years = tuple(int(year) for year in years)
+        key = ("event_in_range", *years, prefetch_location, near_context)
+        prefetcher.prefetch(key, lambda: generator.prefetch_event_in_range(*key[1:]))
 
     if submit_button:
         if not location_new_event:
             st.error("Please specify a Location for the new event.")
             return
+        location_new_event = resolve_name(location_new_event, location_names, "location")
+        if location_new_event is None:
+            return
         if new_event_start_year is None or new_event_end_year is None or \
            context_start_year is None or context_end_year is None:
             st.error("Please ensure all year fields are entered.")
@@ -57,16 +86,16 @@ def display_generate_event_in_range_form(generator: Generator):
             return
 
         with st.spinner("Generating event in range..."):
-            try:
-                result = generator.generate_event_in_range(
-                    start_year=int(new_event_start_year),
-                    end_year=int(new_event_end_year),
-                    range_start_year=int(context_start_year),
-                    range_end_year=int(context_end_year),
+            years = (int(new_event_start_year), int(new_event_end_year), int(context_start_year), int(context_end_year))
+            display_generation(
+                "ui.generate_event_in_range",
+                ("event_in_range", *years, location_new_event, near_context),
+                lambda prefetched, candidates: generator.stream_event_in_range(
+                    *years,
                     location=location_new_event,
-                    near=near_context
-                )
-                st.session_state.event_result = result
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-                st.session_state.event_result = None 
\ No newline at end of file
+                    near=near_context,
+                    n_candidates=candidates,
+                    prefetched=prefetched,
+                ),
+                int(n_candidates),
+            )
@@ -1,14 +1,26 @@
+from typing import TYPE_CHECKING
 import streamlit as st
-from src.backend.generator import Generator
+from src.backend.constants import MAX_CANDIDATES
+from src.ui.output_display import display_generation
+from src.ui.name_input import exact_name, name_input, resolve_name
+from src.ui.prefetch import session_prefetcher
 
-def display_generate_similar_event_form(generator: Generator):
+if TYPE_CHECKING:
+    # Only for annotations: importing it at render time would pull in the Notion and Anthropic clients
+    from src.backend.generator import Generator
+
+def display_generate_similar_event_form(generator: "Generator"):
     st.header("Generate Similar Event")
     st.markdown("Create a new event in Kautos based on an existing one.")
 
-    with st.form(key="generate_similar_event_form"):
-        event_name = st.text_input(
-            "Event Name to Base On:", 
-            help="Enter the exact name of an existing event in Kautos."
+    event_names = generator.events_extractor.event_names()
+
+    # Not a form: the page reruns as the inputs change, so the context is retrieved while the rest is filled in
+    with st.container(border=True):
+        event_name = name_input(
+            "Event Name to Base On:",
+            event_names,
+            help="Pick an existing event in Kautos; type to search by prefix or approximate name."
         )
         delta_year = st.number_input(
             "Delta Year for Similarity:", 
@@ -26,25 +38,42 @@ def display_generate_similar_event_form(generator: Generator):
             help="If checked, delta_year for context is applied both before and after the seed event\'s timeframe. If unchecked, it\'s applied only before."
         )
         
-        submit_button = st.form_submit_button("Generate Similar Event")
+        n_candidates = st.number_input(
+            "Candidates:",
+            min_value=1, max_value=MAX_CANDIDATES, value=1, step=1,
+            help="Generate several versions at once from the same context, shown side by side to pick from."
+        )
+
+        submit_button = st.button("Generate Similar Event")
+
+    prefetcher = session_prefetcher()
+    prefetch_name = exact_name(event_name, event_names)
+    if prefetch_name is not None and delta_year is not None:
+        key = ("similar_event", prefetch_name, int(delta_year), near, symmetric)
+        prefetcher.prefetch(key, lambda: generator.prefetch_similar_event(*key[1:]))
 
     if submit_button:
         if not event_name:
             st.error("Please enter an Event Name to base on.")
             return
+        event_name = resolve_name(event_name, event_names, "event")
+        if event_name is None:
+            return
         if delta_year is None:
             st.error("Please enter a Delta Year.")
             return
             
         with st.spinner("Generating similar event..."):
-            try:
-                result = generator.generate_similar_event(
-                    event_name=event_name, 
+            display_generation(
+                "ui.generate_similar_event",
+                ("similar_event", event_name, int(delta_year), near, symmetric),
+                lambda prefetched, candidates: generator.stream_similar_event(
+                    event_name=event_name,
                     delta_year=int(delta_year),
-                    near=near, 
-                    symmetric=symmetric
-                )
-                st.session_state.event_result = result
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-                st.session_state.event_result = None 
\ No newline at end of file
+                    near=near,
+                    symmetric=symmetric,
+                    n_candidates=candidates,
+                    prefetched=prefetched,
+                ),
+                int(n_candidates),
+            )
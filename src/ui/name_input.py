@@ -0,0 +1,48 @@
+from typing import TYPE_CHECKING
+import streamlit as st
+
+if TYPE_CHECKING:
+    # Only for annotations: importing it at render time would pull in the Notion client
+    from src.backend.names import NameIndex
+
+def name_input(label: str, names: "NameIndex | None", help: str) -> str | None:
+    """
+    A name field that autocompletes from the name index, falling back to a plain text input while the index
+    is still being built. Names missing from the index can still be typed in.
+    """
+    if not names:
+        return st.text_input(label, help=help)
+    return st.selectbox(
+        label,
+        names.sorted_names(),
+        index=None,
+        placeholder="Start typing to search...",
+        accept_new_options=True,
+        help=help
+    )
+
+def resolve_name(value: str, names: "NameIndex | None", kind: str) -> str | None:
+    """
+    Returns the exact name matching the typed value (ignoring case and extra whitespace), or shows an error
+    with the closest names and returns None. Without an index, the value is returned as is.
+    """
+    if not names:
+        return value
+    page_id = names.resolve(value)
+    if page_id is not None:
+        return names.name_of(page_id)
+    suggestions = names.suggest(value, limit=5)
+    message = f"No {kind} named '{value}'."
+    if suggestions:
+        message += " Did you mean: " + ", ".join(f"'{suggestion}'" for suggestion in suggestions) + "?"
+    st.error(message)
+    return None
+
+def exact_name(value: str | None, names: "NameIndex | None") -> str | None:
+    """
+    Returns the exact name matching the typed value like resolve_name, but silently: None if there is none.
+    """
+    if not value or not names:
+        return value or None
+    page_id = names.resolve(value)
+    return names.name_of(page_id) if page_id is not None else None
@@ -1,5 +1,15 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Hashable
 import streamlit as st
 import json
+from src.backend import tracing
+from src.backend.aio import BackgroundIterator
+from src.ui.prefetch import session_prefetcher
+
+if TYPE_CHECKING:
+    # Only for annotations: importing it at render time would pull in the Notion client
+    from src.backend.writer import TimelineWriter
 
 def display_output(result_data: dict):
     if not result_data:
@@ -38,4 +48,169 @@ def display_output(result_data: dict):
     # with st.expander("View Full Output JSON", expanded=True):
     #     st.json(result_data)
     # If result_data is None (e.g., after an error or before first run for a task),
-    # this function will do nothing, or you could add an st.info here if desired. 
\ No newline at end of file
+    # this function will do nothing, or you could add an st.info here if desired.
+
+
+def display_save_to_notion(writer: "TimelineWriter", result_data: dict):
+    """
+    A button writing the displayed event to the Timeline database. Saving the same event again links to the page
+    of the first save instead of creating another one.
+    """
+    if not st.button("Save to Notion", key="save_to_notion", help="Create a Timeline page for this event."):
+        return
+    with st.spinner("Saving to Notion..."):
+        try:
+            result = writer.write(result_data)
+        except Exception as e:
+            st.error(f"Could not save the event: {e}")
+            return
+    if result.status == "failed":
+        st.error(f"Could not save the event: {result.error}")
+        return
+    if result.status == "pending":
+        st.info("This event is being saved by another session. Save again in a moment to get its page.")
+        return
+    url = f"https://www.notion.so/{result.page_id.replace('-', '')}"
+    if result.status == "created":
+        st.success(f"Saved to the Timeline: [{result.name}]({url})")
+    else:
+        st.info(f"Already saved to the Timeline: [{result.name}]({url})")
+    if result.unresolved:
+        st.warning(f"Not linked, as no page has these names: {', '.join(result.unresolved)}")
+
+
+def display_generation(
+    span_name: str,
+    prefetch_key: Hashable,
+    stream_factory: Callable[[Future | None, int | None], BackgroundIterator],
+    n_candidates: int,
+):
+    """
+    Runs a generation submitted from a form. The context prefetched for its parameters, if any, is handed to the
+    stream, the event (or the candidates) is rendered as it is written, then kept in the session for
+    display_output (or display_candidates) along with the trace summary of the run.
+
+    Args:
+        span_name (str): The name of the trace span, e.g. "ui.complete_event"
+        prefetch_key (Hashable): The parameters the context was prefetched for, see session_prefetcher
+        stream_factory (Callable[[Future | None, int | None], BackgroundIterator]): Starts the stream, given the
+            prefetched retrieval (None if there is none) and the number of candidates (None for a single event)
+        n_candidates (int): The number of candidates to generate
+    """
+    with tracing.span(span_name) as trace:
+        try:
+            stream = stream_factory(
+                session_prefetcher().take(prefetch_key), int(n_candidates) if n_candidates > 1 else None
+            )
+            if n_candidates > 1:
+                st.session_state.candidates = display_candidates_stream(stream, int(n_candidates))
+                st.session_state.event_result = None
+            else:
+                st.session_state.candidates = None
+                st.session_state.event_result = display_stream(stream)
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+            st.session_state.candidates = None
+            st.session_state.event_result = None
+    st.session_state.last_trace = trace.summary()
+
+
+def display_stream(stream: BackgroundIterator) -> dict | None:
+    """
+    Renders a streamed generation as its fields arrive, and returns the complete event.
+
+    A stream still running from a previous submission in this session is cancelled first, and this one is
+    cancelled if the script run is interrupted (e.g. the form is submitted again) before it finishes.
+    """
+    placeholder = st.empty()
+    result = None
+    with _active_stream(stream):
+        try:
+            for update in stream:
+                if update.done:
+                    result = update.snapshot
+                    break
+                with placeholder.container():
+                    _display_partial_event(update.snapshot)
+        finally:
+            # The complete event is rendered by display_output
+            placeholder.empty()
+    return result
+
+
+def display_candidates_stream(stream: BackgroundIterator, n_candidates: int) -> list[dict]:
+    """
+    Renders candidates streamed together side by side as their fields arrive, and returns the complete ones
+    in order. Cancelled like display_stream.
+    """
+    placeholders = [column.empty() for column in st.columns(n_candidates)]
+    results: list[dict | None] = [None] * n_candidates
+    with _active_stream(stream):
+        try:
+            for update in stream:
+                if update.done:
+                    results[update.candidate] = update.snapshot
+                    if all(result is not None for result in results):
+                        break
+                with placeholders[update.candidate].container():
+                    _display_partial_event(update.snapshot)
+        finally:
+            # The complete candidates are rendered by display_candidates
+            for placeholder in placeholders:
+                placeholder.empty()
+    return [result for result in results if result is not None]
+
+
+def display_candidates(candidates: list[dict]) -> dict | None:
+    """
+    Shows candidates side by side, each with a button to pick it.
+
+    Returns:
+        dict | None: The candidate picked in this run, if any
+    """
+    st.subheader("Candidates")
+    picked = None
+    for position, (column, candidate) in enumerate(zip(st.columns(len(candidates)), candidates)):
+        with column:
+            st.markdown(f"#### {candidate.get('name')}")
+            end_year = candidate.get("end_year")
+            st.caption(f"{candidate.get('start_year')}" + (f" to {end_year}" if end_year is not None else ""))
+            st.write(candidate.get("excerpt"))
+            with st.expander("Description", expanded=False):
+                st.write(candidate.get("description"))
+            if st.button("Use this one", key=f"pick_candidate_{position}"):
+                picked = candidate
+    return picked
+
+
+@contextmanager
+def _active_stream(stream: BackgroundIterator):
+    """
+    Cancels the stream still running from a previous submission in this session, and this one when the block
+    exits, e.g. because the script run is interrupted.
+    """
+    previous = st.session_state.get("active_stream")
+    if previous is not None:
+        previous.cancel()
+    st.session_state.active_stream = stream
+    try:
+        yield stream
+    finally:
+        stream.cancel()
+        if st.session_state.get("active_stream") is stream:
+            st.session_state.active_stream = None
+
+
+def _display_partial_event(snapshot: dict):
+    st.subheader("Generating Event...")
+    if snapshot.get("name"):
+        st.markdown(f"#### {snapshot['name']}")
+    if snapshot.get("start_year") is not None:
+        end_year = snapshot.get("end_year")
+        st.caption(f"{snapshot['start_year']}" + (f" to {end_year}" if end_year is not None else ""))
+    if snapshot.get("excerpt"):
+        st.markdown("##### Excerpt")
+        st.write(snapshot["excerpt"])
+    if snapshot.get("description"):
+        st.markdown("##### Description")
+        st.write(snapshot["description"])
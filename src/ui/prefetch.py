@@ -0,0 +1,12 @@
+import streamlit as st
+from src.backend.prefetch import ContextPrefetcher
+
+
+def session_prefetcher() -> ContextPrefetcher:
+    """
+    Returns the context prefetcher of the session, shared by the forms: entering the parameters of one form
+    cancels the prefetch of another.
+    """
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = ContextPrefetcher()
+    return st.session_state.prefetcher
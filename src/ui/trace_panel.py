@@ -0,0 +1,47 @@
+import streamlit as st
+
+def display_trace_panel(trace: dict | None):
+    """
+    Shows in the sidebar where the time of the last generation went: Notion requests per endpoint,
+    events parsed, tokens, and the timeline of its steps.
+    """
+    if not trace:
+        return
+    counters = trace["counters"]
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Last Request")
+    st.sidebar.caption(f"{trace['name']}: {trace['ms'] / 1000:.2f} s")
+
+    endpoints = sorted(
+        name.removeprefix("notion.")
+        for name in counters
+        if name.startswith("notion.") and not name.endswith((".ms", ".errors"))
+    )
+    notion_rows = [
+        {
+            "endpoint": endpoint,
+            "requests": int(counters.get(f"notion.{endpoint}", 0)),
+            "ms": round(counters.get(f"notion.{endpoint}.ms", 0), 1),
+            "errors": int(counters.get(f"notion.{endpoint}.errors", 0)),
+        }
+        for endpoint in endpoints
+    ]
+    if notion_rows:
+        st.sidebar.markdown("**Notion**")
+        st.sidebar.dataframe(notion_rows, hide_index=True)
+
+    llm_span = next((span for span in trace["spans"] if span["name"] == "llm"), {})
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("Events parsed", int(counters.get("events_parsed", 0)))
+    col2.metric("Time to first token", f"{llm_span['ttft_ms'] / 1000:.2f} s" if "ttft_ms" in llm_span else "-")
+    col1.metric("Prompt tokens", int(counters.get("llm_input_tokens", 0)))
+    col2.metric("Output tokens", int(counters.get("llm_output_tokens", 0)))
+    col1.metric("Cache read tokens", int(counters.get("llm_cache_read_input_tokens", 0)))
+    col2.metric("Cache write tokens", int(counters.get("llm_cache_creation_input_tokens", 0)))
+    if llm_span.get("response_cache") == "hit":
+        st.sidebar.caption("Answered from the response cache.")
+
+    with st.sidebar.expander("Steps", expanded=False):
+        for span in trace["spans"]:
+            indent = " " * span["depth"]
+            st.text(f"{indent}{span['name']}  +{span['start_ms']:.0f} ms  {span['ms']:.0f} ms")
@@ -0,0 +1,37 @@
+import argparse
+import json
+from collections import Counter
+
+from src.backend.scheduler import Priority
+from src.backend.writer import TimelineWriter
+
+
+def read_events(path: str) -> list[dict]:
+    """
+    Reads generated events from a JSON file (one event or a list, e.g. local/output.json) or a JSONL file
+    (e.g. the results of src.batch, whose failed lines are skipped).
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            items = data if isinstance(data, list) else [data]
+    # Batch results wrap the event with its status
+    events = [item["event"] if "custom_id" in item else item for item in items]
+    return [event for event in events if event]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write generated events to the Timeline database. Events written before are skipped."
+    )
+    parser.add_argument("path", help="JSON or JSONL file of generated events.")
+    args = parser.parse_args()
+
+    events = read_events(args.path)
+    results = TimelineWriter().write_many(events, priority=Priority.BULK)
+    for result in results:
+        if result.status in ("failed", "pending"):
+            print(f"{result.status}: {result.name}: {result.error}")
+    print(f"{args.path}: {dict(Counter(result.status for result in results))}")
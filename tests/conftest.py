@@ -0,0 +1,24 @@
+import benchmarks  # noqa: F401  (sets the offline database IDs before src.backend.constants is imported)
+import pytest
+
+from benchmarks.fake_llm import FakeAnthropic
+from benchmarks.run import _generator
+from benchmarks.workspace import FakeNotionClient, FakeWorkspace
+
+
+@pytest.fixture(scope="session")
+def workspace() -> FakeWorkspace:
+    return FakeWorkspace(300, 30, 10)
+
+
+@pytest.fixture
+def client(workspace: FakeWorkspace) -> FakeNotionClient:
+    return FakeNotionClient(workspace)
+
+
+@pytest.fixture
+def generator(client: FakeNotionClient):
+    """
+    A generator reading the fake workspace and answered by the fake LLM, with cold caches and indexes.
+    """
+    return _generator(client, FakeAnthropic())
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from src.backend.batch import BatchJob, FakeBatchClient, year_windows
+from src.backend.schemas import Event
+
+
+class CountingBatchClient(FakeBatchClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted: list[list[dict]] = []
+        self.polls = 0
+
+    def create(self, requests):
+        self.submitted.append(requests)
+        return super().create(requests)
+
+    def retrieve(self, batch_id):
+        self.polls += 1
+        return super().retrieve(batch_id)
+
+
+def responder(request: dict) -> dict:
+    """
+    Answers the first window with a valid event, fails the second and answers the third off-schema.
+    """
+    start_year = int(request["custom_id"].split("_")[1])
+    if start_year == -1000:
+        return {
+            "name": "Founding of a harbour",
+            "start_year": start_year,
+            "end_year": None,
+            "event_type": "Political event",
+            "importance": 4,
+            "description": "A harbour is founded.",
+            "excerpt": "A harbour.",
+            "location": {"name": "Somewhere", "biome": "Maritime", "near": []},
+            "polities": [],
+        }
+    if start_year == -990:
+        raise RuntimeError("overloaded")
+    return {"name": "No years nor location"}
+
+
+def test_batch_job_end_to_end(generator, workspace, tmp_path):
+    batches = CountingBatchClient(responder, processing_time=0.05)
+    job = BatchJob(generator, batches=batches, poll_interval=0.01)
+    windows = year_windows(-1000, -970)
+    output_path = tmp_path / "out" / "batch.jsonl"
+
+    counts = job.run(windows, workspace.location_names[0], str(output_path))
+
+    assert counts == {"succeeded": 1, "errored": 1, "invalid": 1}
+    # one batch of every window, polled until it ended
+    assert len(batches.submitted) == 1
+    requests = batches.submitted[0]
+    assert [request["custom_id"] for request in requests] == ["range_-1000_-991", "range_-990_-981", "range_-980_-971"]
+    assert all(request["params"]["tools"] and request["params"]["messages"] for request in requests)
+    assert batches.polls >= 2
+
+    lines = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert [line["custom_id"] for line in lines] == [request["custom_id"] for request in requests]
+    assert [line["status"] for line in lines] == ["succeeded", "errored", "invalid"]
+
+    succeeded, errored, invalid = lines
+    assert Event.model_validate(succeeded["event"]).name == "Founding of a harbour"
+    assert succeeded["error"] is None
+    assert errored["event"] is None and "overloaded" in errored["error"]
+    assert invalid["event"] is None and "validation error" in invalid["error"]
+
+
+def test_wait_times_out_before_the_batch_ended(generator):
+    job = BatchJob(generator, batches=FakeBatchClient(processing_time=60))
+    batch_id = job.submit([{"custom_id": "range_0_9", "params": {}}])
+
+    with pytest.raises(TimeoutError, match=batch_id):
+        job.wait(batch_id, timeout=0)
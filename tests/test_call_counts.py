@@ -0,0 +1,43 @@
+"""
+Pins the Notion requests of the similar event retrieval per endpoint, so that a change adding a request per event,
+per relation or per name lookup fails here rather than in production. Update the counts only for a deliberate change.
+"""
+import pytest
+
+from src.backend.constants import TIMELINE_DATABASE_ID
+
+DELTA_YEAR = 200
+
+
+@pytest.fixture
+def seed(workspace) -> tuple[str, str]:
+    """
+    The name and page ID of an event in the middle of the Timeline, with a few events in its window and location.
+    """
+    position = len(workspace.event_names) // 2
+    return workspace.event_names[position], list(workspace.databases[TIMELINE_DATABASE_ID])[position]
+
+
+@pytest.mark.parametrize(
+    "by, cold, warm",
+    [
+        # Cold: a title query finds the seed, bulk reads of the Location and Polity databases build the location
+        # graph and the polity table, and one Timeline query fetches the window. No page is retrieved. Warm: the
+        # title and window queries only, the graph and the polities are answered from memory.
+        ("name", {"databases.query": 4}, {"databases.query": 2}),
+        # The seed page is retrieved by ID instead of queried by title, and cached
+        ("event_id", {"databases.query": 3, "pages.retrieve": 1}, {"databases.query": 1}),
+    ],
+)
+def test_similar_events_to_event_calls(generator, client, seed, by, cold, warm):
+    name, event_id = seed
+    kwargs = {"event_name": name} if by == "name" else {"event_name": None, "event_id": event_id}
+    extractor = generator.events_extractor
+
+    event, events = extractor.get_similar_events_to_event(delta_year=DELTA_YEAR, **kwargs)
+    assert event["name"] == name and events
+    assert dict(client.calls) == cold
+
+    before = client.calls.copy()
+    assert extractor.get_similar_events_to_event(delta_year=DELTA_YEAR, **kwargs) == (event, events)
+    assert dict(client.calls - before) == warm
@@ -0,0 +1,124 @@
+import threading
+
+import numpy as np
+import pytest
+
+from benchmarks.fake_llm import FakeAnthropic
+from benchmarks.run import _generator
+from benchmarks.workspace import FakeNotionClient
+from src.backend.graph import LocationGraph
+from src.backend.intervals import IntervalIndex
+
+
+@pytest.fixture(scope="module")
+def intervals() -> tuple[list, list]:
+    rng = np.random.default_rng(7)
+    starts = rng.integers(-3000, 1000, 500).astype(float)
+    lengths = rng.integers(0, 400, 500)
+    punctual = rng.random(500) < 0.3
+    ends = [None if punctual[i] else starts[i] + lengths[i] for i in range(500)]
+    starts[:5] = np.nan  # events without a Start Year are not indexed
+    return starts.tolist(), ends
+
+
+@pytest.mark.parametrize("window", [(-1000, -900), (-2500, -2500), (500, None), (-5000, -4000)])
+def test_interval_queries_match_a_scan(intervals, window):
+    starts, ends = intervals
+    index = IntervalIndex(starts, ends)
+    low, high = window
+    top = np.inf if high is None else high
+    spans = [(start, start if end is None else end) for start, end in zip(starts, ends)]
+    dated = [position for position, (start, _) in enumerate(spans) if not np.isnan(start)]
+
+    expected = {
+        "start": {p for p in dated if low <= spans[p][0] <= top},
+        "overlap": {p for p in dated if spans[p][0] <= top and spans[p][1] >= low},
+        "contained": {p for p in dated if spans[p][0] >= low and spans[p][1] <= top},
+    }
+    for mode, positions in expected.items():
+        found = index.query(low, high, mode)
+        assert set(found.tolist()) == positions
+        assert np.all(np.diff(index.starts[found]) >= 0)
+
+
+def test_nearest_intervals_are_closest_first(intervals):
+    starts, ends = intervals
+    index = IntervalIndex(starts, ends)
+    year = -1234
+    distances = np.maximum(np.maximum(index.starts - year, year - index.ends), 0)
+
+    found = index.nearest(year, 25)
+    assert len(found) == 25
+    assert np.all(np.diff(distances[found]) >= 0)
+    assert distances[found].max() <= np.sort(distances[~np.isnan(distances)])[24]
+
+
+def location_page(page_id: str, name: str, near: list[str]) -> dict:
+    return {
+        "id": page_id,
+        "properties": {
+            "Name": {"title": [{"plain_text": name}]},
+            "Biome": {"select": None},
+            "Near": {"relation": [{"id": near_id} for near_id in near]},
+        },
+    }
+
+
+def test_k_hop_distances():
+    # a - b - c - d, b - e, and f on its own; a also lists a page outside the Location database
+    graph = LocationGraph(
+        [
+            location_page("a", "A", ["b", "gone"]),
+            location_page("b", "B", ["a", "c", "e"]),
+            location_page("c", "C", ["b", "d"]),
+            location_page("d", "D", ["c"]),
+            location_page("e", "E", ["b"]),
+            location_page("f", "F", []),
+        ]
+    )
+    a = graph.node("a")
+
+    def names(distances: dict[int, int]) -> dict[str, int]:
+        return {graph.names[node]: distance for node, distance in distances.items()}
+
+    assert names(graph.k_hop(a, 0)) == {"A": 0}
+    assert names(graph.k_hop(a, 1)) == {"A": 0, "B": 1}
+    assert names(graph.k_hop(a, 2)) == {"A": 0, "B": 1, "C": 2, "E": 2}
+    assert names(graph.k_hop(a, 10)) == {"A": 0, "B": 1, "C": 2, "E": 2, "D": 3}
+    assert names(graph.k_hop(graph.node_by_name("F"), 3)) == {"F": 0}
+    assert graph.location(a)["near"] == ["B"]
+
+
+def test_stale_indexes_are_served_while_rebuilt(workspace):
+    client = FakeNotionClient(workspace)
+    extractor = _generator(client, FakeAnthropic()).events_extractor
+    version = [0]
+    extractor._data_version = lambda: version[0]
+    store, _ = extractor._timeline_index()
+    graph = extractor._location_graph()
+    polities = extractor._polity_table()
+
+    query, scanning, proceed = client.databases.query, threading.Event(), threading.Event()
+
+    def slow_query(**kwargs):
+        scanning.set()
+        proceed.wait(5)
+        return query(**kwargs)
+
+    client.databases.query = slow_query
+    version[0] = 1
+    # The lookups answer from the stale indexes at once; a single rebuild of each runs in the background
+    for _ in range(3):
+        assert extractor._timeline_index()[0] is store
+        assert extractor._location_graph() is graph
+        assert extractor._polity_table() is polities
+    assert scanning.wait(5)
+    assert sum(thread.name.startswith("rebuild_") for thread in threading.enumerate()) == 3
+
+    proceed.set()
+    for thread in threading.enumerate():
+        if thread.name.startswith("rebuild_"):
+            thread.join(5)
+    assert extractor._timeline[0] == extractor._locations[0] == extractor._polities[0] == 1
+    assert extractor._timeline_index()[0] is not store
+    assert extractor._location_graph() is not graph
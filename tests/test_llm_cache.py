@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import json
+import threading
+
+import pytest
+
+from benchmarks.fake_llm import FakeAnthropic, FakeAsyncAnthropic
+from src.backend import llm_cache
+from src.backend.llm import LLM
+from src.backend.llm_cache import LLMResponseCache, ReplayMiss, fingerprint
+
+RESPONSE = {"input": {"name": "x" * 60}, "usage": {"input_tokens": 10, "output_tokens": 20}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock, so that the least recently used entry is never a tie
+    ticks = itertools.count(1)
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(ticks)))
+
+
+def key(n: int) -> str:
+    return fingerprint("model", "system", f"user {n}", None, None, 0.0, 1024)
+
+
+def test_least_recently_used_responses_are_evicted(clock):
+    size = len(json.dumps(RESPONSE, ensure_ascii=False).encode("utf-8"))
+    cache = LLMResponseCache(":memory:", mode="on", max_bytes=3 * size)
+    for n in range(3):
+        cache.set(key(n), RESPONSE)
+    assert cache.get(key(0)) == RESPONSE  # now more recently used than 1 and 2
+
+    cache.set(key(3), RESPONSE)
+    cache.set(key(4), RESPONSE)
+    assert cache.get(key(1)) is None and cache.get(key(2)) is None
+    assert all(cache.get(key(n)) == RESPONSE for n in (0, 3, 4))
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 3 * size, 2)
+
+    # Storing the same key again replaces its entry instead of counting it twice
+    cache.set(key(4), RESPONSE)
+    assert cache.stats()["bytes"] == 3 * size
+
+
+def test_replay_reads_but_never_writes(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    recording = LLMResponseCache(path, mode="on")
+    recording.set(key(0), RESPONSE)
+    recording.close()
+
+    replay = LLMResponseCache(path, mode="replay")
+    assert replay.get(key(0)) == RESPONSE
+    replay.set(key(1), RESPONSE)
+    with pytest.raises(ReplayMiss):
+        replay.get(key(1))
+    assert replay.stats()["entries"] == 1
+
+
+def test_async_requests_use_the_cache_off_the_event_loop():
+    cache = LLMResponseCache(":memory:", mode="on")
+    threads = []
+    for method in ("get", "set"):
+        original = getattr(cache, method)
+
+        def record(*args, original=original):
+            threads.append(threading.current_thread())
+            return original(*args)
+
+        setattr(cache, method, record)
+    client = FakeAnthropic()
+    llm = LLM(response_cache=cache, client=client, async_client=FakeAsyncAnthropic(client))
+
+    async def generate_twice():
+        loop_thread = threading.current_thread()
+        first = await llm.agenerate_with_usage("system", "user")
+        updates = [update async for update in llm.astream("system", "user")]
+        return loop_thread, first, updates
+
+    loop_thread, (output, usage), updates = asyncio.run(generate_twice())
+    assert usage["response_cache"] == "miss"
+    assert updates[-1].done and updates[-1].snapshot == output and updates[-1].usage["response_cache"] == "hit"
+    assert len(threads) == 3 and loop_thread not in threads
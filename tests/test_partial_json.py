@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from src.backend.partial_json import PartialJSONObject
+
+TOOL_INPUT = {
+    "name": "Siege of \"Vel\" \\ Tarn",
+    "start_year": -1200,
+    "end_year": None,
+    "importance": 7.5,
+    "description": "Walls fell.\nThe city burned for three days; its people fled to Ös — and beyond.",
+    "location": {"name": "Vel Tarn", "near": ["Ös", "Kel"]},
+    "polities": [{"name": "Hasath"}, {"name": "Riqua", "type": "Kingdom"}],
+    "excerpt": "",
+}
+
+
+def feed(text: str, size: int) -> tuple[PartialJSONObject, list]:
+    parser = PartialJSONObject()
+    updates = []
+    for start in range(0, len(text), size):
+        updates.extend(parser.feed(text[start : start + size]))
+    return parser, updates
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_chunked_object_is_parsed_whole(size, ensure_ascii):
+    text = json.dumps(TOOL_INPUT, ensure_ascii=ensure_ascii, indent=1 if size % 2 else None)
+    parser, updates = feed(text, size)
+
+    assert parser.done
+    assert parser.fields == TOOL_INPUT and parser.snapshot == TOOL_INPUT
+    completed = [update for update in updates if update.complete]
+    assert [update.field for update in completed] == list(TOOL_INPUT)
+    assert all(update.value == TOOL_INPUT[update.field] for update in completed)
+
+
+def test_string_fields_are_reported_as_they_grow():
+    text = json.dumps(TOOL_INPUT, ensure_ascii=True)
+    parser, updates = feed(text, 3)
+
+    partial = [update.value for update in updates if update.field == "description" and not update.complete]
+    assert len(partial) > 10
+    description = TOOL_INPUT["description"]
+    # Every partial value is a prefix of the final text, never a cut-off escape sequence
+    assert all(description.startswith(value) for value in partial)
+    assert partial == sorted(partial, key=len)
+
+
+def test_snapshot_holds_the_string_being_streamed():
+    parser = PartialJSONObject()
+    parser.feed('{"name": "Treaty", "description": "Signed at dawn, the tre')
+    assert parser.snapshot == {"name": "Treaty", "description": "Signed at dawn, the tre"}
+    assert parser.fields == {"name": "Treaty"} and not parser.done
+
+    parser.feed('aty held\\u00e9", "start_year": 12}')
+    assert parser.fields == {"name": "Treaty", "description": "Signed at dawn, the treaty heldé", "start_year": 12}
+    assert parser.done
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.backend.ratelimit import TokenBucket
+from src.backend.scheduler import NotionScheduler, Priority
+
+
+class StepLimiter:
+    """
+    A limiter handing out one token per `release`, so that the test decides when the dispatcher lets a request
+    through.
+    """
+
+    def __init__(self):
+        self.tokens = threading.Semaphore(0)
+        self.refunds = 0
+
+    def release(self) -> None:
+        self.tokens.release()
+
+    def reserve(self) -> float:
+        self.tokens.acquire()
+        return 0.0
+
+    def refund(self) -> None:
+        self.refunds += 1
+
+    def pause(self, seconds: float) -> None:
+        pass
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def limiter() -> StepLimiter:
+    return StepLimiter()
+
+
+@pytest.fixture
+def scheduler(limiter) -> NotionScheduler:
+    return NotionScheduler(limiter)
+
+
+def test_most_urgent_request_goes_first(scheduler, limiter):
+    order = []
+
+    def send(priority):
+        scheduler.call("pages.retrieve", lambda page_id: order.append(priority), priority, page_id=priority.name)
+
+    threads = [
+        threading.Thread(target=send, args=(priority,))
+        for priority in (Priority.BULK, Priority.CONTEXT, Priority.INTERACTIVE)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: scheduler.stats()["queue_depth"] == 3)
+
+    for sent in range(1, 4):
+        limiter.release()
+        wait_for(lambda: len(order) == sent)
+    for thread in threads:
+        thread.join(5)
+    assert order == [Priority.INTERACTIVE, Priority.CONTEXT, Priority.BULK]
+
+
+def test_identical_requests_share_one_flight():
+    scheduler = NotionScheduler(TokenBucket(rate=1e9, capacity=1e9))
+    calls = []
+    release = threading.Event()
+
+    def retrieve(page_id):
+        calls.append(page_id)
+        release.wait(5)
+        return {"id": page_id}
+
+    results = []
+    # Page IDs are normalized: the dashed and undashed forms are the same request
+    page_ids = ["0123456789abcdef0123456789abcdef", "01234567-89ab-cdef-0123-456789abcdef"] * 3
+
+    def call(page_id):
+        results.append(scheduler.call("pages.retrieve", retrieve, page_id=page_id))
+
+    threads = [threading.Thread(target=call, args=(page_id,)) for page_id in page_ids]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: scheduler.stats()["coalesced"] == len(page_ids) - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == len(page_ids) and all(result is results[0] for result in results)
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_cancelled_request_is_dropped_and_its_token_refunded(scheduler, limiter):
+    calls = []
+
+    async def query(**kwargs):
+        calls.append(kwargs)
+
+    async def cancel_while_queued():
+        task = asyncio.create_task(scheduler.acall("databases.query", query, Priority.BULK, database_id="a"))
+        while scheduler.stats()["queue_depth"] == 0:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_queued())
+    limiter.release()
+    wait_for(lambda: limiter.refunds == 1)
+    assert calls == []
+    assert scheduler.stats()["queue_depth"] == 0 and scheduler.stats()["dispatched"] == 0
+
+
+def test_follower_of_cancelled_leader_sends_the_request(scheduler, limiter):
+    calls = []
+
+    async def query(**kwargs):
+        calls.append(kwargs)
+        return "rows"
+
+    async def run():
+        leader = asyncio.create_task(scheduler.acall("databases.query", query, database_id="a"))
+        while scheduler.stats()["queue_depth"] == 0:
+            await asyncio.sleep(0.001)
+        follower = asyncio.create_task(scheduler.acall("databases.query", query, database_id="a"))
+        while scheduler.stats()["coalesced"] == 0:
+            await asyncio.sleep(0.001)
+        leader.cancel()
+        limiter.release()
+        limiter.release()
+        return await asyncio.wait_for(follower, 5)
+
+    assert asyncio.run(run()) == "rows"
+    assert calls == [{"database_id": "a"}]
+
+
+def test_refund_returns_a_token_up_to_capacity():
+    bucket = TokenBucket(rate=0.001, capacity=2)
+    assert bucket.reserve() == 0.0 and bucket.reserve() == 0.0
+    bucket.refund()
+    assert bucket.reserve() == 0.0
+
+    full = TokenBucket(rate=0.001, capacity=2)
+    full.refund()
+    assert full.reserve() == 0.0 and full.reserve() == 0.0
+    assert full.reserve() > 0
@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+
+import pytest
+
+from benchmarks.fake_llm import FakeAnthropic
+from benchmarks.run import _generator
+from benchmarks.workspace import FakeNotionClient
+from src.backend.snapshot import CURRENT_FILE, read_snapshot
+
+
+@pytest.fixture
+def snapshot_dir(generator, tmp_path) -> str:
+    directory = str(tmp_path / "snapshots")
+    generator.events_extractor.save_snapshot(directory)
+    return directory
+
+
+def current_path(directory: str) -> str:
+    with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+        return os.path.join(directory, f.read().strip())
+
+
+def test_round_trip(generator, workspace, snapshot_dir):
+    extractor = generator.events_extractor
+    events, _ = extractor._timeline_index()
+    graph = extractor._location_graph()
+
+    snapshot = read_snapshot(snapshot_dir)
+    assert snapshot.manifest["events"] == len(events)
+    assert [snapshot.events.record(position) for position in range(len(events))] == [
+        events.record(position) for position in range(len(events))
+    ]
+    assert snapshot.locations.ids == graph.ids and snapshot.locations.names == graph.names
+    assert snapshot.locations.indptr.tolist() == graph.indptr.tolist()
+    assert snapshot.locations.indices.tolist() == graph.indices.tolist()
+    assert snapshot.polities == extractor._polity_table()
+
+    # A fresh process answers from the snapshot without reading Notion
+    client = FakeNotionClient(workspace)
+    restored = _generator(client, FakeAnthropic()).events_extractor
+    assert restored.load_snapshot(snapshot_dir)
+    name = workspace.event_names[0]
+    assert restored.resolve_event_id(name) == extractor.resolve_event_id(name)
+    assert restored.get_location_hops(workspace.location_names[0]) == extractor.get_location_hops(
+        workspace.location_names[0]
+    )
+    assert not client.calls
+
+
+def truncate_manifest(path: str) -> None:
+    with open(os.path.join(path, "manifest.json"), "r+", encoding="utf-8") as f:
+        f.truncate(10)
+
+
+def remove_array(path: str) -> None:
+    os.remove(glob.glob(os.path.join(path, "events.start_years*"))[0])
+
+
+def corrupt_array(path: str) -> None:
+    with open(glob.glob(os.path.join(path, "locations.indptr*"))[0], "wb") as f:
+        f.write(b"not an array")
+
+
+def miscount_events(path: str) -> None:
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["events"] += 1
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def prune(path: str) -> None:
+    for entry in os.listdir(path):
+        os.remove(os.path.join(path, entry))
+    os.rmdir(path)
+
+
+@pytest.mark.parametrize("damage", [truncate_manifest, remove_array, corrupt_array, miscount_events, prune])
+def test_unreadable_snapshot_starts_cold(workspace, snapshot_dir, damage):
+    damage(current_path(snapshot_dir))
+    assert read_snapshot(snapshot_dir) is None
+
+    client = FakeNotionClient(workspace)
+    extractor = _generator(client, FakeAnthropic()).events_extractor
+    assert not extractor.load_snapshot(snapshot_dir)
+    extractor.refresh_names()
+    assert extractor.resolve_event_id(workspace.event_names[0]) is not None
+    assert client.calls["databases.query"] > 0
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+from benchmarks.fake_llm import FakeAnthropic
+from benchmarks.run import _generator
+from benchmarks.workspace import FakeNotionClient, FakeWorkspace
+from src.backend.writer import TimelineWriter, WriteLedger
+
+
+@pytest.fixture
+def client() -> FakeNotionClient:
+    # Writes add pages: a workspace of its own, not the session one
+    return FakeNotionClient(FakeWorkspace(50, 10, 5))
+
+
+@pytest.fixture
+def extractor(client):
+    return _generator(client, FakeAnthropic()).events_extractor
+
+
+def writer(extractor, tmp_path) -> TimelineWriter:
+    """
+    A writer with a ledger of its own on the shared ledger file, as another process would have.
+    """
+    return TimelineWriter(extractor, ledger=WriteLedger(str(tmp_path / "writes.sqlite3")))
+
+
+def event(client, name: str) -> dict:
+    return {
+        "name": name,
+        "start_year": -500,
+        "end_year": None,
+        "event_type": "Political event",
+        "importance": 5,
+        "description": "A treaty is signed.",
+        "excerpt": "A treaty.",
+        "location": {"name": client.workspace.location_names[0], "biome": "Maritime", "near": []},
+        "polities": [],
+    }
+
+
+def test_concurrent_writes_create_one_page(client, extractor, tmp_path):
+    first, second = writer(extractor, tmp_path), writer(extractor, tmp_path)
+    create = client.pages.create
+    creating, proceed = threading.Event(), threading.Event()
+
+    def slow_create(**kwargs):
+        creating.set()
+        proceed.wait(5)
+        return create(**kwargs)
+
+    client.pages.create = slow_create
+    results = []
+    thread = threading.Thread(target=lambda: results.append(first.write(event(client, "Treaty of Salt"))))
+    thread.start()
+    assert creating.wait(5)
+
+    assert second.write(event(client, "Treaty of Salt")).status == "pending"
+    proceed.set()
+    thread.join(5)
+    assert results[0].status == "created"
+
+    again = second.write(event(client, "Treaty of Salt"))
+    assert (again.status, again.page_id) == ("existing", results[0].page_id)
+    assert client.calls["pages.create"] == 1
+
+
+def test_lost_response_is_reconciled(client, extractor, tmp_path):
+    create = client.pages.create
+
+    def lost_create(**kwargs):
+        create(**kwargs)
+        raise TimeoutError("read timed out")
+
+    client.pages.create = lost_create
+    timeline_writer = writer(extractor, tmp_path)
+    assert timeline_writer.write(event(client, "Treaty of Ash")).status == "failed"
+
+    client.pages.create = create
+    result = timeline_writer.write(event(client, "Treaty of Ash"))
+    assert result.status == "existing"
+    assert client.calls["pages.create"] == 1
+
+
+def test_failures_are_per_event(client, extractor, tmp_path, monkeypatch):
+    resolve = extractor.resolve_location_id
+
+    def flaky_resolve(name):
+        if name == "Unreachable":
+            raise ConnectionError("connection reset")
+        return resolve(name)
+
+    monkeypatch.setattr(extractor, "resolve_location_id", flaky_resolve)
+    unreachable = event(client, "Treaty of Iron")
+    unreachable["location"]["name"] = "Unreachable"
+    invalid = {"name": "Treaty of Nothing"}
+
+    results = writer(extractor, tmp_path).write_many(
+        [event(client, "Treaty of Bronze"), invalid, unreachable, event(client, "Treaty of Tin")]
+    )
+
+    assert [result.status for result in results] == ["created", "failed", "failed", "created"]
+    assert results[1].key is None and "validation error" in results[1].error
+    assert "connection reset" in results[2].error
+    # The failed lookup sent nothing, so the event is not left pending and is written from scratch next time
+    monkeypatch.setattr(extractor, "resolve_location_id", resolve)
+    retried = writer(extractor, tmp_path).write(unreachable)
+    assert (retried.status, retried.unresolved) == ("created", ["Unreachable"])
+
+
+def test_ledger_claims(tmp_path):
+    path = str(tmp_path / "writes.sqlite3")
+    first, second = WriteLedger(path), WriteLedger(path)
+
+    assert first.claim("key", "Treaty") == ("new", None)
+    assert second.claim("key", "Treaty") == ("pending", None)
+    # Only the owner of a claim releases it
+    second.release("key")
+    assert second.claim("key", "Treaty") == ("pending", None)
+    first.release("key")
+    assert second.claim("key", "Treaty") == ("new", None)
+
+    # An abandoned claim is taken over by the next write, which reconciles it
+    second.abandon("key")
+    assert first.claim("key", "Treaty") == ("stale", None)
+    assert second.claim("key", "Treaty") == ("pending", None)
+
+    first.mark_created("key", "Treaty", "page")
+    assert second.claim("key", "Treaty") == ("created", "page")
+    second.release("key")
+    assert first.claim("key", "Treaty") == ("created", "page")
+